@@ -40,7 +40,9 @@ setup(
     # Scripts
     entry_points = { 'gui_scripts': [
                            'visualea = openalea.visualea.visualea_script:start_gui',
-                           'aleashell = openalea.visualea.shell:main',],},
+                           'aleashell = openalea.visualea.shell:main',],
+                     'console_scripts': [
+                           'visualea-run = openalea.visualea.batch:start',],},
 
     postinstall_scripts = ['visualea_postinstall'],
     share_dirs = { 'share' : 'share' },
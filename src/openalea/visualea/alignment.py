@@ -0,0 +1,112 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Alignment and distribution of the positions of a selection.
+
+The functions take the positions (x, y) of the top left corners and the
+sizes (width, height) of the items and return all the new positions at
+once. NumPy is used when it is installed.
+
+This module does not import Qt.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HORIZONTAL = "horizontal"  # same y
+LEFT = "left"              # same left side
+RIGHT = "right"            # same right side
+MEAN = "mean"              # same vertical axis
+
+
+def align(positions, sizes, mode):
+    """ Return the positions aligned on the mean of the selection.
+
+    @param positions : sequence of (x, y)
+    @param sizes : sequence of (width, height)
+    @param mode : HORIZONTAL, LEFT, RIGHT or MEAN
+    @return : list of [x, y]
+    """
+    if not positions:
+        return []
+    if numpy is not None:
+        p = numpy.array(positions, dtype=float)
+        w = numpy.array(sizes, dtype=float).reshape(-1, 2)[:, 0]
+        if mode == HORIZONTAL:
+            p[:, 1] = p[:, 1].mean()
+        elif mode == LEFT:
+            p[:, 0] = p[:, 0].mean()
+        elif mode == RIGHT:
+            p[:, 0] = (p[:, 0] + w).mean() - w
+        elif mode == MEAN:
+            p[:, 0] = (p[:, 0] + w / 2.).mean() - w / 2.
+        else:
+            raise ValueError("unknown alignment %r" % (mode,))
+        return p.tolist()
+
+    n = float(len(positions))
+    widths = [s[0] for s in sizes]
+    if mode == HORIZONTAL:
+        y = sum(p[1] for p in positions) / n
+        return [[p[0], y] for p in positions]
+    elif mode == LEFT:
+        x = sum(p[0] for p in positions) / n
+        return [[x, p[1]] for p in positions]
+    elif mode == RIGHT:
+        x = sum(p[0] + w for p, w in zip(positions, widths)) / n
+        return [[x - w, p[1]] for p, w in zip(positions, widths)]
+    elif mode == MEAN:
+        x = sum(p[0] + w / 2. for p, w in zip(positions, widths)) / n
+        return [[x - w / 2., p[1]] for p, w in zip(positions, widths)]
+    raise ValueError("unknown alignment %r" % (mode,))
+
+
+def distribute(positions, sizes, axis):
+    """ Return the positions with equal gaps between the items along axis
+    (0 for x, 1 for y). Items are ordered by their centers, the first and
+    the last ones don't move.
+
+    @return : list of [x, y]
+    """
+    n = len(positions)
+    if n < 3:
+        return [list(p) for p in positions]
+    if numpy is not None:
+        p = numpy.array(positions, dtype=float)
+        s = numpy.array(sizes, dtype=float).reshape(-1, 2)[:, axis]
+        start = p[:, axis]
+        gap = ((start + s).max() - start.min() - s.sum()) / (n - 1)
+        order = numpy.argsort(start + s / 2., kind="mergesort")
+        sorted_s = s[order]
+        # start of the k-th item : end of the first + k gaps + sizes between
+        middle = order[1:-1]
+        offsets = numpy.cumsum(sorted_s[1:-1]) - sorted_s[1:-1]
+        p[middle, axis] = (start[order[0]] + sorted_s[0] +
+                           numpy.arange(1, n - 1) * gap + offsets)
+        return p.tolist()
+
+    s = [size[axis] for size in sizes]
+    start = [pos[axis] for pos in positions]
+    gap = (max(a + b for a, b in zip(start, s)) - min(start) - sum(s)) / (n - 1.)
+    order = sorted(range(n), key=lambda i: start[i] + s[i] / 2.)
+    result = [list(pos) for pos in positions]
+    current = start[order[0]] + s[order[0]]
+    for i in order[1:-1]:
+        result[i][axis] = current + gap
+        current += gap + s[i]
+    return result
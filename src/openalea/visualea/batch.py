@@ -0,0 +1,210 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Evaluate a node factory without the graphical interface.
+
+    visualea-run [options] PACKAGE FACTORY
+
+Inputs are read from a JSON file (--inputs) and from the command line
+(-i name=value, value being JSON or a python literal). The outputs are
+written as JSON on the standard output or in a file (--outputs).
+
+This module must not import Qt, to start fast and to run on machines
+without display.
+
+Exit codes : 0 on success, 1 if the evaluation failed, 2 if the arguments
+are invalid or the factory is not found.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import sys
+import json
+import ast
+import traceback
+from optparse import OptionParser
+
+EXIT_OK = 0
+EXIT_EVALUATION_ERROR = 1
+EXIT_USAGE_ERROR = 2
+
+
+class UsageError(Exception):
+    pass
+
+
+def parse_value(text):
+    """ Value of a command line input : JSON, a python literal or a string """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_inputs(assignments, filename=None):
+    """ Return the dict of the inputs given in the JSON file filename and
+    the name=value strings of assignments """
+    inputs = {}
+    if filename:
+        f = open(filename)
+        try:
+            try:
+                values = json.load(f)
+            except ValueError, e:
+                raise UsageError("%s: %s" % (filename, e))
+        finally:
+            f.close()
+        if not isinstance(values, dict):
+            raise UsageError("%s must contain a JSON object" % (filename,))
+        inputs.update(values)
+    for assignment in assignments:
+        if "=" not in assignment:
+            raise UsageError("invalid input %r, expected name=value" % (assignment,))
+        name, value = assignment.split("=", 1)
+        inputs[name.strip()] = parse_value(value)
+    return inputs
+
+
+def get_factory(package_id, factory_id, paths=()):
+    """ Return the factory, loading the packages of paths first and
+    searching all the installed packages only if needed """
+    from openalea.core.pkgmanager import PackageManager, UnknownPackageError
+    from openalea.core.package import UnknownNodeError
+    pm = PackageManager()
+    for path in paths:
+        pm.load_directory(path)
+    try:
+        package = pm[package_id]
+    except UnknownPackageError:
+        pm.init(verbose=False)
+        try:
+            package = pm[package_id]
+        except UnknownPackageError:
+            raise UsageError("unknown package %r" % (package_id,))
+    try:
+        return package.get_factory(factory_id)
+    except UnknownNodeError:
+        raise UsageError("unknown factory %r in package %r" %
+                         (factory_id, package_id))
+
+
+def set_inputs(node, inputs):
+    names = [desc["name"] for desc in node.input_desc]
+    for name, value in inputs.iteritems():
+        if name not in names:
+            raise UsageError("unknown input %r, inputs are: %s" %
+                             (name, ", ".join(names)))
+        node.set_input(name, value)
+
+
+def get_outputs(node):
+    return dict((desc["name"], node.get_output(i))
+                for i, desc in enumerate(node.output_desc))
+
+
+def evaluate(node, evaluator=None):
+    if evaluator == "ParallelEvaluation":
+        from openalea.visualea import parallel_evaluation # registers it
+    if hasattr(node, "eval_as_expression"):
+        if evaluator:
+            node.eval_algo = evaluator
+        node.eval_as_expression()
+    else:
+        node.eval()
+
+
+def write_outputs(outputs, filename=None):
+    """ Write outputs as JSON, values which are not JSON serializable are
+    written as their repr """
+    if filename:
+        f = open(filename, "w")
+    else:
+        f = sys.stdout
+    try:
+        json.dump(outputs, f, indent=2, sort_keys=True, default=repr)
+        f.write("\n")
+    finally:
+        if filename:
+            f.close()
+
+
+def instantiate(factory, inputs=None):
+    """ Return a node of factory with its inputs set """
+    node = factory.instantiate()
+    set_inputs(node, inputs or {})
+    return node
+
+
+def run(package_id, factory_id, inputs=None, evaluator=None, paths=()):
+    """ Instantiate the factory, set its inputs, evaluate it and return the
+    dict of its outputs """
+    node = instantiate(get_factory(package_id, factory_id, paths), inputs)
+    evaluate(node, evaluator)
+    return get_outputs(node)
+
+
+def main(argv=None):
+    """ Entry point of visualea-run """
+    parser = OptionParser(usage="%prog [options] PACKAGE FACTORY")
+    parser.add_option("-i", "--input", action="append", dest="assignments",
+                      default=[], metavar="NAME=VALUE",
+                      help="set an input, VALUE is JSON or a python literal")
+    parser.add_option("--inputs", dest="inputs", metavar="FILE",
+                      help="JSON file containing an object of inputs")
+    parser.add_option("-o", "--outputs", dest="outputs", metavar="FILE",
+                      help="write the outputs in FILE instead of the standard output")
+    parser.add_option("-e", "--evaluator", dest="evaluator", metavar="NAME",
+                      help="evaluation algorithm, e.g. ParallelEvaluation")
+    parser.add_option("-p", "--path", action="append", dest="paths",
+                      default=[], metavar="DIR",
+                      help="load the packages of DIR before the installed ones")
+    options, args = parser.parse_args(argv)
+
+    if len(args) != 2:
+        parser.print_usage(sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    try:
+        inputs = parse_inputs(options.assignments, options.inputs)
+        factory = get_factory(args[0], args[1], options.paths)
+    except (UsageError, IOError), e:
+        print >> sys.stderr, "visualea-run: error:", e
+        return EXIT_USAGE_ERROR
+
+    try:
+        node = instantiate(factory, inputs)
+        evaluate(node, options.evaluator)
+        outputs = get_outputs(node)
+    except UsageError, e:
+        print >> sys.stderr, "visualea-run: error:", e
+        return EXIT_USAGE_ERROR
+    except Exception, e:
+        traceback.print_exc()
+        return EXIT_EVALUATION_ERROR
+
+    write_outputs(outputs, options.outputs)
+    return EXIT_OK
+
+
+def start():
+    """ console_scripts entry point """
+    sys.exit(main())
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,307 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Copy and paste of nodes without building a composite node factory.
+
+A copy records for each node the package and the name of its factory, a
+copy of its input values, the metadata shown by the GUI with positions
+relative to the selection, and optionally a copy of its output values.
+Annotations are recorded by their metadata only, they are pasted with the
+annotation factory of the System package. The edges between the copied
+nodes are kept as indices in this list. Pasting instantiates each factory
+once per node and connects the nodes, the positions are computed when the
+nodes are created. Each paste gets its own copy of the values. Nothing is
+added to the graph if a factory can't be found.
+
+The copy is kept in memory and written in the system clipboard (MIMETYPE)
+so that it can be pasted in another session. The system clipboard can be
+written by any process, so it only holds JSON : the factories, the edges,
+and the input values and metadata which are python literals (read back
+with ast.literal_eval). The other values and the outputs are only pasted
+in the session of the copy, the values which are not in a copy are listed
+in ClipboardData.dropped.
+
+This module does not import Qt.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import ast
+import copy as copymodule
+import json
+import uuid
+
+from openalea.visualea.undo import get_metadata, set_metadata
+
+MIMETYPE = "openalea/visualea-clipboard"
+
+# (package id, factory name) of the annotations
+ANNOTATION_FACTORY = ("System", "annotation")
+
+
+def _copy(value):
+    """ Return (True, a deep copy of value) or (False, None) if it can't be
+    copied """
+    try:
+        return True, copymodule.deepcopy(value)
+    except Exception:
+        return False, None
+
+
+def _literal(value):
+    """ Return repr(value) if literal_eval reads it back as value, else None """
+    try:
+        text = repr(value)
+        if ast.literal_eval(text) == value:
+            return text
+    except Exception:
+        pass
+    return None
+
+
+class ClipboardData(object):
+    """ Nodes copied from a graph.
+
+    vertices : list of dicts with the keys package, factory, caption,
+               metadata, inputs [(index, value)], hidden [input index],
+               lazy, block, delay, outputs [(index, value)] or None
+    edges : list of (source index, source port, target index, target port)
+    dropped : descriptions of the values which are not in the copy
+    """
+
+    def __init__(self, vertices=(), edges=(), token=None, dropped=()):
+        self.vertices = list(vertices)
+        self.edges = list(edges)
+        self.token = token or uuid.uuid4().hex
+        self.dropped = list(dropped)
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def dumps(self):
+        """ Return the copy as a string for the system clipboard : its
+        token on the first line, then the copy in JSON. The values which
+        are not python literals and the outputs are added to dropped """
+        dropped = list(self.dropped)
+        vertices = []
+        for v in self.vertices:
+            caption = v["caption"]
+            inputs = []
+            for i, value in v["inputs"]:
+                text = _literal(value)
+                if text is None:
+                    dropped.append("%s: input %i" % (caption, i))
+                else:
+                    inputs.append((i, text))
+            metadata = {}
+            for key, value in v["metadata"].iteritems():
+                text = _literal(value)
+                if text is None:
+                    dropped.append("%s: %s" % (caption, key))
+                else:
+                    metadata[key] = text
+            if v["outputs"]:
+                dropped.append("%s: outputs" % caption)
+            vertices.append({"package": v["package"],
+                             "factory": v["factory"],
+                             "caption": caption,
+                             "metadata": metadata,
+                             "inputs": inputs,
+                             "hidden": v["hidden"],
+                             "lazy": v["lazy"],
+                             "block": v["block"],
+                             "delay": v["delay"],
+                             })
+        return self.token + "\n" + json.dumps({"vertices": vertices,
+                                               "edges": self.edges,
+                                               "dropped": dropped})
+
+    @classmethod
+    def loads(cls, text):
+        """ Read a copy written by dumps, possibly by an other process.
+
+        @raise ValueError : if text is not a copy
+        """
+        try:
+            token, text = text.split("\n", 1)
+            d = json.loads(text)
+            vertices = []
+            for v in d["vertices"]:
+                metadata = dict((str(key), ast.literal_eval(value))
+                                for key, value in v["metadata"].iteritems())
+                vertices.append({"package": str(v["package"]),
+                                 "factory": str(v["factory"]),
+                                 "caption": v["caption"],
+                                 "metadata": metadata,
+                                 "inputs": [(int(i), ast.literal_eval(value))
+                                            for i, value in v["inputs"]],
+                                 "hidden": [int(i) for i in v["hidden"]],
+                                 "lazy": bool(v["lazy"]),
+                                 "block": bool(v["block"]),
+                                 "delay": int(v["delay"]),
+                                 "outputs": None,
+                                 })
+            edges = [tuple(int(x) for x in edge) for edge in d["edges"]]
+            dropped = [unicode(x) for x in d["dropped"]]
+        except (ValueError, SyntaxError, TypeError, KeyError, AttributeError), e:
+            raise ValueError("Not a copy of nodes: %s" % e)
+        return cls(vertices, edges, token, dropped)
+
+
+def read_token(text):
+    """ Return the token of a copy written by ClipboardData.dumps """
+    return text.split("\n", 1)[0]
+
+
+def copy(graph, vids, outputs=False):
+    """ Copy the vertices vids of graph.
+
+    @param outputs : also copy the output values of the nodes
+    @return : a ClipboardData or None if a node has no factory in a
+    package (it can then only be copied with to_factory)
+    """
+    vertices, index, dropped = [], {}, []
+    min_x = min_y = float("inf")
+    for vid in vids:
+        node = graph.node(vid)
+        metadata = get_metadata(node)
+        position = metadata.get("position")
+        if position:
+            min_x, min_y = min(min_x, position[0]), min(min_y, position[1])
+
+        if "__graphitem__" in node.__class__.__dict__: # annotations
+            index[vid] = len(vertices)
+            vertices.append({"package": ANNOTATION_FACTORY[0],
+                             "factory": ANNOTATION_FACTORY[1],
+                             "caption": metadata.get("caption") or "annotation",
+                             "metadata": metadata,
+                             "inputs": [],
+                             "hidden": [],
+                             "lazy": True,
+                             "block": False,
+                             "delay": 0,
+                             "outputs": None,
+                             })
+            continue
+
+        factory = getattr(node, "factory", None)
+        package = getattr(factory, "package", None)
+        if package is None:
+            return None
+        caption = metadata.get("caption") or factory.name
+
+        inputs = []
+        for i, value in enumerate(getattr(node, "inputs", ())):
+            ok, value = _copy(value)
+            if ok:
+                inputs.append((i, value))
+            else:
+                dropped.append("%s: input %i" % (caption, i))
+        hidden = [i for i, port in enumerate(getattr(node, "input_desc", ()))
+                  if port.get_ad_hoc_dict().get_metadata("hide")]
+
+        values = None
+        if outputs:
+            values = []
+            for i, value in enumerate(getattr(node, "outputs", ())):
+                ok, value = _copy(value)
+                if ok:
+                    values.append((i, value))
+                else:
+                    dropped.append("%s: output %i" % (caption, i))
+
+        index[vid] = len(vertices)
+        vertices.append({"package": package.get_id(),
+                         "factory": factory.name,
+                         "caption": caption,
+                         "metadata": metadata,
+                         "inputs": inputs,
+                         "hidden": hidden,
+                         "lazy": getattr(node, "lazy", True),
+                         "block": getattr(node, "block", False),
+                         "delay": getattr(node, "delay", 0),
+                         "outputs": values,
+                         })
+
+    # positions relative to the top left corner of the selection
+    for v in vertices:
+        position = v["metadata"].get("position")
+        if position:
+            v["metadata"]["position"] = [position[0] - min_x, position[1] - min_y]
+
+    edges = []
+    for vid in vids:
+        for eid in graph.out_edges(vid):
+            target = graph.target(eid)
+            if target in index:
+                edges.append((index[vid], graph.local_id(graph.source_port(eid)),
+                              index[target], graph.local_id(graph.target_port(eid))))
+    return ClipboardData(vertices, edges, dropped=dropped)
+
+
+def paste(graph, data, position, get_factory):
+    """ Add the nodes of data to graph, the top left corner of the nodes
+    at position (x, y).
+
+    @param get_factory : function (package id, factory name) -> factory
+    @return : the list of the new vertex ids
+
+    The nodes are all created before the first one is added : the graph is
+    not modified if get_factory or an instantiation fails.
+    """
+    call_stack = [graph.factory.get_id()] if getattr(graph, "factory", None) else None
+    x, y = position
+    factories = [get_factory(v["package"], v["factory"]) for v in data.vertices]
+    nodes = []
+    for v, factory in zip(data.vertices, factories):
+        node = factory.instantiate(call_stack)
+        for i, value in v["inputs"]:
+            node.set_input(i, copymodule.deepcopy(value))
+        for i in v["hidden"]:
+            node.input_desc[i].get_ad_hoc_dict().set_metadata("hide", True)
+        for attr in ("lazy", "block", "delay"):
+            if hasattr(node, attr):
+                setattr(node, attr, v[attr])
+        for key, value in v["metadata"].iteritems():
+            if key == "position" and value:
+                value = [value[0] + x, value[1] + y]
+            if value is not None:
+                set_metadata(node, key, value)
+        if v["outputs"]:
+            for i, value in v["outputs"]:
+                node.set_output(i, copymodule.deepcopy(value))
+            node.modified = False
+        nodes.append(node)
+
+    vids = [graph.add_node(node) for node in nodes]
+    for src, sport, dst, dport in data.edges:
+        graph.connect(vids[src], sport, vids[dst], dport)
+    return vids
+
+
+# the last copy of the session
+_data = None
+
+
+def set_data(data):
+    global _data
+    _data = data
+
+
+def get_data(token=None):
+    """ Return the last copy, or None if token is given and the copy has
+    an other one """
+    if _data is None or (token is not None and _data.token != token):
+        return None
+    return _data
@@ -29,6 +29,9 @@ from openalea.core import compositenode, node
 from openalea.core.pkgmanager import PackageManager  # for drag and drop
 from openalea.core.node import RecursionError
 from openalea.core.algo import dataflow_evaluation as evalmodule
+from openalea.visualea import evaluation, dirty, memory, memo, undo
+from openalea.visualea.profiler import get_profiler
+from openalea.visualea.settings_cache import get_settings_cache
 from openalea.grapheditor import qt
 #from openalea.grapheditor import baselisteners, qtgraphview, qtutils
 from openalea.core.node import NodeFactory
@@ -61,12 +64,29 @@ class DataflowView(qt.View):
         if not self.__noToolBar:
             self.__annoToolBar = anno.AnnotationTextToolbar(None)
             self.__annoToolBar.setSleepOnDisappear(True)
+            # the annotation under the pointer is looked for at most once
+            # per interval, at the last position of the pointer
+            self.__hoverPos = None
+            self.__hoverTimer = qt.QtCore.QTimer(self)
+            self.__hoverTimer.setSingleShot(True)
+            self.__hoverTimer.setInterval(40)
+            self.__hoverTimer.timeout.connect(self.__update_annotation_toolbar)
 
         self.copyRequest.connect(self.on_copy_request)
         self.cutRequest.connect(self.on_cut_request)
         self.pasteRequest.connect(self.on_paste_request)
         self.deleteRequest.connect(self.on_delete_request)
 
+        # -- performance rendering : no antialiasing while the view moves --
+        self.__renderHints = None
+        self.__interactionTimer = qt.QtCore.QTimer(self)
+        self.__interactionTimer.setSingleShot(True)
+        self.__interactionTimer.setInterval(250)
+        self.__interactionTimer.timeout.connect(self.__end_interaction)
+        vertex.ObserverOnlyGraphicalVertex.read_settings()
+        self.__settingsObserver = vertex.SettingsObserver(self.update_rendering)
+        self.__settingsObserver.initialise(get_settings_cache())
+
     def setScene(self, scene):
         # This is called by grapheditor.qtgraphview.set_canvas
         # which is itself called by GraphicalGraph(...) after __init__.
@@ -74,6 +94,37 @@ class DataflowView(qt.View):
             scene.addItem(self.__annoToolBar)
         qt.View.setScene(self, scene)
 
+    def update_rendering(self):
+        """ Apply the "FastRendering" setting to the vertices of the scene """
+        vertex.ObserverOnlyGraphicalVertex.read_settings()
+        fast = vertex.ObserverOnlyGraphicalVertex.fastRendering
+        try:
+            scene = self.scene()
+        except RuntimeError:
+            # the view has been deleted
+            return
+        if scene is None:
+            return
+        for item in scene.items():
+            if isinstance(item, vertex.ObserverOnlyGraphicalVertex):
+                item.set_fast_rendering(fast)
+
+    def __begin_interaction(self):
+        """ Turn antialiasing off until the view stops moving """
+        if not vertex.ObserverOnlyGraphicalVertex.fastRendering:
+            return
+        if self.__renderHints is None:
+            self.__renderHints = self.renderHints()
+            self.setRenderHint(qt.QtGui.QPainter.Antialiasing, False)
+            self.setRenderHint(qt.QtGui.QPainter.SmoothPixmapTransform, False)
+        self.__interactionTimer.start()
+
+    def __end_interaction(self):
+        if self.__renderHints is not None:
+            self.setRenderHints(self.__renderHints)
+            self.__renderHints = None
+            self.viewport().update()
+
     def set_clipboard(self, cnf):
         self.__clipboard = cnf
 
@@ -283,6 +334,15 @@ class DataflowView(qt.View):
     # Handling keyboard events on the graph view #
     ##############################################
     def keyPressEvent(self, e):
+        # -- undo/redo, unless an item (annotation text) edits the text --
+        scene = self.scene()
+        if scene is not None and scene.focusItem() is None:
+            for key, fName in ((qt.QtGui.QKeySequence.Undo, "graph_undo"),
+                               (qt.QtGui.QKeySequence.Redo, "graph_redo")):
+                if e.matches(key):
+                    self.get_graph_operator()(fName=fName)()
+                    e.accept()
+                    return
         qt.View.keyPressEvent(self, e)
         if not e.isAccepted():
             if e.key() == qt.QtCore.Qt.Key_Space:
@@ -304,17 +364,36 @@ class DataflowView(qt.View):
             # toolbar in the right place and reveals it.
             # If the pointer not over an annotation it is hidden unless it is over
             # the toolbar. --
-            items = self.items(e.pos())
-            annotations = [i for i in items if isinstance(i, anno.GraphicalAnnotation)]
-            if len(annotations) > 0:
-                firstAnno = annotations[0]
-                self.__annoToolBar.wakeup()
-                self.__annoToolBar.set_annotation(firstAnno, self)
-            # elif not self.__annoToolBar in items :
-            #     self.__annoToolBar.set_annotation(None)
+            scene = self.scene()
+            if scene is not None and len(anno.get_annotation_index(scene)):
+                self.__hoverPos = e.pos()
+                if not self.__hoverTimer.isActive():
+                    self.__hoverTimer.start()
 
+        if e.buttons() != qt.QtCore.Qt.NoButton:
+            self.__begin_interaction()
         qt.View.mouseMoveEvent(self, e)
 
+    def __update_annotation_toolbar(self):
+        scene = self.scene()
+        if scene is None or self.__hoverPos is None:
+            return
+        index = anno.get_annotation_index(scene)
+        firstAnno = index.annotation_at(self.mapToScene(self.__hoverPos))
+        if firstAnno is not None:
+            self.__annoToolBar.wakeup()
+            self.__annoToolBar.set_annotation(firstAnno, self)
+        # else :
+        #     self.__annoToolBar.set_annotation(None)
+
+    def wheelEvent(self, e):
+        self.__begin_interaction()
+        qt.View.wheelEvent(self, e)
+
+    def scrollContentsBy(self, dx, dy):
+        self.__begin_interaction()
+        qt.View.scrollContentsBy(self, dx, dy)
+
     ###########################################
     # Handling context menu on the graph view #
     ###########################################
@@ -331,6 +410,67 @@ class DataflowView(qt.View):
         menu.addAction(operator("Add Annotation", menu,
                                 "graph_add_annotation", position=scenePos))
 
+        # -- Undo/Redo --
+        stack = undo.get_undo_stack(self.scene().get_graph())
+        action = operator("Undo " + (stack.undo_label() or ""), menu, "graph_undo")
+        action.setEnabled(stack.can_undo())
+        menu.addAction(action)
+        action = operator("Redo " + (stack.redo_label() or ""), menu, "graph_redo")
+        action.setEnabled(stack.can_redo())
+        menu.addAction(action)
+        menu.addSeparator()
+        menu.addAction(operator("Copy with outputs", menu, "graph_copy",
+                                outputs=True))
+        menu.addSeparator()
+
+        # -- Evaluation --
+        graph = self.scene().get_graph()
+        executor = evaluation.get_executor(graph)
+        if not executor.is_running():
+            action = operator("Evaluate modified nodes", menu, "graph_run_dirty")
+            action.setEnabled(bool(dirty.dirty_vertices(graph)))
+            menu.addAction(action)
+        else:
+            menu.addSeparator()
+            if executor.is_paused():
+                menu.addAction(operator("Resume evaluation", menu,
+                                        "graph_resume_evaluation"))
+            else:
+                menu.addAction(operator("Pause evaluation", menu,
+                                        "graph_pause_evaluation"))
+            menu.addAction(operator("Cancel evaluation", menu,
+                                    "graph_cancel_evaluation"))
+            menu.addSeparator()
+
+        action = operator("Evaluate in background", menu,
+                          "graph_toggle_background_evaluation")
+        action.setCheckable(True)
+        action.setChecked(evaluation.background_evaluation())
+        menu.addAction(action)
+
+        action = operator("Memoize outputs", menu, "graph_toggle_memoize")
+        action.setCheckable(True)
+        action.setChecked(memo.memoizes())
+        menu.addAction(action)
+
+        action = operator("Release intermediate outputs", menu,
+                          "graph_toggle_release_outputs")
+        action.setCheckable(True)
+        action.setChecked(memory.releases_outputs(graph))
+        menu.addAction(action)
+
+        menu.addAction(operator("Parameter sweep...", menu, "graph_sweep"))
+
+        # -- Profiler submenu --
+        profilerSubmenu = menu.addMenu("Profiler")
+        action = operator("Profile evaluations", profilerSubmenu,
+                          "graph_toggle_profiling")
+        action.setCheckable(True)
+        action.setChecked(get_profiler(graph).enabled)
+        profilerSubmenu.addAction(action)
+        profilerSubmenu.addAction(operator("Show profile...", profilerSubmenu,
+                                           "graph_show_profile"))
+
         # -- Evaluator submenu --
         evaluatorSubmenu = menu.addMenu("Evaluator")
         classlist = sorted(evalmodule.__evaluators__)
@@ -367,38 +507,54 @@ def initialise_graph_view_from_model(graphView, graphModel):
     graphView.notify(graphModel, ("tooltip_modified", graphModel.get_tip()))
     graphView.notify(graphModel, ("internal_data_changed",))
 
+    # the vertices downstream of structure changes are out of date
+    dirty.track(graphModel)
+    # edits made outside of the operators can't be redone
+    undo.track(graphModel)
+
     # -- then the composite node class initialisation --
-    ids = graphModel.vertices()
-    for eltid in ids:
-        vtype = "vertex"
-        doNotify = True
-        vertex = graphModel.node(eltid)
-        if("__graphitem__" in vertex.__class__.__dict__):
-            vtype = "annotation"
-        elif isinstance(vertex, compositenode.CompositeNodeOutput):
-            vtype = "outNode"
-            doNotify = True if len(vertex.input_desc) else False
-        elif isinstance(vertex, compositenode.CompositeNodeInput):
-            vtype = "inNode"
-            doNotify = True if len(vertex.output_desc) else False
-        else:
-            pass
-        if doNotify:
-            graphView.notify(graphModel, ("vertex_added", (vtype, vertex)))
-
-    for eid in graphModel.edges():
-        (src_id, dst_id) = graphModel.source(eid), graphModel.target(eid)
-        etype = None
-        src_port_id = graphModel.local_id(graphModel.source_port(eid))
-        dst_port_id = graphModel.local_id(graphModel.target_port(eid))
-
-        nodeSrc = graphModel.node(src_id)
-        nodeDst = graphModel.node(dst_id)
-        src_port = nodeSrc.output_desc[src_port_id]
-        dst_port = nodeDst.input_desc[dst_port_id]
-
-        edgedata = "default", eid, src_port, dst_port
-        graphView.notify(graphModel, ("edge_added", edgedata))
+    # The items are created in one batch : the scene is not indexed
+    # meanwhile and the vertices are laid out once, when all of them exist.
+    indexMethod = graphView.itemIndexMethod()
+    graphView.setItemIndexMethod(qt.QtGui.QGraphicsScene.NoIndex)
+    try:
+        vertex.deferredConstruction.begin()
+        try:
+            for eltid in graphModel.vertices():
+                vtype = "vertex"
+                doNotify = True
+                vtx = graphModel.node(eltid)
+                if("__graphitem__" in vtx.__class__.__dict__):
+                    vtype = "annotation"
+                elif isinstance(vtx, compositenode.CompositeNodeOutput):
+                    vtype = "outNode"
+                    doNotify = True if len(vtx.input_desc) else False
+                elif isinstance(vtx, compositenode.CompositeNodeInput):
+                    vtype = "inNode"
+                    doNotify = True if len(vtx.output_desc) else False
+                else:
+                    pass
+                if doNotify:
+                    graphView.notify(graphModel, ("vertex_added", (vtype, vtx)))
+        finally:
+            # edges need the final position of the ports
+            vertex.deferredConstruction.end()
+
+        for eid in graphModel.edges():
+            (src_id, dst_id) = graphModel.source(eid), graphModel.target(eid)
+            etype = None
+            src_port_id = graphModel.local_id(graphModel.source_port(eid))
+            dst_port_id = graphModel.local_id(graphModel.target_port(eid))
+
+            nodeSrc = graphModel.node(src_id)
+            nodeDst = graphModel.node(dst_id)
+            src_port = nodeSrc.output_desc[src_port_id]
+            dst_port = nodeDst.input_desc[dst_port_id]
+
+            edgedata = "default", eid, src_port, dst_port
+            graphView.notify(graphModel, ("edge_added", edgedata))
+    finally:
+        graphView.setItemIndexMethod(indexMethod)
 
 
 GraphicalGraph = openalea.grapheditor.qt.QtGraphStrategyMaker(graphView=DataflowView,
@@ -18,9 +18,11 @@ __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
 import weakref
+from openalea.vpltk.qt import qt
 from openalea.core import node
 from openalea.core import compositenode
 import openalea.grapheditor.base as grapheditorbase
+from openalea.visualea import evaluation
 
 class GraphAdapter(grapheditorbase.GraphAdapterBase):
     """An adapter to openalea.core.compositenode"""
@@ -74,7 +76,17 @@ class GraphAdapter(grapheditorbase.GraphAdapterBase):
     def get_vertex(self, vid):
         return self.graph().node(vid)
 
+    def is_locked(self):
+        """ The structure of the graph can't change while it is evaluated.
+        The edits are refused : the scene only shows the changes notified
+        by the graph """
+        if evaluation.is_evaluating(self.graph()):
+            qt.QtGui.QApplication.beep()
+            return True
+        return False
+
     def add_vertex(self, vertex, position=None):
+        if self.is_locked(): return
         try:
             vid = self.graph().add_node(vertex)
             if(position):
@@ -85,9 +97,11 @@ class GraphAdapter(grapheditorbase.GraphAdapterBase):
                                              "A graph cannot be contained in itself.")
 
     def remove_vertex(self, vertex):
+        if self.is_locked(): return
         return self.graph().remove_node(vertex.get_id())
 
     def add_edge(self, src, dst):
+        if self.is_locked(): return
         if(type(src[0])==int):
             vtxIdSrc, portIdSrc = src[0], src[1]
             vtxIdDst, portIdDst = dst[0], dst[1]
@@ -97,12 +111,29 @@ class GraphAdapter(grapheditorbase.GraphAdapterBase):
         return self.graph().connect(vtxIdSrc, portIdSrc, vtxIdDst, portIdDst)
 
     def remove_edge(self, src, dst):
+        if self.is_locked(): return
         vtxIdSrc, portIdSrc = src[0].get_id(), src[1].get_id()
         vtkIdDst, portIdDst = dst[0].get_id(), dst[1].get_id()
         self.graph().disconnect(vtxIdSrc, portIdSrc, vtkIdDst, portIdDst)
 
+    def remove_elements(self, vertices=(), edges=()):
+        """ Remove vertices and edges in one pass. edges are (src, dst)
+        pairs as given to remove_edge. The edges of removed vertices are
+        removed with them : they are not disconnected one by one. """
+        if self.is_locked(): return 0
+        graph = self.graph()
+        vids = set(v.get_id() for v in vertices)
+        for src, dst in edges:
+            if src[0].get_id() in vids or dst[0].get_id() in vids:
+                continue
+            self.remove_edge(src, dst)
+        for vid in vids:
+            graph.remove_node(vid)
+        return len(vids)
+
     # -- Utility methods, not always useful/relevant.
     def replace_vertex(self, oldVertex, newVertex):
+        if self.is_locked(): return
         return self.graph().replace_node(oldVertex.get_id(), newVertex)
 
     def get_vertex_inputs(self, vid):
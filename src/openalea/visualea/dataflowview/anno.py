@@ -17,6 +17,9 @@
 __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
+import weakref
+from bisect import bisect_left, bisect_right
+
 from openalea.vpltk.qt import qt
 from openalea.grapheditor import qtgraphview, baselisteners
 from openalea.grapheditor import qtutils
@@ -55,6 +58,76 @@ class AnnotationTextToolbar(AleaQGraphicsToolbar):
             self.disappear()
 
 
+#########################
+# The annotations index #
+#########################
+class AnnotationIndex(object):
+    """ The annotations of a scene sorted by the left of their bounding
+    rectangle, to find the annotations under a point without querying all
+    the items of the scene. The annotations tell the index when they move
+    or are resized, it is sorted again at the next query. """
+
+    def __init__(self):
+        self.__items = set()
+        self.__lefts = None
+        self.__entries = None
+        self.__maxWidth = 0.
+
+    def __len__(self):
+        return len(self.__items)
+
+    def add(self, item):
+        self.__items.add(item)
+        self.invalidate()
+
+    def remove(self, item):
+        self.__items.discard(item)
+        self.invalidate()
+
+    def invalidate(self):
+        self.__lefts = None
+        self.__entries = None
+
+    def __build(self):
+        entries = []
+        for item in self.__items:
+            rect = item.sceneBoundingRect()
+            entries.append((rect.left(), rect, item))
+        entries.sort(key=lambda e: e[0])
+        self.__lefts = [e[0] for e in entries]
+        self.__entries = entries
+        self.__maxWidth = max([e[1].width() for e in entries] or [0.])
+
+    def annotation_at(self, pos):
+        """ Return the topmost annotation (highest Z value) containing the
+        scene point pos, or None """
+        if not self.__items:
+            return None
+        if self.__entries is None:
+            self.__build()
+        x = pos.x()
+        start = bisect_left(self.__lefts, x - self.__maxWidth)
+        stop = bisect_right(self.__lefts, x)
+        hits = [item for left, rect, item in self.__entries[start:stop]
+                if rect.contains(pos) and item.isVisible()]
+        if not hits:
+            return None
+        return max(hits, key=lambda item: item.zValue())
+
+
+# scene -> AnnotationIndex
+__indices__ = weakref.WeakKeyDictionary()
+
+
+def get_annotation_index(scene):
+    """ Return the index of the annotations of scene """
+    index = __indices__.get(scene)
+    if index is None:
+        index = AnnotationIndex()
+        __indices__[scene] = index
+    return index
+
+
 ##################
 # The Annotation #
 ##################
@@ -62,6 +135,7 @@ class GraphicalAnnotation(qtutils.MemoRects, qtgraphview.Vertex):
     """ Text annotation on the data flow """
 
     __def_string__ = u"click to edit"
+    __index = None
 
 
     def __init__(self, annotation, graphadapter, parent=None):
@@ -75,6 +149,8 @@ class GraphicalAnnotation(qtutils.MemoRects, qtgraphview.Vertex):
         self.setZValue(-100)
         self.__textItem.setZValue(-99)
         self.__visualStyle = 0
+        self.__index = None
+        self.setFlag(qt.QtGui.QGraphicsItem.ItemSendsGeometryChanges)
 
     annotation = baselisteners.GraphElementListenerBase.get_observed
 
@@ -121,11 +197,29 @@ class GraphicalAnnotation(qtutils.MemoRects, qtgraphview.Vertex):
     #####################
     # ----Qt World----  #
     #####################
-    itemChange = mixin_method(qtgraphview.Vertex, qtutils.MemoRects,
-                              "itemChange")
+    __itemChange = mixin_method(qtgraphview.Vertex, qtutils.MemoRects,
+                                "itemChange")
+
+    def itemChange(self, change, value):
+        if change == qt.QtGui.QGraphicsItem.ItemSceneHasChanged:
+            if self.__index is not None:
+                self.__index.remove(self)
+                self.__index = None
+            scene = self.scene()
+            if scene is not None:
+                self.__index = get_annotation_index(scene)
+                self.__index.add(self)
+        elif change == qt.QtGui.QGraphicsItem.ItemPositionHasChanged:
+            self.__invalidate_index()
+        return self.__itemChange(change, value)
+
+    def __invalidate_index(self):
+        if self.__index is not None:
+            self.__index.invalidate()
 
     def __onTextModified(self, rect):
         self.setHeaderRect(rect)
+        self.__invalidate_index()
         self.deaf(True)
         text = unicode(self.__textItem.toPlainText())
         if(text != self.__def_string__):
@@ -150,6 +244,7 @@ class GraphicalAnnotation(qtutils.MemoRects, qtgraphview.Vertex):
             p2 = rect.width(), rect.height()
         self.store_view_data(rectP2=p2)
         qtutils.MemoRects.setRect(self, rect)
+        self.__invalidate_index()
         self.deaf(False)
 
     #########################
@@ -178,6 +273,7 @@ class GraphicalAnnotation(qtutils.MemoRects, qtgraphview.Vertex):
                     rect = qt.QtCore.QRectF(0,0,value[0],value[1])
                     qtutils.MemoRects.setRect(self,rect)
                     self.setHeaderRect(self.__textItem.boundingRect())
+                    self.__invalidate_index()
                 # -- value is an int in [0, 1] --
                 elif key == "visualStyle":
                     if value is None: value = 0
@@ -71,6 +71,9 @@ class FloatingEdge(qt.QtGui.QGraphicsPathItem, qtgraphview.FloatingEdge):
 class GraphicalEdge(qt.QtGui.QGraphicsPathItem, qtgraphview.Edge):
     """ An edge between two graphical vertices """
 
+    # Below this scale the edge is painted as a straight line
+    lineLevelOfDetail = 0.3
+
     def __init__(self, edgeModel, graphadapter, port1, port2, parent=None):
         """ """
         qt.QtGui.QGraphicsPathItem.__init__(self, parent)
@@ -81,6 +84,17 @@ class GraphicalEdge(qt.QtGui.QGraphicsPathItem, qtgraphview.Edge):
         self.scene().get_adapter().remove_edge( (self.srcBBox().vertex(), self.srcBBox()),
                                                 (self.dstBBox().vertex(), self.dstBBox()) )
 
+    def paint(self, painter, option, widget):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        path = self.path()
+        if lod >= self.lineLevelOfDetail or path.elementCount() < 2:
+            qt.QtGui.QGraphicsPathItem.paint(self, painter, option, widget)
+            return
+        first, last = path.elementAt(0), path.elementAt(path.elementCount() - 1)
+        painter.setPen(self.pen())
+        painter.drawLine(qt.QtCore.QPointF(first.x, first.y),
+                         qt.QtCore.QPointF(last.x, last.y))
+
     def contextMenuEvent(self, event):
         """ Context menu event : Display the menu"""
         menu = qtutils.AleaQMenu(event.widget())
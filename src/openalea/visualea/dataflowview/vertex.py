@@ -17,14 +17,19 @@
 __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
+import time
+
 from openalea.vpltk.qt import qt
 from openalea.visualea.graph_operator import GraphOperator
 from openalea.core import observer, compositenode
 from openalea.core.node import InputPort, OutputPort, AbstractPort, AbstractNode
-from openalea.core.settings import Settings
 from openalea.grapheditor import qtgraphview, baselisteners, qtutils
 from openalea.grapheditor.qtutils import mixin_method, safeEffects
 from openalea.visualea import images_rc
+from openalea.visualea.summary import summarize
+from openalea.visualea.settings_cache import get_settings_cache
+from openalea.visualea import memo, dirty, evaluation, memory
+from openalea.visualea.profiler import get_profiler
 
 
 """
@@ -42,6 +47,236 @@ class EvalObserver(observer.AbstractListener):
             self.callback(sender, event)
 
 
+class SettingsObserver(observer.AbstractListener):
+
+    def __init__(self, callback):
+        observer.AbstractListener.__init__(self)
+        self.callback = callback
+
+    def notify(self, sender, event):
+        if event and event[0] == "settings_changed":
+            self.callback()
+
+
+class BusyMarkerDispatcher(object):
+    """ Coalesces the busy marker changes of the vertices during an
+    evaluation. The scene is repainted at most `rate` times per second
+    instead of processing the events at each start/stop of a node. """
+
+    rate = 30.
+
+    def __init__(self):
+        self.__pending = {}
+        self.__lastFlush = 0.
+        self.__scheduled = False
+        self.__flushing = False
+
+    def set_busy(self, item, busy):
+        self.__pending[item] = busy
+        if time.time() - self.__lastFlush >= 1. / self.rate:
+            self.flush()
+        elif not self.__scheduled:
+            # Make sure the last state is displayed when the evaluation ends
+            self.__scheduled = True
+            qt.QtCore.QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        self.__scheduled = False
+        if self.__flushing:
+            return
+        self.__flushing = True
+        try:
+            pending, self.__pending = self.__pending, {}
+            for item, busy in pending.iteritems():
+                try:
+                    item._busyItem.setVisible(busy and item.isVisible())
+                except RuntimeError:
+                    # the item has been deleted meanwhile
+                    pass
+            qt.QtGui.QApplication.processEvents()
+        finally:
+            self.__lastFlush = time.time()
+            self.__flushing = False
+
+
+busyMarkerDispatcher = BusyMarkerDispatcher()
+
+
+class DeferredConstruction(object):
+    """ Defers the layout, the colors and the moves of the vertices created
+    or edited in batch (a whole graph loaded, a paste, an alignment). Each
+    vertex is then laid out once instead of once per port, caption and
+    tooltip, and moved once to its last position. """
+
+    def __init__(self):
+        self.__depth = 0
+        self.__pending = []
+        self.__deferred = set()
+        self.__moves = {}   # item -> last position notification
+
+    def begin(self):
+        self.__depth += 1
+
+    def is_active(self):
+        return self.__depth > 0
+
+    def defer(self, item):
+        """ Return True if the layout of item must wait for end() """
+        if self.__depth == 0:
+            return False
+        if item not in self.__deferred:
+            self.__deferred.add(item)
+            self.__pending.append(item)
+        return True
+
+    def move(self, item, sender, event):
+        """ Return True if the position notification event of item must
+        wait for end() """
+        if self.__depth == 0:
+            return False
+        self.__moves[item] = (sender, event)
+        return True
+
+    def end(self):
+        """ Lay out and color the deferred vertices, then place the input
+        and output vertices of the graph which depend on the others """
+        self.__depth -= 1
+        if self.__depth > 0:
+            return
+        pending, self.__pending = self.__pending, []
+        moves, self.__moves = self.__moves, {}
+        self.__deferred.clear()
+        for item in pending:
+            item.refresh_geometry()
+            item.update_colors()
+        for item, (sender, event) in moves.iteritems():
+            try:
+                if item.scene() is None:
+                    continue
+            except RuntimeError:
+                # removed and deleted in the batch
+                continue
+            qtgraphview.Vertex.notify(item, sender, event)
+        for item in pending:
+            if isinstance(item, (GraphicalInVertex, GraphicalOutVertex)):
+                item.polishEvent()
+
+
+deferredConstruction = DeferredConstruction()
+
+
+class DecorationDispatcher(object):
+    """ Adds the costly decorations of the vertices (drop shadows) when
+    they are painted for the first time, so that vertices which are never
+    shown don't pay for them. Decorations can't be added while painting,
+    they are added right after. """
+
+    def __init__(self):
+        self.__pending = []
+        self.__scheduled = False
+
+    def request(self, item):
+        self.__pending.append(item)
+        if not self.__scheduled:
+            self.__scheduled = True
+            qt.QtCore.QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        self.__scheduled = False
+        pending, self.__pending = self.__pending, []
+        for item in pending:
+            try:
+                item.decorate()
+            except RuntimeError:
+                # the item has been deleted meanwhile
+                pass
+
+
+decorationDispatcher = DecorationDispatcher()
+
+
+class PaintCache(object):
+    """ Brushes and pens shared by all the items of all the scenes, built
+    once per combination of colors instead of at each paint.
+
+    Vertex gradients are in object bounding mode, they don't depend on
+    the size of the vertex. """
+
+    def __init__(self):
+        self.__brushes = {}
+        self.__pens = {}
+
+    def vertex_brush(self, top, bottom, inverted=False, stops=(0., 1.)):
+        key = ("vertex", top.rgba(), bottom.rgba(), inverted, stops)
+        brush = self.__brushes.get(key)
+        if brush is None:
+            if inverted:
+                top, bottom = bottom, top
+            gradient = qt.QtGui.QLinearGradient(0., 0., 0., 1.)
+            gradient.setCoordinateMode(qt.QtGui.QGradient.ObjectBoundingMode)
+            gradient.setColorAt(stops[0], top)
+            gradient.setColorAt(stops[1], bottom)
+            brush = qt.QtGui.QBrush(gradient)
+            self.__brushes[key] = brush
+        return brush
+
+    def port_brush(self, color, highlighted):
+        """ color is the color of the interface of the port or None """
+        key = ("port", None if color is None else color.rgba(), highlighted)
+        brush = self.__brushes.get(key)
+        if brush is None:
+            gradient = qt.QtGui.QLinearGradient(0, 0, 10, 0)
+            if highlighted:
+                gradient.setColorAt(1, qt.QtGui.QColor(qt.QtCore.Qt.red).lighter(120))
+                gradient.setColorAt(0, qt.QtGui.QColor(qt.QtCore.Qt.darkRed).lighter(120))
+            elif color is None:
+                gradient.setColorAt(0.8, qt.QtGui.QColor(qt.QtCore.Qt.yellow).lighter(120))
+                gradient.setColorAt(0.2, qt.QtGui.QColor(qt.QtCore.Qt.darkYellow).lighter(120))
+            else:
+                gradient.setColorAt(0.8, color.lighter(120))
+                gradient.setColorAt(0.2, color.lighter(120))
+            brush = qt.QtGui.QBrush(gradient)
+            self.__brushes[key] = brush
+        return brush
+
+    def brush(self, color, style=qt.QtCore.Qt.SolidPattern):
+        key = ("plain", color.rgba(), style)
+        brush = self.__brushes.get(key)
+        if brush is None:
+            brush = qt.QtGui.QBrush(color, style)
+            self.__brushes[key] = brush
+        return brush
+
+    def pen(self, color, width=0, style=qt.QtCore.Qt.SolidLine):
+        key = (color.rgba(), width, style)
+        pen = self.__pens.get(key)
+        if pen is None:
+            pen = qt.QtGui.QPen(color, width, style)
+            self.__pens[key] = pen
+        return pen
+
+
+paintCache = PaintCache()
+
+black = qt.QtGui.QColor(qt.QtCore.Qt.black)
+
+
+def level_of_detail(painter, option):
+    """ Scale at which an item is painted, 1 at 100% zoom """
+    return option.levelOfDetailFromTransform(painter.worldTransform())
+
+
+class CaptionItem(qt.QtGui.QGraphicsSimpleTextItem):
+    """ Caption of a vertex, not painted when it is too small to be read """
+
+    minLevelOfDetail = 0.5
+
+    def paint(self, painter, option, widget):
+        if level_of_detail(painter, option) < self.minLevelOfDetail:
+            return
+        qt.QtGui.QGraphicsSimpleTextItem.paint(self, painter, option, widget)
+
+
 class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
                                   qtutils.AleaQGraphicsRoundedRectItem,
                                   ):
@@ -50,12 +285,14 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
     default_pen_color = qt.QtGui.QColor(qt.QtCore.Qt.darkGray)
     default_pen_selected_color = qt.QtGui.QColor(qt.QtCore.Qt.lightGray)
     default_pen_error_color = qt.QtGui.QColor(qt.QtCore.Qt.red)
+    default_pen_dirty_color = qt.QtGui.QColor(255, 144, 0, 255)
 
     default_top_color = qt.QtGui.QColor(200, 200, 200, 255)
     default_bottom_color = qt.QtGui.QColor(140, 140, 255, 255)
     default_error_color = qt.QtGui.QColor(255, 0, 0, 255)
     default_user_application_color = qt.QtGui.QColor(255, 144, 0, 200)
     default_unlazy_color = qt.QtGui.QColor(200, 255, 160, 255)
+    default_memo_hit_color = qt.QtGui.QColor(160, 220, 255, 255)
 
     # gradient stops
     startPos = 0.0
@@ -73,6 +310,16 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
 
     maxTipLength = 400
 
+    # Below this scale the vertex is painted as a flat rectangle
+    flatLevelOfDetail = 0.4
+
+    # Show the busy marker during evaluation ("EvalCue" setting).
+    # Shared by all the vertices and refreshed when the settings change.
+    evalCue = None
+    # No drop shadows and cached rendering ("FastRendering" setting).
+    fastRendering = False
+    __settingsObserver = None
+
     def __init__(self, vertex, graph, parent=None):
         qtutils.AleaQGraphicsRoundedRectItem.__init__(self,
                                                       self.default_corner_radius, True,
@@ -95,7 +342,7 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
                                                      center=True,
                                                      mins=(ph, ph))
         # Caption
-        self._caption = qt.QtGui.QGraphicsSimpleTextItem(self)
+        self._caption = CaptionItem(self)
         self.vLayout.addItem(self._caption)
         # out ports
         self.outPortLayout = qtutils.HorizontalLayout(parent=self.vLayout,
@@ -118,24 +365,20 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
         self._busyItem.setAcceptedMouseButtons(qt.QtCore.Qt.NoButton)
         self._busyItem.setVisible(False)
 
-        # Clock image when the vertex has a delay
-        self._delayItem = qt.QtSvg.QGraphicsSvgItem(":icons/clock.svg", self)
-        self._delayItem.setAcceptedMouseButtons(qt.QtCore.Qt.NoButton)
-        self._delayItem.setVisible(False)
+        # Clock image when the vertex has a delay, created when needed
+        self._delayItem = None
+        self._delayText = None
 
-        self._delayText = qt.QtGui.QGraphicsSimpleTextItem("0", self._delayItem)
-        self._delayText.setFont(qt.QtGui.QFont("ariana", 6))
-        self._delayText.setBrush(qt.QtGui.QBrush(qt.QtGui.QColor(255, 0, 0, 200)))
-        self._delayText.setZValue(self._delayItem.zValue() + 1)
-        self._delayText.setVisible(False)
+        # Heat map of the execution time, created when profiled
+        self._profileItem = None
+        self._profileText = None
 
         # ----- drawing nicities -----
-        self.setPen(qt.QtGui.QPen(qt.QtCore.Qt.black, self.pen_width))
-        if safeEffects:
-            fx = qt.QtGui.QGraphicsDropShadowEffect()
-            fx.setOffset(2, 2)
-            fx.setBlurRadius(5)
-            self.setGraphicsEffect(fx)
+        self.setPen(paintCache.pen(black, self.pen_width))
+        if self.evalCue is None:
+            self.read_settings()
+        self.__decorated = True
+        self.set_fast_rendering(self.fastRendering)
 
     def initialise_from_model(self):
         vertex = self.vertex()
@@ -160,7 +403,7 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
         self.set_graphical_tooltip(vertex.get_tip())
         self.set_graphical_caption(vertex.caption)
         # self.refresh_geometry() already done by set_graphical_caption
-        self.update_colors()  # last because gradient depends on geometry
+        self.update_colors()  # brushes shared through the PaintCache
 
     def terminate_from_model(self):
         vertex = self.vertex()
@@ -189,14 +432,79 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
         visible = not self.all_inputs_visible() and self.isVisible()
         self.hiddenPortItem.setVisible(visible)
 
+    def set_fast_rendering(self, fast):
+        """ Drop the shadow of the vertex and paint it from a pixmap
+        cache, or restore the shadow and paint it directly """
+        if fast:
+            self.setGraphicsEffect(None)
+            self.setCacheMode(qt.QtGui.QGraphicsItem.DeviceCoordinateCache)
+            self.__decorated = True
+        else:
+            self.setCacheMode(qt.QtGui.QGraphicsItem.NoCache)
+            # the drop shadow is added when the vertex is first painted
+            self.__decorated = not safeEffects or self.graphicsEffect() is not None
+
+    def decorate(self):
+        """ Add the drop shadow of the vertex """
+        if self.fastRendering:
+            return
+        fx = qt.QtGui.QGraphicsDropShadowEffect()
+        fx.setOffset(2, 2)
+        fx.setBlurRadius(5)
+        self.setGraphicsEffect(fx)
+
     def update_delay_item(self):
         visible = self.vertex().delay > 0
+        if self._delayItem is None:
+            if not visible:
+                return
+            self._delayItem = qt.QtSvg.QGraphicsSvgItem(":icons/clock.svg", self)
+            self._delayItem.setAcceptedMouseButtons(qt.QtCore.Qt.NoButton)
+            self._delayText = qt.QtGui.QGraphicsSimpleTextItem("0", self._delayItem)
+            self._delayText.setFont(qt.QtGui.QFont("ariana", 6))
+            self._delayText.setBrush(qt.QtGui.QBrush(qt.QtGui.QColor(255, 0, 0, 200)))
+            self._delayText.setZValue(self._delayItem.zValue() + 1)
+            self.layout_items()
         self._delayItem.setVisible(visible and self.isVisible())
         self._delayText.setVisible(visible and self.isVisible())
         if visible:
             self._delayText.setText(str(self.vertex().delay))
 
+    def update_profile_item(self):
+        """ Cover the vertex with a color going from green to red with its
+        execution time relative to the slowest vertex of the graph """
+        scene = self.scene()
+        profile = None
+        if scene is not None and scene.get_graph() is not None:
+            profiler = get_profiler(scene.get_graph())
+            if profiler.enabled:
+                profile = profiler.get(self.vertex())
+
+        if profile is None:
+            if self._profileItem is not None:
+                self._profileItem.setVisible(False)
+            return
+
+        if self._profileItem is None:
+            self._profileItem = qt.QtGui.QGraphicsRectItem(self)
+            self._profileItem.setPen(qt.QtGui.QPen(qt.QtCore.Qt.NoPen))
+            self._profileItem.setAcceptedMouseButtons(qt.QtCore.Qt.NoButton)
+            self._profileItem.setZValue(-1) # below the ports and caption
+            self._profileText = qt.QtGui.QGraphicsSimpleTextItem(self._profileItem)
+            self._profileText.setFont(qt.QtGui.QFont("ariana", 6))
+
+        ratio = profile.wall / max(profiler.max_wall(), 1e-9)
+        color = qt.QtGui.QColor.fromHsvF((1. - ratio) / 3., 1., 1., 0.5)
+        rect = self.rect()
+        self._profileItem.setBrush(qt.QtGui.QBrush(color))
+        self._profileItem.setRect(rect)
+        self._profileText.setText("%.3g s (%i)" % (profile.wall, profile.calls))
+        self._profileText.setPos(rect.left(), rect.bottom() + 1)
+        self._profileItem.setVisible(True)
+
     def update_colors(self):
+        if deferredConstruction.defer(self):
+            return
         self.__topColor = self.default_top_color
         self.__bottomColor = self.default_bottom_color
         self.__penColor = self.default_pen_color
@@ -212,23 +520,27 @@ class ObserverOnlyGraphicalVertex(qtgraphview.Vertex,
             elif not self.vertex().lazy:
                 self.__topColor = self.default_unlazy_color
                 self.__bottomColor = self.__topColor.darker()
+            elif memo.get_memo_status(self.vertex()) == memo.HIT:
+                # outputs of the last evaluation taken from the cache
+                self.__topColor = self.default_memo_hit_color
+                self.__bottomColor = self.__topColor.darker()
         else:
             userColor = self.get_view_data("userColor")
             if userColor:
                 self.__topColor = qt.QtGui.QColor(*userColor)
                 self.__bottomColor = qt.QtGui.QColor(*userColor)
 
-        pen = self.pen()
-        pen.setColor(self.__penColor)
-
-        gradient = qt.QtGui.QLinearGradient(self.rect().topLeft(),
-                                            self.rect().bottomLeft())
-        gradient.setColorAt(self.startPos, self.__topColor)
-        gradient.setColorAt(self.endPos, self.__bottomColor)
-        brush = qt.QtGui.QBrush(gradient)
+        if dirty.is_dirty(self.vertex()) and not self.vertex().raise_exception:
+            # outputs are out of date
+            pen = paintCache.pen(self.default_pen_dirty_color, self.pen_width,
+                                 qt.QtCore.Qt.DashLine)
+        else:
+            pen = paintCache.pen(self.__penColor, self.pen_width)
 
         self.setPen(pen)
-        self.setBrush(brush)
+        self.setBrush(paintCache.vertex_brush(self.__topColor, self.__bottomColor,
+                                              self.isSelected(),
+                                              (self.startPos, self.endPos)))
 
     def set_graphical_caption(self, caption):
         """Sets the name displayed in the vertex widget, doesn't change
@@ -248,6 +560,32 @@ the vertex data"""
             rawtooltip += "...\nSee Help tab for complete documentation"
         self.setToolTip(rawtooltip)
 
+    def mark_dirty(self):
+        """ An input was modified by the user : mark the vertex and the
+        vertices downstream as out of date """
+        scene = self.scene()
+        if scene is None:
+            return
+        graph = scene.get_graph()
+        if graph is None or evaluation.is_evaluating(graph):
+            return
+        dirty.mark_modified(graph, self.vertex().get_id())
+
+    @classmethod
+    def read_settings(cls):
+        """ Read the settings shared by all the vertices """
+        settings = get_settings_cache()
+        if ObserverOnlyGraphicalVertex.__settingsObserver is None:
+            obs = SettingsObserver(cls.read_settings)
+            obs.initialise(settings)
+            ObserverOnlyGraphicalVertex.__settingsObserver = obs
+
+        evalCue = bool(settings.get("UI", "EvalCue", True))
+        ObserverOnlyGraphicalVertex.evalCue = evalCue
+        ObserverOnlyGraphicalVertex.fastRendering = \
+            bool(settings.get("UI", "FastRendering", False))
+        return evalCue
+
     ####################
     # Observer methods #
     ####################
@@ -263,12 +601,14 @@ the vertex data"""
         if event is None:
             return
 
-        try:
-            refresh = eval(Settings().get("UI", "EvalCue"))
-        except:
-            refresh = True
+        refresh = self.evalCue
+        if refresh is None:
+            refresh = self.read_settings()
 
         eventTopKey = event[0]
+        if eventTopKey == "metadata_changed" and event[1] == "position" and \
+               deferredConstruction.move(self, sender, event):
+            return
         if eventTopKey == "close":
             if self.__editor:
                 self.__editor.close()
@@ -280,8 +620,10 @@ the vertex data"""
             key = event[1]
             if key == "delay":
                 self.update_delay_item()
-            elif key == "lazy" or key == "blocked" or key == "user_application":
+            elif key in ("lazy", "blocked", "user_application", "memo", "dirty"):
                 self.update_colors()
+            elif key == "profile":
+                self.update_profile_item()
         elif eventTopKey == "metadata_changed":
             if event[1] == "userColor":
                 if event[2] is None:
@@ -296,13 +638,15 @@ the vertex data"""
             self.update_hidden_port_item()
         elif(eventTopKey == "tooltip_modified"):
             self.set_graphical_tooltip(event[1])
+        elif eventTopKey == "input_modified":
+            self.mark_dirty()
+        elif eventTopKey == "stop_eval":
+            dirty.set_dirty(self.vertex(), False)
         if refresh:
             if(eventTopKey == "start_eval"):
-                self._busyItem.setVisible(self.isVisible())
-                qt.QtGui.QApplication.processEvents()
+                busyMarkerDispatcher.set_busy(self, True)
             elif(eventTopKey == "stop_eval"):
-                self._busyItem.setVisible(False)
-                qt.QtGui.QApplication.processEvents()
+                busyMarkerDispatcher.set_busy(self, False)
         elif(eventTopKey == "input_port_added"):
             self.add_port(event[1])
         elif(eventTopKey == "output_port_added"):
@@ -358,6 +702,8 @@ the vertex data"""
         geom = self.vLayout.boundingRect(force=True)
         self.vLayout.setPos(qt.QtCore.QPointF(0., 0.))
         self._busyItem.setPos(0, 0)
+        if self._delayItem is None:
+            return geom
 
         diBr = self._delayItem.boundingRect()
         dtBr = self._delayText.boundingRect()
@@ -368,6 +714,8 @@ the vertex data"""
         return geom
 
     def refresh_geometry(self):
+        if deferredConstruction.defer(self):
+            return
         halfPortH = GraphicalPort.HEIGHT / 2
         geom = self.layout_items().adjusted(-self.pen_width,
                                             halfPortH - self.pen_width,
@@ -375,21 +723,28 @@ the vertex data"""
                                             -(halfPortH - self.pen_width))
         self.setRect(geom)
         self.refresh_cached_shape()
+        if getattr(self, "_profileItem", None) is not None:
+            self.update_profile_item()
 
     ################
     # Drawing Code #
     ################
     def paint(self, painter, options, widget):
+        if not self.__decorated:
+            self.__decorated = True
+            decorationDispatcher.request(self)
+        if level_of_detail(painter, options) < self.flatLevelOfDetail:
+            painter.setPen(paintCache.pen(self.pen().color()))
+            painter.setBrush(paintCache.brush(self.__topColor))
+            painter.drawRect(self.rect())
+            return
         path = self.shape()
-        pen = self.pen()
-        brush = self.brush()
-        painter.setPen(pen)
-        painter.setBrush(brush)
+        painter.setPen(self.pen())
+        painter.setBrush(self.brush())
         painter.drawPath(path)
 
         if(self.vertex().block):
-            brush.setStyle(qt.QtCore.Qt.BDiagPattern)
-            painter.setBrush(brush)
+            painter.setBrush(paintCache.brush(black, qt.QtCore.Qt.BDiagPattern))
             painter.drawPath(path)
 
     ################
@@ -399,22 +754,17 @@ the vertex data"""
         if change == qt.QtGui.QGraphicsItem.ItemSelectedChange:
             selected = bool(value)
             pen = self.pen()
-            brush = self.brush()
-            gradient = brush.gradient()
             if selected:
-                pen.setColor(self.default_pen_selected_color)
-                if gradient:  # invert the gradient
-                    gradient.setColorAt(self.endPos, self.__topColor)
-                    gradient.setColorAt(self.startPos, self.__bottomColor)
+                color = self.default_pen_selected_color
                 scene = self.scene()
                 scene.focusedItemChanged.emit(scene, self)
             else:
-                pen.setColor(self.default_pen_color)
-                if gradient:  # invert the gradient
-                    gradient.setColorAt(self.startPos, self.__topColor)
-                    gradient.setColorAt(self.endPos, self.__bottomColor)
-            self.setPen(pen)
-            self.setBrush(brush)
+                color = self.default_pen_color
+            # the gradient is inverted when the vertex is selected
+            self.setPen(paintCache.pen(color, pen.widthF(), pen.style()))
+            self.setBrush(paintCache.vertex_brush(self.__topColor, self.__bottomColor,
+                                                  selected,
+                                                  (self.startPos, self.endPos)))
 
         qtgraphview.Vertex.itemChange(self, change, value)
         return qt.QtGui.QGraphicsRectItem.itemChange(self, change, value)
@@ -431,11 +781,7 @@ class GraphicalVertex(ObserverOnlyGraphicalVertex):
     def mouseDoubleClickEvent(self, event):
         if event.button() == qt.QtCore.Qt.LeftButton:
             # Read settings
-            try:
-                localsettings = Settings()
-                str = localsettings.get("UI", "DoubleClick")
-            except:
-                str = "['open']"
+            str = get_settings_cache().get("UI", "DoubleClick", ['open'])
 
             operator = GraphOperator(graph=self.graph(),
                                      graphScene=self.scene())
@@ -525,7 +871,8 @@ class GraphicalInVertex(GraphicalVertex):
 
     def initialise_from_model(self):
         GraphicalVertex.initialise_from_model(self)
-        self.polishEvent()
+        if not deferredConstruction.is_active():
+            self.polishEvent()
 
     def polishEvent(self):
         # fix input or output node position
@@ -546,7 +893,8 @@ class GraphicalOutVertex(GraphicalVertex):
 
     def initialise_from_model(self):
         GraphicalVertex.initialise_from_model(self)
-        self.polishEvent()
+        if not deferredConstruction.is_active():
+            self.polishEvent()
 
     def polishEvent(self):
         # fix input or output node position
@@ -572,6 +920,8 @@ class HiddenPort (qt.QtGui.QGraphicsItem):
     """Graphical representation of hidden ports"""
     __size = qt.QtCore.QSizeF(15., 4.)
     __nosize = qt.QtCore.QSizeF(0.0, 0.0)
+    __color = qt.QtGui.QColor(50, 50, 50, 200)
+    __dots = [qt.QtCore.QRectF(i * 5., 0., 4., 4.) for i in (0, 1, 2)]
 
     def __init__(self, parent):
         """"""
@@ -601,11 +951,13 @@ class HiddenPort (qt.QtGui.QGraphicsItem):
     def paint(self, painter, option, widget):
         if not self.isVisible():
             return
+        if level_of_detail(painter, option) < GraphicalPort.minLevelOfDetail:
+            return
         painter.setBackgroundMode(qt.QtCore.Qt.TransparentMode)
-        painter.setBrush(qt.QtGui.QBrush(qt.QtGui.QColor(50, 50, 50, 200)))
-        painter.setPen(qt.QtGui.QPen(qt.QtCore.Qt.black, 0))
-        for i in (0, 1, 2):
-            painter.drawEllipse(qt.QtCore.QRectF(i * 5., 0., 4., 4.))
+        painter.setBrush(paintCache.brush(self.__color))
+        painter.setPen(paintCache.pen(black))
+        for rect in self.__dots:
+            painter.drawEllipse(rect)
 
 
 # --------------------------- ConnectorType ---------------------------------
@@ -616,13 +968,20 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
     WIDTH = 7.0
     HEIGHT = 7.0
 
+    # Below this scale the ports are not painted
+    minLevelOfDetail = 0.4
+
+    __rect = qt.QtCore.QRectF(0, 0, WIDTH, HEIGHT)
+
     def __init__(self, parent, port):
         """
 """
         qt.QtGui.QGraphicsEllipseItem.__init__(self, 0, 0, self.WIDTH, self.HEIGHT, parent)
         qtgraphview.Connector.__init__(self, observed=port)
         self.__interfaceColor = None
+        self.__tooltipDirty = True
         self.set_connection_modifiers(qt.QtCore.Qt.NoModifier)
+        self.setAcceptHoverEvents(True)
         self.initialise_from_model()
 
     port = baselisteners.GraphElementListenerBase.get_observed
@@ -656,7 +1015,8 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
             return
 
         if(event[0] in ["tooltip_modified", "stop_eval"]):
-            self.__update_tooltip()
+            # the tooltip is computed when the mouse enters the port
+            self.__tooltipDirty = True
         elif(event[0] == "metadata_changed"):
             if(sender == self.port()):
                 if(event[1] == "hide"):
@@ -677,16 +1037,14 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
             data = node.get_output(self.port().get_id())
         elif isinstance(self.port(), InputPort):
             data = node.get_input(self.port().get_id())
-        try:
-            s = str(data)
-        except:
-            s = ''
-        if(len(s) > self.MAX_TIPLEN):
-            s = "String too long..."
-            self.setToolTip(s)
         else:
-            #self.setToolTip("Value: " + s)
-            self.setToolTip(self.port().get_tip(data))
+            data = None
+        if data is None:
+            # no value : the tip of the port only
+            self.setToolTip(self.port().get_tip())
+        else:
+            self.setToolTip(self.port().get_tip(summarize(data, self.MAX_TIPLEN)))
+        self.__tooltipDirty = False
 
     def get_id(self):
         return self.port().get_id()
@@ -694,6 +1052,11 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
     ##################
     # QtWorld-Events #
     #################
+    def hoverEnterEvent(self, event):
+        if self.__tooltipDirty:
+            self.__update_tooltip()
+        qt.QtGui.QGraphicsEllipseItem.hoverEnterEvent(self, event)
+
     def contextMenuEvent(self, event):
         if isinstance(self.port(), OutputPort):
             operator = GraphOperator(graph=self.graph,
@@ -703,6 +1066,12 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
             menu.addAction(operator("Send to pool", menu, "port_send_to_pool"))
             menu.addAction(operator("Send to console", menu, "port_send_to_console"))
             menu.addAction(operator("Print", menu, "port_print_value"))
+            menu.addSeparator()
+            action = operator("Keep value", menu, "port_pin_value")
+            action.setCheckable(True)
+            action.setChecked(memory.is_pinned(self.port().vertex(),
+                                               self.port().get_id()))
+            menu.addAction(action)
             menu.show()
             menu.move(event.screenPos())
             event.accept()
@@ -710,23 +1079,12 @@ class GraphicalPort(qt.QtGui.QGraphicsEllipseItem, qtgraphview.Connector):
     def paint(self, painter, option, widget):
         if(not self.isVisible()):
             return
-        pos = self.pos()
+        if level_of_detail(painter, option) < self.minLevelOfDetail:
+            return
         painter.setBackgroundMode(qt.QtCore.Qt.TransparentMode)
-        gradient = qt.QtGui.QLinearGradient(0, 0, 10, 0)
-        if self.highlighted:
-            gradient.setColorAt(1, qt.QtGui.QColor(qt.QtCore.Qt.red).lighter(120))
-            gradient.setColorAt(0, qt.QtGui.QColor(qt.QtCore.Qt.darkRed).lighter(120))
-        else:
-            if self.__interfaceColor is None:
-                gradient.setColorAt(0.8, qt.QtGui.QColor(qt.QtCore.Qt.yellow).lighter(120))
-                gradient.setColorAt(0.2, qt.QtGui.QColor(qt.QtCore.Qt.darkYellow).lighter(120))
-            else:
-                gradient.setColorAt(0.8, self.__interfaceColor.lighter(120))
-                gradient.setColorAt(0.2, self.__interfaceColor.lighter(120))
-
-        painter.setBrush(qt.QtGui.QBrush(gradient))
-        painter.setPen(qt.QtGui.QPen(qt.QtCore.Qt.black, 0))
-        painter.drawEllipse(qt.QtCore.QRectF(0, 0, self.WIDTH, self.HEIGHT))
+        painter.setBrush(paintCache.port_brush(self.__interfaceColor, self.highlighted))
+        painter.setPen(paintCache.pen(black))
+        painter.drawEllipse(self.__rect)
 
     itemChange = mixin_method(qtgraphview.Connector, qt.QtGui.QGraphicsItem,
                               "itemChange")
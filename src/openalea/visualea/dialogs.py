@@ -31,6 +31,9 @@ from openalea.core.interface import *
 from openalea.core.session import Session
 from openalea.core.node import Factory, Node
 
+from openalea.visualea.node_index import get_node_index
+from openalea.visualea.settings_cache import get_settings_cache
+
 
 for name in [
     "ioconfig",
@@ -620,6 +623,13 @@ class PreferencesDialog(qt.QtGui.QDialog, ui_preferences.Ui_Preferences):
         except:
             self.evalCue.setCheckState(qt.QtCore.Qt.Unchecked)
 
+        try:
+            fast = eval(config.get("UI", "FastRendering"))
+            self.fastRendering.setCheckState(qt.QtCore.Qt.Checked if fast
+                                             else qt.QtCore.Qt.Unchecked)
+        except:
+            self.fastRendering.setCheckState(qt.QtCore.Qt.Unchecked)
+
         self.connect(self.addButton, qt.QtCore.SIGNAL("clicked()"), self.add_search_path)
         self.connect(self.removeButton, qt.QtCore.SIGNAL("clicked()"), self.remove_search_path)
 
@@ -677,7 +687,10 @@ class PreferencesDialog(qt.QtGui.QDialog, ui_preferences.Ui_Preferences):
         config.set("UI", "DoubleClick", repr(d[index]))
         config.set("UI", "EdgeStyle", edge_style)
         config.set("UI", "EvalCue", str(self.evalCue.checkState() == qt.QtCore.Qt.Checked))
+        config.set("UI", "FastRendering",
+                   str(self.fastRendering.checkState() == qt.QtCore.Qt.Checked))
         config.write()
+        get_settings_cache().changed()
 
         if edge_style != self.edge_style:
             self.edge_style = edge_style
@@ -1017,7 +1030,7 @@ class NodeChooser(qt.QtGui.QDialog, ui_nodechooser.Ui_NodeChooser):
         @param nb_outputs
         """
 
-        res = self.pman.search_node(name, nb_inputs, nb_outputs)
+        res = get_node_index().search(name, nb_inputs, nb_outputs)
         strs = []
 
         for f in res:
@@ -1028,6 +1041,23 @@ class NodeChooser(qt.QtGui.QDialog, ui_nodechooser.Ui_NodeChooser):
         strs.sort()
         self.comboBox.addItems(strs)
 
+    def search_compatible(self, inputs, outputs):
+        """ Add to combo box selector the nodes able to replace a node,
+        most similar first
+        @param inputs : input port descriptions of the node to replace
+        @param outputs : output port descriptions of the node to replace
+        """
+
+        res = get_node_index().compatible(inputs, outputs)
+        strs = []
+
+        for f in res:
+            key = "%s.%s" % (f.package.get_id().lower(), f.name)
+            self.map[key] = f
+            strs.append(key)
+
+        self.comboBox.addItems(strs)
+
     def get_selection(self):
         """ Return selected factory """
 
@@ -0,0 +1,130 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Tracking of the nodes whose outputs are out of date.
+
+When the user modifies an input of a node, the node and all the nodes
+downstream of it are marked dirty. So are the nodes downstream of an edge
+which is added or removed, and new nodes (see track). They are clean again
+once evaluated. Nodes whose outputs were released during an evaluation
+(see memory) are dirty too. Only the dirty nodes need to be evaluated to
+refresh the results.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import weakref
+
+from openalea.core import observer
+from openalea.visualea import memory
+
+# dirty nodes
+_dirty = weakref.WeakKeyDictionary()
+
+# graph -> GraphTracker
+_trackers = weakref.WeakKeyDictionary()
+
+
+def is_dirty(node):
+    return node in _dirty or memory.is_released(node)
+
+
+def set_dirty(node, dirty=True):
+    """ Change the dirty state of node and notify its listeners with
+    ("internal_state_changed", "dirty", dirty) """
+    if dirty == (node in _dirty):
+        return
+    if dirty:
+        _dirty[node] = True
+    else:
+        del _dirty[node]
+    node.notify_listeners(("internal_state_changed", "dirty", dirty))
+
+
+def downstream(graph, vid):
+    """ Return the set of vertices of graph reachable from vid, vid included """
+    cone = set()
+    stack = [vid]
+    while stack:
+        v = stack.pop()
+        if v in cone:
+            continue
+        cone.add(v)
+        for pid in graph.out_ports(v):
+            for npid in graph.connected_ports(pid):
+                stack.append(graph.vertex(npid))
+    return cone
+
+
+def mark_modified(graph, vid):
+    """ An input of vid was modified : mark its downstream cone dirty """
+    for v in downstream(graph, vid):
+        set_dirty(graph.node(v), True)
+
+
+def dirty_vertices(graph):
+    """ Return the set of dirty vertices of graph """
+    return set(vid for vid in graph.vertices() if is_dirty(graph.node(vid)))
+
+
+class GraphTracker(observer.AbstractListener):
+    """ Mark dirty the vertices of a graph whose inputs change with its
+    structure. Listens to the notifications of the graph """
+
+    def __init__(self, graph):
+        observer.AbstractListener.__init__(self)
+        # eid -> (source vid, target vid), the graph forgets removed edges
+        self.edges = dict((eid, (graph.source(eid), graph.target(eid)))
+                          for eid in graph.edges())
+
+    def notify(self, graph, event):
+        if not event:
+            return
+        key = event[0]
+        if key == "vertex_added":
+            node = event[1][1]
+            if "__graphitem__" not in node.__class__.__dict__: # annotations
+                set_dirty(node, True)
+        elif key == "edge_added":
+            eid = event[1][1]
+            src, dst = graph.source(eid), graph.target(eid)
+            self.edges[eid] = (src, dst)
+            mark_modified(graph, dst)
+        elif key == "edge_removed":
+            edge = self.edges.pop(event[1][1], None)
+            if edge is not None and graph.has_vertex(edge[1]):
+                mark_modified(graph, edge[1])
+        elif key == "vertex_removed":
+            vid = getattr(event[1][1], "get_id", lambda: None)()
+            for eid, (src, dst) in self.edges.items():
+                if vid in (src, dst):
+                    del self.edges[eid]
+                    if src == vid and graph.has_vertex(dst):
+                        mark_modified(graph, dst)
+
+
+def track(graph):
+    """ Mark dirty the vertices of graph whose inputs change when edges
+    and vertices are added or removed """
+    if graph in _trackers:
+        return
+    tracker = GraphTracker(graph)
+    _trackers[graph] = tracker
+    tracker.initialise(graph)
+
+
+def clear(graph):
+    """ Mark all the vertices of graph clean """
+    for vid in graph.vertices():
+        set_dirty(graph.node(vid), False)
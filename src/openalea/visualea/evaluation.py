@@ -0,0 +1,524 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Evaluation of dataflows outside of the GUI thread.
+
+The dataflow is evaluated in a worker thread. While it runs, the
+notify_listeners method of the graph, of its nodes and of their ports is
+replaced by a relay : notifications sent from the worker thread are queued
+and replayed in the GUI thread by a timer, so that the graphical items are
+only ever touched from the GUI thread.
+
+The relay is also where the worker thread checks for cancel and pause
+requests : before each node evaluation ("start_eval" notification).
+
+Nodes which need the GUI thread, e.g. to create widgets, are evaluated in
+the GUI thread while the worker thread waits (see needs_gui_thread). The
+whole evaluation runs in the GUI thread if the ("eval", "background")
+setting is False. While a graph is evaluated, its structure can't be
+edited (see is_evaluating).
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import threading
+import weakref
+import types
+import sys
+from collections import deque
+
+from openalea.vpltk.qt import qt
+from openalea.core import logger
+from openalea.core.compositenode import CompositeNode
+from openalea.core.algo.dataflow_evaluation import EvaluationException
+from openalea.visualea import memo
+from openalea.visualea import parallel_evaluation
+from openalea.visualea.profiler import get_profiler, profiled_eval
+from openalea.visualea import memory
+
+myLogger = logger.get_logger("openalea.visualea.evaluation")
+logger.connect_loggers_to_handlers(myLogger, logger.get_handler_names())
+
+
+class EvaluationCancelled(Exception):
+    """ Raised in the worker thread when the evaluation is cancelled """
+    pass
+
+
+# modules of GUI toolkits : the nodes whose code uses them are evaluated
+# in the GUI thread
+GUI_MODULES = ("PyQt4", "PyQt5", "PySide", "sip", "openalea.vpltk.qt",
+               "matplotlib.pyplot", "pylab", "Tkinter")
+
+# function -> True if its module uses a GUI toolkit
+_gui_functions = weakref.WeakKeyDictionary()
+
+
+def needs_gui_thread(node):
+    """ Return True if node must be evaluated in the GUI thread : its
+    gui_thread attribute (or the one of its factory) is True, or the module
+    of its code imports a GUI toolkit. Toolkits used through other modules
+    are not seen : such nodes must set gui_thread """
+    flag = getattr(node, "gui_thread", None)
+    if flag is None:
+        flag = getattr(getattr(node, "factory", None), "gui_thread", None)
+    if flag is not None:
+        return bool(flag)
+
+    func = memo.node_function(node)
+    if func is None:
+        return False
+    try:
+        return _gui_functions[func]
+    except KeyError:
+        pass
+    names = [getattr(value, "__name__", "")
+             for value in func.func_globals.itervalues()
+             if isinstance(value, types.ModuleType)]
+    gui = any(name == m or name.startswith(m + ".")
+              for name in names for m in GUI_MODULES)
+    _gui_functions[func] = gui
+    return gui
+
+
+def background_evaluation():
+    """ Return True if the dataflows are evaluated in a worker thread """
+    from openalea.visualea.settings_cache import get_settings_cache
+    return bool(get_settings_cache().get("eval", "background", True))
+
+
+def set_background_evaluation(enabled):
+    from openalea.core.settings import Settings
+    from openalea.visualea.settings_cache import get_settings_cache
+    config = Settings()
+    config.set("eval", "background", str(bool(enabled)))
+    config.write()
+    get_settings_cache().changed()
+
+
+class GuiCall(qt.QtCore.QObject):
+    """ Call functions in the GUI thread from an other thread, which waits
+    for their result. Must be created in the GUI thread """
+
+    called = qt.QtCore.Signal(object)
+
+    def __init__(self, parent=None):
+        qt.QtCore.QObject.__init__(self, parent)
+        self.called.connect(self.__call, qt.QtCore.Qt.BlockingQueuedConnection)
+
+    def __call(self, call):
+        call()
+
+    def __call__(self, func):
+        result = []
+        def call():
+            try:
+                result.append((True, func()))
+            except Exception:
+                result.append((False, sys.exc_info()))
+        self.called.emit(call)
+        ok, value = result[0]
+        if not ok:
+            raise value[0], value[1], value[2]
+        return value
+
+
+class EvaluationThread(qt.QtCore.QThread):
+    """ Call an evaluation function in a new thread """
+
+    def __init__(self, func, parent=None):
+        qt.QtCore.QThread.__init__(self, parent)
+        self.func = func
+        self.error = None
+        self.exc_info = None
+
+    def run(self):
+        try:
+            self.func()
+        except Exception, e:
+            self.error = e
+            self.exc_info = sys.exc_info()
+
+
+class EvaluationExecutor(qt.QtCore.QObject):
+    """ Run the evaluation of a dataflow in a worker thread.
+
+    Signals :
+        - started()
+        - progress(done, total) : number of evaluated nodes of the graph
+        - finished(error) : error is None, an EvaluationCancelled or the
+          exception raised by the evaluation.
+    """
+
+    started = qt.QtCore.Signal()
+    progress = qt.QtCore.Signal(int, int)
+    finished = qt.QtCore.Signal(object)
+
+    # Frequency of the replay of the notifications in the GUI thread
+    rate = 30.
+
+    def __init__(self, graph, parent=None):
+        qt.QtCore.QObject.__init__(self, parent)
+        self.graph = graph
+        self.exc_info = None
+        self.__thread = None
+        self.__guiThread = threading.current_thread()
+        self.__queue = deque()
+        self.__relays = []
+        self.__wrapped = []
+        self.__cache = None
+        self.__memoMinTime = 0.
+        self.__profiler = None
+        self.__releaser = None
+        self.__nodes = set()
+        self.__done = 0
+        self.__doneLock = threading.Lock()
+        self.__background = True
+        self.__guiCall = GuiCall(self)
+        self.__cancelled = False
+        self.__resumed = threading.Event()
+        self.__resumed.set()
+        self.__dispatching = False
+
+        self.__timer = qt.QtCore.QTimer(self)
+        self.__timer.setInterval(int(1000 / self.rate))
+        self.__timer.timeout.connect(self.dispatch)
+
+    def is_running(self):
+        return self.__thread is not None
+
+    def is_paused(self):
+        return self.is_running() and not self.__resumed.is_set()
+
+    def run(self, vtx_id=None):
+        """ Start the evaluation of the graph (of vtx_id and its
+        ancestors if given). Return False if an evaluation is running """
+        graph = self.graph
+        if vtx_id is None:
+            return self.start(graph.eval_as_expression)
+        else:
+            return self.start(lambda: graph.eval_as_expression(vtx_id))
+
+    def run_vertices(self, vids):
+        """ Start the evaluation of the vertices vids only, their other
+        parents being up to date. Return False if an evaluation is running """
+        graph = self.graph
+        if graph.eval_algo.strip("'\"") == "ParallelEvaluation":
+            workers = parallel_evaluation.nb_workers()
+        else:
+            workers = 1
+        evaluator = parallel_evaluation.ParallelEvaluation(graph)
+        return self.start(lambda: evaluator.eval_vertices(vids, workers), vids)
+
+    def start(self, func, vids=None):
+        """ Call func in the worker thread with the notifications of the
+        graph relayed. Progress is reported on the vertices vids
+        (default: all the vertices). Return False if an evaluation is running """
+        if self.is_running():
+            return False
+
+        self.__cancelled = False
+        self.__resumed.set()
+        self.__queue.clear()
+        self.__done = 0
+        if vids is None:
+            vids = [vid for vid in self.graph.vertices()
+                    if vid not in (self.graph.id_in, self.graph.id_out)]
+        self.__nodes = set(self.graph.node(vid) for vid in vids)
+        self.__cache = memo.get_output_cache()
+        self.__memoMinTime = memo.get_min_time()
+        self.__profiler = get_profiler(self.graph)
+        if not self.__profiler.enabled:
+            self.__profiler = None
+        if memory.releases_outputs(self.graph):
+            self.__releaser = memory.OutputReleaser(self.graph)
+        else:
+            self.__releaser = None
+        self.__background = background_evaluation()
+        self.__install(self.graph)
+
+        self.__thread = EvaluationThread(func)
+        self.started.emit()
+        self.progress.emit(0, len(self.__nodes))
+        if self.__background:
+            self.__thread.finished.connect(self.__on_thread_finished)
+            self.__timer.start()
+            self.__thread.start()
+        else:
+            # in the GUI thread, the relays notify directly
+            self.__thread.run()
+            self.__on_thread_finished()
+        return True
+
+    def cancel(self):
+        """ Stop the evaluation before the next node """
+        if self.is_running():
+            self.__cancelled = True
+            self.__resumed.set()
+
+    def pause(self):
+        """ Suspend the evaluation before the next node """
+        if self.is_running():
+            self.__resumed.clear()
+
+    def resume(self):
+        self.__resumed.set()
+
+    def dispatch(self):
+        """ Replay the queued notifications in the GUI thread """
+        if self.__dispatching:
+            return
+        self.__dispatching = True
+        try:
+            queue = self.__queue
+            while queue:
+                notify, event = queue.popleft()
+                try:
+                    notify(event)
+                except Exception:
+                    myLogger.exception("Notification of %r failed" % (event,))
+            self.progress.emit(self.__done, len(self.__nodes))
+        finally:
+            self.__dispatching = False
+
+    ###########################
+    # Notification relays     #
+    ###########################
+    def __install(self, graph):
+        """ Relay the notifications of graph, its nodes and their ports,
+        memoize the outputs of the nodes if the cache is enabled and
+        profile them if the profiler is enabled """
+        _busy[graph] = self
+        for vid in graph.vertices():
+            node = graph.node(vid)
+            self.__install_relay(node)
+            self.__install_eval(node)
+            for port in node.input_desc + node.output_desc:
+                self.__install_relay(port)
+            if isinstance(node, CompositeNode):
+                self.__install(node)
+        self.__install_relay(graph)
+
+    def __install_relay(self, obj):
+        if "notify_listeners" in obj.__dict__:
+            return # already relayed, eg. a composite node
+        original = obj.notify_listeners
+        try:
+            obj.notify_listeners = self.__make_relay(obj, original)
+        except AttributeError:
+            return
+        self.__relays.append(obj)
+
+    def __install_eval(self, node):
+        if "eval" in node.__dict__:
+            return
+        original = wrapped = node.eval
+        if self.__cache is not None and memo.is_memoizable(node):
+            wrapped = memo.memoized_eval(node, self.__cache, wrapped,
+                                         self.__memoMinTime)
+        if self.__profiler is not None:
+            wrapped = profiled_eval(node, self.__profiler, wrapped)
+        if self.__releaser is not None and node in self.__releaser.vids:
+            wrapped = memory.released_eval(node, self.__releaser, wrapped)
+        # also when the GUI thread evaluates : the parallel evaluator runs
+        # them in its calling thread, not in its pool
+        if needs_gui_thread(node):
+            wrapped = self.__gui_eval(node, wrapped)
+        if wrapped is not original:
+            node.eval = wrapped
+            self.__wrapped.append(node)
+
+    def __gui_eval(self, node, eval):
+        """ Return a function to be used as node.eval, which evaluates node
+        in the GUI thread """
+        def gui_eval():
+            if threading.current_thread() is self.__guiThread:
+                return eval()
+            # the relays of the GUI thread neither check nor count
+            self.__checkpoint()
+            def call():
+                self.dispatch() # keep the notifications in order
+                return eval()
+            ret = self.__guiCall(call)
+            if node in self.__nodes:
+                with self.__doneLock:
+                    self.__done += 1
+            return ret
+        return gui_eval
+
+    def __uninstall(self):
+        for graph, executor in _busy.items():
+            if executor is self:
+                del _busy[graph]
+        for obj in self.__relays:
+            try:
+                del obj.notify_listeners
+            except AttributeError:
+                pass
+        self.__relays = []
+        for node in self.__wrapped:
+            del node.eval
+        self.__wrapped = []
+
+    def __make_relay(self, obj, original):
+        queue = self.__queue
+        guiThread = self.__guiThread
+        ref = weakref.ref(self)
+
+        def relay(event=None):
+            if threading.current_thread() is guiThread:
+                return original(event)
+            executor = ref()
+            if executor is not None and event:
+                if event[0] == "start_eval":
+                    executor.__checkpoint()
+                elif event[0] == "stop_eval" and obj in executor.__nodes:
+                    with executor.__doneLock:
+                        executor.__done += 1
+            queue.append((original, event))
+        return relay
+
+    def __checkpoint(self):
+        """ Called in the worker thread before each node evaluation """
+        self.__resumed.wait()
+        if self.__cancelled:
+            raise EvaluationCancelled("Evaluation cancelled by the user")
+
+    def __on_thread_finished(self):
+        thread = self.__thread
+        thread.wait()
+        self.__timer.stop()
+        self.dispatch()
+        self.__uninstall()
+        self.__thread = None
+
+        error = thread.error
+        self.exc_info = thread.exc_info
+        if isinstance(error, EvaluationException) and \
+               isinstance(error.exception, EvaluationCancelled):
+            error = error.exception
+        if isinstance(error, EvaluationCancelled):
+            # the interrupted node is not in error.
+            self.__reset_exception_state(self.graph)
+        if self.__releaser is not None:
+            self.__releaser.report()
+            self.__releaser = None
+        if self.__profiler is not None:
+            # the heat map depends on the slowest node
+            for vid in self.graph.vertices():
+                self.graph.node(vid).notify_listeners(
+                    ("internal_state_changed", "profile", None))
+        self.finished.emit(error)
+
+    def __reset_exception_state(self, graph):
+        for vid in graph.vertices():
+            node = graph.node(vid)
+            if getattr(node, "raise_exception", False):
+                node.raise_exception = False
+                node.notify_listeners(("data_modified", None, None))
+            if isinstance(node, CompositeNode):
+                self.__reset_exception_state(node)
+
+
+# graph -> executor
+__executors__ = weakref.WeakKeyDictionary()
+
+# graph or composite node being evaluated -> executor
+_busy = weakref.WeakKeyDictionary()
+
+
+def get_executor(graph):
+    """ Return the executor of graph. There is only one executor per graph
+    so that a graph is never evaluated twice at the same time """
+    executor = __executors__.get(graph)
+    if executor is None:
+        executor = EvaluationExecutor(graph)
+        __executors__[graph] = executor
+    return executor
+
+
+class EvaluationProgress(qt.QtGui.QProgressDialog):
+    """ Non modal progress dialog of an executor, with cancel and pause """
+
+    def __init__(self, executor, title, parent=None):
+        qt.QtGui.QProgressDialog.__init__(self, title, "Cancel", 0, 0, parent)
+        self.setWindowTitle("Evaluation")
+        self.setAttribute(qt.QtCore.Qt.WA_DeleteOnClose)
+        self.setMinimumDuration(500)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.executor = executor
+        self.title = title
+
+        self.pauseButton = qt.QtGui.QPushButton("Pause", self)
+        self.pauseButton.setCheckable(True)
+        self.pauseButton.toggled.connect(self.__on_pause)
+
+        self.canceled.connect(executor.cancel)
+        executor.progress.connect(self.__on_progress)
+        executor.finished.connect(self.__on_finished)
+
+    def resizeEvent(self, event):
+        qt.QtGui.QProgressDialog.resizeEvent(self, event)
+        # the pause button is placed at the left of the cancel button
+        self.pauseButton.move(10, self.height() - self.pauseButton.height() - 10)
+
+    def __on_pause(self, checked):
+        if checked:
+            self.executor.pause()
+            self.setLabelText(self.title + " (paused)")
+        else:
+            self.executor.resume()
+            self.setLabelText(self.title)
+
+    def __on_progress(self, done, total):
+        self.setMaximum(total)
+        self.setValue(min(done, total))
+
+    def __on_finished(self, error):
+        self.executor.progress.disconnect(self.__on_progress)
+        self.executor.finished.disconnect(self.__on_finished)
+        self.close()
+
+
+def is_evaluating(graph):
+    """ Return True if graph is being evaluated, by its executor or as a
+    node of an other graph. Its structure must not be edited """
+    return graph in _busy
+
+
+def evaluate(graph, vtx_id=None, parent=None, vids=None):
+    """ Evaluate graph in background, show the progress and the errors.
+    If vids is given, only these vertices are evaluated.
+    Return the executor, or None if graph is already being evaluated """
+    from openalea.visualea.util import display_exception
+
+    executor = get_executor(graph)
+    if executor.is_running():
+        return None
+
+    dialog = EvaluationProgress(executor, "Evaluating %s" % (graph.get_caption(),),
+                                parent)
+
+    def on_finished(error):
+        executor.finished.disconnect(on_finished)
+        if error is not None and not isinstance(error, EvaluationCancelled):
+            display_exception(parent, error, executor.exc_info)
+
+    executor.finished.connect(on_finished)
+    if vids is not None:
+        executor.run_vertices(vids)
+    else:
+        executor.run(vtx_id)
+    return executor
@@ -22,6 +22,7 @@ from openalea.vpltk.qt import qt
 from openalea.core.observer import Observed
 from openalea.core.compositenode import CompositeNodeFactory
 from openalea.vpltk.qt.compat import to_qvariant
+from openalea.visualea import undo, evaluation
 
 
 class GraphOperator(Observed):
@@ -33,6 +34,39 @@ class GraphOperator(Observed):
     edgeType          = None
     globalInterpreter = None
 
+    # operators recorded in the undo stack of the graph, with their label
+    undoableOperators = {"graph_paste"                             : "Paste",
+                         "graph_cut"                               : "Cut",
+                         "graph_remove_selection"                  : "Delete",
+                         "graph_group_selection"                   : "Group",
+                         "graph_add_annotation"                    : "Add annotation",
+                         "graph_align_selection_horizontal"        : "Align",
+                         "graph_align_selection_left"              : "Align",
+                         "graph_align_selection_right"             : "Align",
+                         "graph_align_selection_mean"              : "Align",
+                         "graph_distribute_selection_horizontally" : "Distribute",
+                         "graph_distribute_selection_vertically"   : "Distribute",
+                         "graph_set_selection_color"               : "Color",
+                         "graph_use_user_color"                    : "Color",
+                         "vertex_set_color"                        : "Color",
+                         "vertex_use_user_color"                   : "Color",
+                         "vertex_remove"                           : "Delete",
+                         "vertex_replace"                          : "Replace",
+                         "vertex_set_caption"                      : "Caption",
+                         "annotation_change_style_simple"          : "Annotation style",
+                         "annotation_change_style_box"             : "Annotation style",
+                         }
+
+    # operators which change the graph, refused while it is evaluated
+    editOperators = set(undoableOperators).union(["graph_undo",
+                                                  "graph_redo",
+                                                  "graph_reset",
+                                                  "graph_configure_io",
+                                                  "graph_reload_from_factory",
+                                                  "vertex_reset",
+                                                  "vertex_reload",
+                                                  ])
+
     def __init__(self, graph, graphScene=None, clipboard=None, siblings=None, interpreter=None, graphAdapter=None):
         Observed.__init__(self)
 
@@ -104,6 +138,11 @@ class GraphOperator(Observed):
             argcount = func.func_code.co_argcount - len(defaults)
         else:
             argcount = func.func_code.co_argcount
+        label = self.undoableOperators.get(fName)
+        if label is not None:
+            func = self.__transaction(func, label)
+        if fName in self.editOperators:
+            func = self.__unless_evaluating(func)
         kwargs = kwargs or dict()
         #used for graph_operator methods that don't
         #handle the QAction's boolean sent by trigger
@@ -124,6 +163,28 @@ class GraphOperator(Observed):
         else:
             return wrappedGOPBool, argcount
 
+    def __transaction(self, func, label):
+        """ Record the modifications of the graph made by func as one
+        step of its undo stack """
+        def transaction(*args, **kwargs):
+            stack = undo.get_undo_stack(self.get_graph())
+            stack.begin(label)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.end()
+        return transaction
+
+    def __unless_evaluating(self, func):
+        """ Refuse to call func while the graph is evaluated """
+        def unless_evaluating(*args, **kwargs):
+            if evaluation.is_evaluating(self.get_graph()):
+                qt.QtGui.QMessageBox.information(self.get_sensible_parent(),
+                    "Evaluation", "The graph can't be edited while it is evaluated.")
+                return
+            return func(*args, **kwargs)
+        return unless_evaluating
+
     ###########
     # getters #
     ###########
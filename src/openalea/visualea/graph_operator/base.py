@@ -1,5 +1,69 @@
 
 
+import weakref
+from openalea.vpltk.qt import qt
+
+
+# scene -> [depth, index method] of its open batches
+_open = weakref.WeakKeyDictionary()
+
+
+class SceneBatch(object):
+    """ Shows many edits of the graph of a scene as one update of the
+    scene. To be used in a with statement around the edits.
+
+    The graph still notifies each change. Meanwhile the views are not
+    repainted and the vertices are laid out once, when the outermost batch
+    ends. The scene is not indexed during the batch if more than
+    indexThreshold items change : rebuilding the index costs O(scene).
+
+    @param scene : the scene of the graph, may be None
+    @param count : the number of items changed by the edits
+    """
+
+    indexThreshold = 100
+
+    def __init__(self, scene, count=0):
+        self.scene = scene
+        self.count = count
+
+    def __enter__(self):
+        scene = self.scene
+        if scene is None:
+            return self
+        from openalea.visualea.dataflowview import vertex
+        batch = _open.get(scene)
+        if batch is None:
+            batch = _open[scene] = [0, None]
+            for view in scene.views():
+                view.setUpdatesEnabled(False)
+        batch[0] += 1
+        if self.count > self.indexThreshold and batch[1] is None:
+            batch[1] = scene.itemIndexMethod()
+            scene.setItemIndexMethod(qt.QtGui.QGraphicsScene.NoIndex)
+        vertex.deferredConstruction.begin()
+        return self
+
+    def __exit__(self, *exc_info):
+        scene = self.scene
+        if scene is None:
+            return False
+        from openalea.visualea.dataflowview import vertex
+        batch = _open[scene]
+        batch[0] -= 1
+        try:
+            vertex.deferredConstruction.end()
+        finally:
+            if batch[0] == 0:
+                del _open[scene]
+                if batch[1] is not None:
+                    scene.setItemIndexMethod(batch[1])
+                for view in scene.views():
+                    view.setUpdatesEnabled(True)
+                    view.viewport().update()
+        return False
+
+
 class Base(object):
     def __init__(self, master):
         self.master = master
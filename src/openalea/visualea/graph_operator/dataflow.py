@@ -18,11 +18,16 @@ __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
 from openalea.vpltk.qt import qt
-from openalea.visualea.graph_operator.base import Base
+from openalea.visualea.graph_operator.base import Base, SceneBatch
 
-from openalea.visualea.util import open_dialog, exception_display, busy_cursor
+from openalea.visualea.util import open_dialog, exception_display
 from openalea.visualea.dialogs import NewGraph, FactorySelector
 from openalea.visualea.dialogs import IOConfigDialog
+from openalea.visualea import evaluation, dirty, memory, memo, undo, clipboard
+from openalea.visualea.profiler import get_profiler, refresh_nodes
+from openalea.visualea.profileview import ProfileView
+from openalea.visualea.sweepview import SweepWidget
+from openalea.visualea import parallel_evaluation # registers ParallelEvaluation
 
 from openalea.core.compositenode import CompositeNodeFactory
 from openalea.core.pkgmanager import PackageManager
@@ -34,11 +39,90 @@ from compositenode_inspector import InspectorView
 class DataflowOperators(Base):
 
     @exception_display
-    @busy_cursor
     def graph_run(self):
         master = self.master
-        master.get_graph().eval_as_expression()
+        evaluation.evaluate(master.get_graph(), parent=master.get_sensible_parent())
 
+    @exception_display
+    def graph_run_dirty(self):
+        """ Evaluate only the nodes whose inputs were modified and the
+        nodes downstream of them """
+        master = self.master
+        graph = master.get_graph()
+        vids = dirty.dirty_vertices(graph)
+        if vids:
+            evaluation.evaluate(graph, parent=master.get_sensible_parent(),
+                                vids=vids)
+
+    def graph_toggle_profiling(self, checked):
+        """ Record the execution time of the nodes in the next evaluations
+        and show them as a heat map """
+        graph = self.master.get_graph()
+        get_profiler(graph).enabled = checked
+        refresh_nodes(graph)
+
+    def graph_show_profile(self):
+        master = self.master
+        graph = master.get_graph()
+        view = ProfileView(get_profiler(graph), graph)
+        open_dialog(master.get_sensible_parent(), view,
+                    "Profile of " + graph.get_caption())
+
+    def graph_toggle_background_evaluation(self, checked):
+        """ Evaluate in a worker thread, or in the GUI thread """
+        evaluation.set_background_evaluation(checked)
+
+    def graph_toggle_memoize(self, checked):
+        """ Reuse the outputs of lazy nodes evaluated with the same code
+        and inputs in the next evaluations """
+        memo.set_memoize(checked)
+
+    def graph_toggle_release_outputs(self, checked):
+        """ Release the intermediate outputs during the next evaluations """
+        memory.set_release_outputs(self.master.get_graph(), checked)
+
+    def graph_sweep(self):
+        """ Evaluate the factory of the graph for ranges of input values """
+        master = self.master
+        widget = master.get_sensible_parent()
+        graph = master.get_graph()
+        factory = graph.factory
+        if factory is None or factory.package is None:
+            qt.QtGui.QMessageBox.warning(widget, "Parameter sweep",
+                                         "Save the graph in a package first.")
+            return
+        inputs = [(desc["name"], graph.get_input(i))
+                  for i, desc in enumerate(graph.input_desc)]
+        open_dialog(widget, SweepWidget(factory, inputs),
+                    "Parameter sweep of " + factory.name)
+
+    def graph_cancel_evaluation(self):
+        evaluation.get_executor(self.master.get_graph()).cancel()
+
+    def graph_pause_evaluation(self):
+        evaluation.get_executor(self.master.get_graph()).pause()
+
+    def graph_resume_evaluation(self):
+        evaluation.get_executor(self.master.get_graph()).resume()
+
+
+    @exception_display
+    def graph_undo(self):
+        """ Undo the last edit of the graph """
+        master = self.master
+        stack = undo.get_undo_stack(master.get_graph())
+        count = stack.undo_list[-1].count() if stack.can_undo() else 0
+        with SceneBatch(master.get_graph_scene(), count):
+            stack.undo()
+
+    @exception_display
+    def graph_redo(self):
+        """ Redo the last undone edit of the graph """
+        master = self.master
+        stack = undo.get_undo_stack(master.get_graph())
+        count = stack.redo_list[-1].count() if stack.can_redo() else 0
+        with SceneBatch(master.get_graph_scene(), count):
+            stack.redo()
 
     def graph_reset(self):
         master = self.master
@@ -59,26 +143,24 @@ class DataflowOperators(Base):
 
 
     def graph_remove_selection(self, items=None):
+        """ Remove the selected vertices, annotations and edges at once """
         master = self.master
-        def cmp(a,b):
-            """edges need to be deleted before any other element"""
-            if type(a) == master.edgeType and type(b) == master.vertexType : return -1
-            if type(a) == type(b) : return 0
-            return 1
-
         scene = master.get_graph_scene()
         if(not items): items = scene.get_selected_items()
         if(not items): return
-        items.sort(cmp)
+        adapter = scene.get_adapter()
+        vertices, edges = [], []
         for i in items:
             if isinstance(i, master.vertexType):
-                if scene.get_adapter().is_vertex_protected(i.vertex()): continue
-                scene.remove_vertex(i.vertex())
+                if adapter.is_vertex_protected(i.vertex()): continue
+                vertices.append(i.vertex())
             elif isinstance(i, master.edgeType):
-                scene.remove_edge((i.srcBBox().vertex(), i.srcBBox()),
-                                  (i.dstBBox().vertex(), i.dstBBox()) )
+                edges.append(((i.srcBBox().vertex(), i.srcBBox()),
+                              (i.dstBBox().vertex(), i.dstBBox())))
             elif isinstance(i, master.annotationType):
-                scene.remove_vertex(i.annotation())
+                vertices.append(i.annotation())
+        with SceneBatch(scene, len(vertices) + len(edges)):
+            adapter.remove_elements(vertices, edges)
 
 
     def graph_group_selection(self):
@@ -177,16 +259,37 @@ class DataflowOperators(Base):
         scene.add_vertex(node, position=[position.x(), position.y()])
 
 
-    def graph_copy(self):
-        """ Copy Selection """
+    def graph_copy(self, outputs=False):
+        """ Copy Selection
+
+        @param outputs : also copy the values computed by the nodes
+        """
         master = self.master
         scene = master.get_graph_scene()
         s = scene.get_selected_items( (master.vertexType, master.annotationType) )
         if(not s): return
 
         s = [i.vertex().get_id() for i in s]
-        master.get_clipboard().clear()
-        master.get_graph().to_factory(master.get_clipboard(), s, auto_io=False)
+        graph = master.get_graph()
+        data = clipboard.copy(graph, s, outputs)
+        clipboard.set_data(data)
+        if data is None:
+            # some nodes are not in a package, copy them in a factory. The
+            # previous copy must not be pasted from the system clipboard.
+            qt.QtGui.QApplication.clipboard().clear()
+            master.get_clipboard().clear()
+            graph.to_factory(master.get_clipboard(), s, auto_io=False)
+            return
+
+        mimedata = qt.QtCore.QMimeData()
+        mimedata.setData(clipboard.MIMETYPE, qt.QtCore.QByteArray(data.dumps()))
+        qt.QtGui.QApplication.clipboard().setMimeData(mimedata)
+        if data.dropped:
+            self.__report_dropped("These values can't be copied:", data)
+
+    def __report_dropped(self, message, data):
+        qt.QtGui.QMessageBox.warning(self.master.get_sensible_parent(), "Copy",
+                                     "\n".join([message] + data.dropped))
 
     def graph_cut(self):
         """ Cut selection """
@@ -194,10 +297,54 @@ class DataflowOperators(Base):
         self.graph_copy()
         self.graph_remove_selection()
 
+    def __get_clipboard_data(self):
+        """ Return the last copy : the one of this session if it is still in
+        the system clipboard, else the one of the system clipboard (copied
+        by an other session), else the one of this session """
+        mimedata = qt.QtGui.QApplication.clipboard().mimeData()
+        if mimedata is not None and mimedata.hasFormat(clipboard.MIMETYPE):
+            text = str(mimedata.data(clipboard.MIMETYPE))
+            data = clipboard.get_data(clipboard.read_token(text))
+            if data is None:
+                data = clipboard.ClipboardData.loads(text)
+                if data.dropped:
+                    self.__report_dropped("These values were not copied "
+                                          "from the other session:", data)
+            return data
+        return clipboard.get_data()
+
+    @exception_display
     def graph_paste(self, position=None):
         """ Paste from clipboard """
         master = self.master
         scene  = master.get_graph_scene()
+        if position is None:
+            position = qt.QtCore.QPointF(0., 0.)
+
+        data = self.__get_clipboard_data()
+        if data is None:
+            self.__paste_factory(position)
+            return
+
+        pkgmanager = PackageManager()
+        factories = {}
+        def get_factory(package_id, name):
+            key = package_id, name
+            if key not in factories:
+                factories[key] = pkgmanager[package_id].get_factory(name)
+            return factories[key]
+
+        scene.clearSelection()
+        scene.select_added_items(True)
+        with SceneBatch(scene, len(data.vertices) + len(data.edges)):
+            clipboard.paste(master.get_graph(), data,
+                            (position.x() + 10, position.y() + 10),
+                            get_factory)
+
+    def __paste_factory(self, position):
+        """ Paste the nodes copied in the clipboard factory """
+        master = self.master
+        scene  = master.get_graph_scene()
         cnode = master.get_clipboard().instantiate()
 
         min_x = min_y = float("inf")
@@ -18,171 +18,64 @@ __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
 from openalea.vpltk.qt import qt
-from openalea.visualea.graph_operator.base import Base
+from openalea.visualea import alignment
+from openalea.visualea.graph_operator.base import Base, SceneBatch
 
 class LayoutOperators(Base):
 
-    def graph_align_selection_horizontal(self):
-        """Align all items on a median ligne"""
+    def __layout_selection(self, minCount, layout, *args):
+        """Move the selected items to the positions computed at once by
+        layout(positions, sizes, *args), see the alignment module.
+
+        @param minCount : minimum number of selected items
+        """
         master = self.master
         scene = master.get_graph_scene()
-
         if scene is None :
             return
 
-        items = scene.get_selected_items( master.vertexType, lambda x: (x, x.get_view_data("position")) )
-        count = len(items)
-        if count > 1 :
-            #find median base
-            ymean = sum(pos[1] for item, pos in items) / count
+        items = scene.get_selected_items(master.vertexType)
+        if len(items) < minCount :
+            return
+
+        positions = [item.get_view_data("position") for item in items]
+        sizes = []
+        for item in items :
+            rect = item.boundingRect()
+            sizes.append((rect.width(), rect.height()))
 
-            #move all items
-            for item, pos in items :
-                item.store_view_data(position=[pos[0], ymean])
-            #notify
-            scene.notify(None,("graph_modified",) )
+        newPositions = layout(positions, sizes, *args)
 
-        return
+        #move the items that changed with a single scene update : the
+        #items and their edges move once the batch ends
+        moved = [(item, newPos) for item, pos, newPos
+                 in zip(items, positions, newPositions) if list(pos) != newPos]
+        with SceneBatch(scene, len(moved)):
+            for item, newPos in moved :
+                item.store_view_data(position=newPos)
+        #notify
+        scene.notify(None,("graph_modified",) )
 
+    def graph_align_selection_horizontal(self):
+        """Align all items on a median ligne"""
+        self.__layout_selection(2, alignment.align, alignment.HORIZONTAL)
 
     def graph_align_selection_left (self):
         """Align all items on their left side."""
-        master = self.master
-        scene = master.get_graph_scene()
-        if scene is None :
-            return
-
-        items = scene.get_selected_items(master.vertexType, lambda x: (x, x.get_view_data("position")) )
-        count = len(items)
-        if count > 1 :
-            #find left ligne
-            xmean = sum(pos[0] for item, pos in items) / count
-
-            #move all items
-            for item, pos in items :
-                item.store_view_data(position=[xmean, pos[1]])
-            #notify
-            scene.notify(None,("graph_modified",) )
-
-        return
-
+        self.__layout_selection(2, alignment.align, alignment.LEFT)
 
     def graph_align_selection_right (self):
         """Align all items on their right side"""
-        master = self.master
-        scene = master.get_graph_scene()
-        if scene is None :
-            return
-
-        items = scene.get_selected_items(master.vertexType, lambda x: (x,
-                                                                       x.get_view_data("position"),
-                                                                       x.boundingRect().width()) )
-        count = len(items)
-        if count > 1 :
-            #find left line
-            xmean = sum(pos[0] + width for item, pos, width in items) / count
-
-            #move all items
-            for item, pos, width in items :
-                item.store_view_data(position=[xmean - width, pos[1]])
-
-            #notify
-            scene.notify(None,("graph_modified",) )
-
-        return
-
+        self.__layout_selection(2, alignment.align, alignment.RIGHT)
 
     def graph_align_selection_mean (self):
         """Align all items vertically around a mean line."""
-        master = self.master
-        scene = master.get_graph_scene()
-        if scene is None :
-            return
-
-        items = scene.get_selected_items(master.vertexType, lambda x: (x,
-                                                                       x.get_view_data("position"),
-                                                                       x.boundingRect().width()) )
-        count = len(items)
-        if count > 1 :
-            #find left ligne
-            xmean = sum(pos[0] + width/2. for item, pos, width in items) / count
-
-            #move all items
-            for item, pos, width in items :
-                item.store_view_data(position=[xmean - width/2., pos[1]])
-            #notify
-            scene.notify(None,("graph_modified",) )
-
-        return
-
+        self.__layout_selection(2, alignment.align, alignment.MEAN)
 
     def graph_distribute_selection_horizontally (self):
         """distribute the horizontal distances between items."""
-        master = self.master
-        scene = master.get_graph_scene()
-        if scene is None :
-            return
-
-        items = scene.get_selected_items(master.vertexType, lambda x: (x,
-                                                                       x.get_view_data("position"),
-                                                                       x.boundingRect().width()) )
-
-        count = len(items)
-        if count > 2 :
-            #find xmin,xmax of selected items
-            xmin = min(pos[0] for item, pos, width in items)
-            xmax = max(pos[0] + width for item, pos, width in items)
-
-            #find mean distance between items
-            dist = ( (xmax - xmin)-sum(width for item, pos, width in items) ) / (count - 1)
-
-            # #sort all items by their mean position
-            items.sort( lambda x, y: cmp(x[1][0]+x[2]/2, y[1][0]+y[2]/2) )
-
-            #first item serves as reference
-            item, pos, width = items[0]
-            current_x = pos[0] + width
-
-            for item, pos, width in items[1:-1] :
-                item.store_view_data(position=[current_x + dist, pos[1]])
-                current_x += dist + width
-            #notify
-            scene.notify(None,("graph_modified",) )
-
-        return
-
+        self.__layout_selection(3, alignment.distribute, 0)
 
     def graph_distribute_selection_vertically (self):
         """distribute the vertical distances between items."""
-        master = self.master
-        scene = master.get_graph_scene()
-        if scene is None :
-            return
-
-        items = scene.get_selected_items(master.vertexType, lambda x: (x,
-                                                                       x.get_view_data("position"),
-                                                                       x.boundingRect().height()) )
-        count = len(items)
-        if count > 1 :
-            #find ymin,ymax of selected items
-            ymin = min(pos[1] for item, pos, height in items)
-            ymax = max(pos[1] + height for item, pos, height in items)
-
-            #find mean distance between items
-            dist = ( (ymax - ymin) - sum(height for item, pos, height in items) ) / (count - 1)
-
-            #sort all items by their mean position
-            items.sort( lambda x, y: cmp(x[1][1]+x[2]/2, y[1][1]+y[2]/2) )
-
-            #first item serves as reference
-            item, pos, height = items[0]
-            current_y = pos[1] + height
-
-            for item, pos, height in items[1:-1] :
-                item.store_view_data(position=[pos[0], current_y + dist])
-                current_y += dist + height
-
-            #notify
-            scene.notify(None,("graph_modified",) )
-
-        return
+        self.__layout_selection(3, alignment.distribute, 1)
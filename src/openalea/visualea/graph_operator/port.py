@@ -19,6 +19,8 @@ __revision__ = " $Id$ "
 
 from openalea.vpltk.qt import qt
 from openalea.visualea.graph_operator.base import Base
+from openalea.visualea.summary import summarize
+from openalea.visualea import memory
 
 class PortOperators(Base):
     """The PortOperators defines the output options of an output connector.
@@ -41,9 +43,15 @@ class PortOperators(Base):
         """ Print the value of the connector """
         portItem = self.master.get_port_item()
         node = portItem.port().vertex()
-        data = str(node.get_output(portItem.port().get_id()))
-        data = data[:500]+"[...truncated]" if len(data)>500 else data
-        print data
+        data = node.get_output(portItem.port().get_id())
+        print summarize(data, 500)
+
+
+    def port_pin_value(self, checked):
+        """ Keep the value of the connector when the graph is evaluated in
+        the release outputs mode """
+        port = self.master.get_port_item().port()
+        memory.pin(port.vertex(), port.get_id(), checked)
 
 
     def port_send_to_pool(self):
@@ -69,6 +77,7 @@ class PortOperators(Base):
             node = port.vertex()
             data = node.get_output(port.get_id())
             datapool[str(result)] = data
+            memory.pin(node, port.get_id())
 
 
     def port_send_to_console(self):
@@ -88,6 +97,7 @@ class PortOperators(Base):
             port = portItem.port()
             node = port.vertex()
             data = node.get_output(port.get_id())
+            memory.pin(node, port.get_id())
             interpreter = master.get_interpreter()
 
             overwrite = qt.QtGui.QMessageBox.Ok
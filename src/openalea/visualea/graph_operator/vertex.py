@@ -24,6 +24,7 @@ from openalea.visualea.graph_operator import compositenode_inspector
 
 from openalea.visualea.util import busy_cursor, exception_display, open_dialog
 from openalea.visualea.dialogs import DictEditor, ShowPortDialog, NodeChooser
+from openalea.visualea import evaluation, memory
 
 from openalea.core.compositenode import CompositeNode
 from openalea.core import observer, node
@@ -83,10 +84,11 @@ class VertexOperators(Base):
             widget.show()
 
     @exception_display
-    @busy_cursor
     def vertex_run(self):
         master = self.master
-        master.get_graph().eval_as_expression(master.get_vertex_item().vertex().get_id())
+        evaluation.evaluate(master.get_graph(),
+                            master.get_vertex_item().vertex().get_id(),
+                            master.get_sensible_parent())
 
     def vertex_open(self):
         master = self.master
@@ -127,6 +129,7 @@ class VertexOperators(Base):
                               False)
 
         item.set_editor_instance(vwidget)
+        memory.observe(vertex, vwidget)
 
     def vertex_remove(self):
         master = self.master
@@ -149,8 +152,8 @@ class VertexOperators(Base):
         widget = master.get_sensible_parent()
         dialog = NodeChooser(widget)
         vItem = master.get_vertex_item()
-        dialog.search('', vItem.vertex().get_nb_input(),
-                      vItem.vertex().get_nb_output())
+        dialog.search_compatible(vItem.vertex().input_desc,
+                                 vItem.vertex().output_desc)
         ret = dialog.exec_()
         if(not ret):
             return
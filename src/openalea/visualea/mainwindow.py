@@ -42,6 +42,7 @@ from openalea.visualea.node_treeview import NodeFactoryView, NodeFactoryTreeView
 from openalea.visualea.node_treeview import DataPoolListView, DataPoolModel
 from openalea.visualea.node_treeview import SearchListView, SearchModel
 from openalea.visualea.node_widget import SignalSlotListener
+from openalea.visualea.node_index import get_node_index
 import metainfo
 
 from openalea.visualea import helpwidget
@@ -66,6 +67,9 @@ class MainWindow(qt.QtGui.QMainWindow,
                  ui_mainwindow.Ui_MainWindow,
                  SignalSlotListener):
 
+    # Maximum number of results displayed by the search view
+    SEARCH_LIMIT = 500
+
     def __init__(self, session, parent=None):
         """
         @param session : user session
@@ -137,6 +141,7 @@ class MainWindow(qt.QtGui.QMainWindow,
                      self.contextMenuEvent)
         self.tabWorkspace.currentChanged.connect(self.ws_changed)
         self.search_lineEdit.editingFinished.connect(self.search_node)
+        self.search_lineEdit.textEdited.connect(self.search_node)
         self.tabWorkspace.tabCloseRequested.connect(self.close_tab_workspace)
 
         # Help Menu
@@ -176,10 +181,13 @@ class MainWindow(qt.QtGui.QMainWindow,
 
         # WorkspaceMenu
         self.__operatorAction = dict([(self.action_Run, "graph_run"),
+                                      (self.action_Run_Modified, "graph_run_dirty"),
                                       (self.actionInvalidate, "graph_invalidate"),
                                       (self.actionReset, "graph_reset"),
                                       (self.actionConfigure_I_O, "graph_configure_io"),
                                       (self.actionGroup_Selection, "graph_group_selection"),
+                                      (self.action_Undo, "graph_undo"),
+                                      (self.action_Redo, "graph_redo"),
                                       (self.action_Copy, "graph_copy"),
                                       (self.action_Paste, "graph_paste"),
                                       (self.action_Cut, "graph_cut"),
@@ -293,6 +301,9 @@ class MainWindow(qt.QtGui.QMainWindow,
         self.pkgmanager = session.pkgmanager
         self.actionShow_log.triggered.connect(self.pkgmanager.log.print_log)
 
+        # node search index
+        self.node_index = get_node_index()
+
         # package tree view
         self.pkg_model = PkgModel(self.pkgmanager)
         self.packageTreeView = \
@@ -554,8 +565,9 @@ class MainWindow(qt.QtGui.QMainWindow,
 
     def reinit_treeview(self):
         """ Reinitialise package and category views """
-        self.cat_model.reset()
-        self.pkg_model.reset()
+        self.node_index.update()
+        self.cat_model.update()
+        self.pkg_model.update()
         self.datapool_model.reset()
         self.search_model.reset()
 
@@ -817,11 +829,11 @@ class MainWindow(qt.QtGui.QMainWindow,
 
         self.session.datapool.clear()
 
-    def search_node(self):
-        """ Activated when search line edit is validated """
+    def search_node(self, *args):
+        """ Activated when search line edit is edited or validated """
 
         text = str(unicode(self.search_lineEdit.text()).encode('latin1'))
-        results = self.pkgmanager.search_node(text)
+        results = self.node_index.search(text, limit=self.SEARCH_LIMIT)
         self.search_model.set_results(results)
 
     def find_node(self):
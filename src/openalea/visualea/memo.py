@@ -0,0 +1,337 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Memoization of node outputs across evaluations.
+
+The outputs of a node are stored under a key made of the identity of its
+factory, a hash of its code (see code_version) and a hash of its input
+values. Only lazy nodes, which declare that they do not need to be
+evaluated again for the same inputs, are memoized. Entries are kept in a
+bounded LRU memory cache and, if a directory is given, pickled on disk.
+The cache stores copies of the outputs and gives copies back, so nodes
+which modify their inputs in place do not change it.
+
+Computing a key pickles the inputs of the node : nodes whose last
+evaluation took less than memo_min_time are evaluated without the cache.
+
+Settings ("eval" section):
+    - memoize : enable the cache (default False)
+    - memo_memory : memory used by the entries kept in memory, in MB, as
+      estimated by profiler.sizeof (default 256)
+    - memo_dir : directory of the disk cache, a path without quotes
+      (default : no disk cache)
+    - memo_min_time : minimum evaluation time, in seconds, of the nodes
+      which are memoized (default 0.01)
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import os
+import time
+import types
+import threading
+import weakref
+import cPickle
+import hashlib
+from copy import deepcopy
+from collections import OrderedDict
+
+from openalea.visualea.profiler import sizeof
+
+HIT = "hit"
+MISS = "miss"
+
+# node -> HIT or MISS, for the last evaluation of the node
+_status = weakref.WeakKeyDictionary()
+
+
+def get_memo_status(node):
+    """ Return HIT, MISS or None if node was not evaluated with the cache """
+    return _status.get(node)
+
+
+# node -> duration of its last evaluation without the cache
+_durations = weakref.WeakKeyDictionary()
+
+# function -> hash of its code
+_versions = weakref.WeakKeyDictionary()
+
+
+def factory_id(node):
+    """ Identity of the factory of node """
+    factory = getattr(node, "factory", None)
+    if factory is not None:
+        package = getattr(factory, "package", None)
+        pkg_id = package.get_id() if package is not None else ""
+        return "%s:%s" % (pkg_id, factory.name)
+    cls = type(node)
+    return "%s.%s" % (cls.__module__, cls.__name__)
+
+
+def _hash_code(code, h):
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, h)
+        else:
+            h.update(repr(const))
+    h.update(repr(code.co_names))
+
+
+def node_function(node):
+    """ Return the python function run by node : the function of a
+    function node or the __call__ method of its class, or None """
+    func = getattr(node, "func", None)
+    if func is None:
+        func = getattr(type(node), "__call__", None)
+    func = getattr(func, "im_func", func)
+    if getattr(func, "func_code", None) is None:
+        return None
+    return func
+
+
+def code_version(node):
+    """ Hash of the code run by node (see node_function). Editing or
+    reloading the node changes it, the code of the functions it calls is
+    not included """
+    func = node_function(node)
+    if func is None:
+        return ""
+    code = func.func_code
+    try:
+        version = _versions[func]
+        if version[0] is code:
+            return version[1]
+    except (KeyError, TypeError):
+        pass
+    h = hashlib.sha1()
+    _hash_code(code, h)
+    version = h.hexdigest()
+    try:
+        _versions[func] = (code, version)
+    except TypeError:
+        pass
+    return version
+
+
+def input_key(node):
+    """ Return the cache key of node for its code and current inputs, or
+    None if the inputs cannot be hashed (not picklable) """
+    inputs = [node.get_input(i) for i in xrange(node.get_nb_input())]
+    try:
+        data = cPickle.dumps((factory_id(node), code_version(node), inputs), 2)
+    except Exception:
+        return None
+    return hashlib.sha1(data).hexdigest()
+
+
+class OutputCache(object):
+    """ LRU cache of node outputs with an optional disk tier. The entries
+    kept in memory use at most maxSize bytes """
+
+    def __init__(self, maxSize=256 * 1024 * 1024, directory=None):
+        self.maxSize = maxSize
+        self.directory = directory
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict() # key -> (outputs, size)
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        """ Return a copy of the outputs stored for key, or None """
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None:
+                self.__entries[key] = entry
+        outputs = entry[0] if entry is not None else None
+        if outputs is None:
+            outputs = self.__load(key)
+            if outputs is not None:
+                self.__store(key, outputs)
+        if outputs is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            outputs = deepcopy(outputs)
+        return outputs
+
+    def put(self, key, outputs):
+        """ Store a copy of outputs (a tuple) for key. Outputs which can't
+        be copied are not stored """
+        try:
+            outputs = deepcopy(outputs)
+        except Exception:
+            return
+        self.__store(key, outputs)
+        self.__dump(key, outputs)
+
+    def clear(self):
+        """ Forget the entries kept in memory """
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+        self.hits = self.misses = 0
+
+    def __store(self, key, outputs):
+        """ Keep outputs in memory, the least recently used entries are
+        dropped beyond maxSize bytes """
+        size = sizeof(outputs)
+        with self.__lock:
+            old = self.__entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.maxSize:
+                return
+            self.__entries[key] = (outputs, size)
+            self.size += size
+            while self.size > self.maxSize:
+                self.size -= self.__entries.popitem(last=False)[1][1]
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def __load(self, key):
+        if not self.directory:
+            return None
+        try:
+            f = open(self.__path(key), "rb")
+        except IOError:
+            return None
+        try:
+            try:
+                return cPickle.load(f)
+            except Exception:
+                return None
+        finally:
+            f.close()
+
+    def __dump(self, key, outputs):
+        if not self.directory:
+            return
+        tmp = self.__path(key) + ".tmp"
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            f = open(tmp, "wb")
+            try:
+                cPickle.dump(outputs, f, 2)
+            finally:
+                f.close()
+            os.rename(tmp, self.__path(key))
+        except Exception:
+            # outputs that cannot be pickled are only kept in memory
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def is_memoizable(node):
+    """ Only lazy atomic nodes are memoized """
+    from openalea.core.compositenode import CompositeNode
+    return (getattr(node, "lazy", False) and
+            not getattr(node, "block", False) and
+            not isinstance(node, CompositeNode) and
+            node.get_nb_output() > 0)
+
+
+def memoized_eval(node, cache, original, min_time=0.):
+    """ Return a function to be used as node.eval, which takes the outputs
+    from cache when possible.
+
+    @param min_time : nodes whose last evaluation took less time (in
+    seconds) are evaluated without the cache
+    """
+    def eval():
+        if not getattr(node, "modified", True):
+            # the node already knows that it is up to date
+            return original()
+        if _durations.get(node, min_time) < min_time:
+            # computing the key would cost more than the evaluation
+            start = time.time()
+            ret = original()
+            _durations[node] = time.time() - start
+            return ret
+        key = input_key(node)
+        if key is None:
+            return original()
+
+        outputs = cache.get(key)
+        if outputs is not None:
+            node.notify_listeners(("start_eval",))
+            for i, value in enumerate(outputs):
+                node.set_output(i, value)
+            node.modified = False
+            if node.raise_exception:
+                node.raise_exception = False
+            _status[node] = HIT
+            node.notify_listeners(("stop_eval",))
+            node.notify_listeners(("internal_state_changed", "memo", HIT))
+            return False
+
+        start = time.time()
+        ret = original()
+        _durations[node] = time.time() - start
+        if not ret and not node.raise_exception:
+            cache.put(key, tuple(node.get_output(i)
+                                 for i in xrange(node.get_nb_output())))
+        _status[node] = MISS
+        node.notify_listeners(("internal_state_changed", "memo", MISS))
+        return ret
+    return eval
+
+
+_output_cache = None
+
+
+def memoizes():
+    """ Return True if memoization is enabled in the settings """
+    from openalea.visualea.settings_cache import get_settings_cache
+    return bool(get_settings_cache().get("eval", "memoize", False))
+
+
+def set_memoize(enabled):
+    """ Enable or disable memoization in the settings """
+    from openalea.core.settings import Settings
+    from openalea.visualea.settings_cache import get_settings_cache
+    config = Settings()
+    config.set("eval", "memoize", str(bool(enabled)))
+    config.write()
+    get_settings_cache().changed()
+
+
+def get_output_cache():
+    """ Return the output cache shared by the application, or None if
+    memoization is not enabled in the settings """
+    global _output_cache
+    from openalea.visualea.settings_cache import get_settings_cache
+    if not memoizes():
+        return None
+    settings = get_settings_cache()
+
+    maxSize = settings.get("eval", "memo_memory", 256) * 1024 * 1024
+    directory = settings.get_string("eval", "memo_dir", None) or None
+    if _output_cache is None:
+        _output_cache = OutputCache(maxSize, directory)
+    else:
+        _output_cache.maxSize = maxSize
+        _output_cache.directory = directory
+    return _output_cache
+
+
+def get_min_time():
+    from openalea.visualea.settings_cache import get_settings_cache
+    return get_settings_cache().get("eval", "memo_min_time", 0.01)
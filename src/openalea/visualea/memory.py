@@ -0,0 +1,201 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Release of intermediate outputs during evaluation.
+
+By default every output stays on its port, so the memory used by an
+evaluation is the sum of all the intermediate values. When the release mode
+is enabled for a graph, an output is released once all the nodes connected
+to it have been evaluated, together with the copies stored on their inputs.
+Released nodes are marked modified and are dirty (see is_released) so that
+the next evaluation computes them again.
+
+Outputs are kept if they are pinned (sent to the data pool or to the
+console, or kept by the user), if the widget of their node is shown, or if
+they are results : not connected, or exported by the composite node.
+Nodes evaluated several times in the same evaluation (loops, delays) must
+not be used with this mode.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import logging
+import threading
+import weakref
+
+from openalea.visualea.profiler import sizeof
+
+try:
+    from openalea.core import logger
+    myLogger = logger.get_logger("openalea.visualea.memory")
+    logger.connect_loggers_to_handlers(myLogger, logger.get_handler_names())
+except ImportError:
+    myLogger = logging.getLogger("openalea.visualea.memory")
+
+
+def log(msg):
+    myLogger.info(msg)
+
+
+# node -> set of pinned output indices
+_pinned = weakref.WeakKeyDictionary()
+
+# graphs evaluated in release mode
+_release = weakref.WeakKeyDictionary()
+
+# node -> set of released output indices
+_released = weakref.WeakKeyDictionary()
+
+# node -> widgets showing the node
+_observers = weakref.WeakKeyDictionary()
+
+
+def pin(node, index, pinned=True):
+    """ Keep (or not) the output index of node on its port """
+    indices = _pinned.setdefault(node, set())
+    if pinned:
+        indices.add(index)
+    else:
+        indices.discard(index)
+
+
+def is_pinned(node, index):
+    return index in _pinned.get(node, ()) or is_observed(node)
+
+
+def observe(node, widget):
+    """ Keep the outputs of node while widget is shown """
+    _observers.setdefault(node, weakref.WeakSet()).add(widget)
+
+
+def is_observed(node):
+    """ Return True if a widget of node is shown """
+    for widget in list(_observers.get(node, ())):
+        try:
+            if widget.isVisible():
+                return True
+        except RuntimeError:
+            # deleted by Qt
+            pass
+    return False
+
+
+def is_released(node):
+    """ Return True if outputs of node were released and not computed
+    again : node must be evaluated before its consumers """
+    indices = _released.get(node)
+    if not indices:
+        return False
+    return any(node.get_output(i) is None for i in indices)
+
+
+def set_release_outputs(graph, enabled):
+    if enabled:
+        _release[graph] = True
+    else:
+        _release.pop(graph, None)
+
+
+def releases_outputs(graph):
+    return graph in _release
+
+
+def format_bytes(nbytes):
+    return "%.1f MB" % (nbytes / 1048576.,)
+
+
+class OutputReleaser(object):
+    """ Release the outputs of the vertices of a graph as soon as all their
+    consumers are evaluated and keep track of the memory footprint of the
+    outputs. evaluated() is called from the evaluation threads """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.vids = {}      # node -> vid
+        self.pending = {}   # (vid, output index) -> set of consumer vids
+        self.readers = {}   # consumer vid -> [(vid, output index, input index)]
+        self.sizes = {}     # (vid, output index) -> size of the output
+        self.live = 0
+        self.peak = 0
+        self.freed = 0
+        self.released = 0
+        self.__lock = threading.Lock()
+
+        for vid in graph.vertices():
+            node = graph.node(vid)
+            self.vids[node] = vid
+            for pid in graph.out_ports(vid):
+                index = graph.local_id(pid)
+                if is_pinned(node, index):
+                    continue
+                consumers = [(graph.vertex(npid), graph.local_id(npid))
+                             for npid in graph.connected_ports(pid)]
+                # results : not connected or exported by the graph
+                if not consumers or graph.id_out in [c for c, i in consumers]:
+                    continue
+                self.pending[(vid, index)] = set(c for c, i in consumers)
+                for c, i in consumers:
+                    self.readers.setdefault(c, []).append((vid, index, i))
+
+    def evaluated(self, node):
+        """ node was evaluated : account for its outputs and release the
+        outputs that it was the last one to use """
+        vid = self.vids.get(node)
+        if vid is None:
+            return
+        with self.__lock:
+            _released.pop(node, None)
+            for i in xrange(node.get_nb_output()):
+                size = sizeof(node.get_output(i))
+                self.live += size - self.sizes.get((vid, i), 0)
+                self.sizes[(vid, i)] = size
+            self.peak = max(self.peak, self.live)
+
+            for producer, index, input in self.readers.get(vid, ()):
+                consumers = self.pending.get((producer, index))
+                if consumers is None or vid not in consumers:
+                    continue
+                consumers.discard(vid)
+                node.inputs[input] = None
+                node.modified = True
+                if not consumers:
+                    del self.pending[(producer, index)]
+                    self.release(producer, index)
+
+    def release(self, vid, index):
+        node = self.graph.node(vid)
+        node.set_output(index, None)
+        node.modified = True
+        _released.setdefault(node, set()).add(index)
+        node.notify_listeners(("internal_state_changed", "dirty", True))
+        size = self.sizes.pop((vid, index), 0)
+        self.live -= size
+        self.freed += size
+        self.released += 1
+
+    def report(self):
+        """ Log the memory statistics of the evaluation """
+        log("%s: outputs peak at %s, %s released from %i ports, %s kept" %
+            (self.graph.get_caption(), format_bytes(self.peak),
+             format_bytes(self.freed), self.released, format_bytes(self.live)))
+
+
+def released_eval(node, releaser, original):
+    """ Return a function to be used as node.eval, which tells releaser
+    when node is evaluated """
+    def eval():
+        ret = original()
+        releaser.evaluated(node)
+        return ret
+    return eval
@@ -0,0 +1,438 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Inverted index used to search node factories.
+
+The index maps the tokens found in the name, package, category,
+description and port names of each factory to the factories themselves.
+It is built once and updated package by package, so that a query only
+costs a few dictionary lookups instead of a scan of the whole catalog.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import re
+from bisect import bisect_left, insort
+
+# Weight of a match in each indexed field
+FIELD_WEIGHTS = {"name": 8.,
+                 "category": 3.,
+                 "package": 2.,
+                 "port": 2.,
+                 "description": 1.,
+                 }
+
+# Bonus applied when a query token matches a whole token
+EXACT_BONUS = 2.
+# Penalty applied to approximate matches
+FUZZY_PENALTY = 0.5
+
+_word_re = re.compile(r"[0-9A-Za-z]+")
+_camel_re = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text):
+    """ Return the list of lower case tokens of text.
+
+    Words are split on non alphanumeric characters and camel case
+    words are also indexed by their parts (ReadImage -> readimage, read, image).
+    """
+    if not text:
+        return []
+    try:
+        text = str(text)
+    except UnicodeError:
+        text = text.encode("utf-8", "replace")
+
+    tokens = []
+    for word in _word_re.findall(text):
+        tokens.append(word.lower())
+        parts = _camel_re.findall(word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    return tokens
+
+
+def edit_distance(a, b, maxdist):
+    """ Levenshtein distance between a and b, or maxdist + 1 if it is
+    larger than maxdist """
+    if abs(len(a) - len(b)) > maxdist:
+        return maxdist + 1
+    previous = range(len(b) + 1)
+    for i, ca in enumerate(a):
+        current = [i + 1]
+        for j, cb in enumerate(b):
+            current.append(min(previous[j + 1] + 1,
+                               current[j] + 1,
+                               previous[j] + (ca != cb)))
+        if min(current) > maxdist:
+            return maxdist + 1
+        previous = current
+    return previous[-1]
+
+
+def interface_name(interface):
+    """ Return a hashable name for a port interface (class, instance or
+    string), or None if the port has no interface """
+    if interface is None or isinstance(interface, basestring):
+        return interface
+    if isinstance(interface, type):
+        return interface.__name__
+    return interface.__class__.__name__
+
+
+def port_signature(ports):
+    """ Return the tuple of the interface names of a list of port
+    descriptions (dict with an 'interface' key) """
+    res = []
+    for port in ports or ():
+        try:
+            res.append(interface_name(port.get("interface")))
+        except AttributeError:
+            res.append(None)
+    return tuple(res)
+
+
+def signature_similarity(sig1, sig2):
+    """ Score how well two signatures of the same arity match.
+
+    Each port with the same interface counts for 1, a port without
+    interface on either side counts for 0.5.
+    """
+    score = 0.
+    for ports1, ports2 in zip(sig1, sig2):
+        for i1, i2 in zip(ports1, ports2):
+            if i1 == i2:
+                score += 1.
+            elif i1 is None or i2 is None:
+                score += 0.5
+    return score
+
+
+def factory_key(factory):
+    """ Return the unique key of a factory : (package id, factory name) """
+    return (factory.package.get_id(), factory.name)
+
+
+def factory_state(factory):
+    """ Return the indexed description of a factory, which changes when
+    the factory is edited or reloaded in place """
+    inputs = getattr(factory, "inputs", None) or ()
+    outputs = getattr(factory, "outputs", None) or ()
+    ports = []
+    for port in list(inputs) + list(outputs):
+        try:
+            ports.append(port.get("name"))
+        except AttributeError:
+            ports.append(None)
+    return (factory.name, getattr(factory, "category", ""),
+            getattr(factory, "description", ""), tuple(ports),
+            port_signature(inputs), port_signature(outputs))
+
+
+class NodeIndex(object):
+
+    """ Tokenized inverted index over the factories of a package manager """
+
+    def __init__(self, pkgmanager=None):
+        """
+        @param pkgmanager : package manager to index (may be None)
+        """
+        self.pman = pkgmanager
+
+        self.factories = {} # key -> factory
+        self.signatures = {} # key -> (input interfaces, output interfaces)
+        self.arity = {}     # (nb_inputs, nb_outputs) -> set of keys
+        self.sortkeys = {}  # key -> (lower case name, package id)
+        self.postings = {}  # token -> {key : score}
+        self.tokens = []    # sorted list of the indexed tokens
+        self.fields = {}    # key -> {token : score} to remove a factory
+
+        # package id -> (package, {id : factory state}, keys)
+        self.packages = {}
+
+    def __len__(self):
+        return len(self.factories)
+
+    # Indexing
+
+    def add_factory(self, factory):
+        """ Index a factory, replacing a previous factory with the same key """
+        key = factory_key(factory)
+        if key in self.factories:
+            self.remove_factory(factory)
+
+        scores = {}
+
+        def add(text, field):
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                if scores.get(token, 0.) < weight:
+                    scores[token] = weight
+
+        add(factory.name, "name")
+        add(getattr(factory, "category", ""), "category")
+        add(factory.package.get_id(), "package")
+        add(getattr(factory, "description", ""), "description")
+
+        inputs = getattr(factory, "inputs", None) or ()
+        outputs = getattr(factory, "outputs", None) or ()
+        for port in list(inputs) + list(outputs):
+            try:
+                add(port.get("name"), "port")
+            except AttributeError:
+                pass
+
+        for token, score in scores.iteritems():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.tokens, token)
+            posting[key] = score
+
+        self.factories[key] = factory
+        self.fields[key] = scores
+        signature = (port_signature(inputs), port_signature(outputs))
+        self.signatures[key] = signature
+        self.arity.setdefault((len(inputs), len(outputs)), set()).add(key)
+        self.sortkeys[key] = (key[1].lower(), key[0])
+
+    def remove_factory(self, factory):
+        """ Remove a factory from the index """
+        key = factory_key(factory)
+        if key not in self.factories:
+            return
+
+        for token in self.fields.pop(key):
+            posting = self.postings[token]
+            del posting[key]
+            if not posting:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+
+        del self.factories[key]
+        signature = self.signatures.pop(key)
+        arity = (len(signature[0]), len(signature[1]))
+        self.arity[arity].discard(key)
+        if not self.arity[arity]:
+            del self.arity[arity]
+        del self.sortkeys[key]
+
+    def add_package(self, package):
+        """ Index all the factories of a package """
+        self.remove_package(package.get_id())
+
+        states = {}
+        keys = set()
+        for factory in package.values():
+            # Factories may be registered under several aliases
+            if id(factory) in states:
+                continue
+            states[id(factory)] = factory_state(factory)
+            keys.add(factory_key(factory))
+            self.add_factory(factory)
+
+        self.packages[package.get_id()] = (package, states, keys)
+
+    def remove_package(self, pkg_id):
+        """ Remove all the factories of a package from the index """
+        entry = self.packages.pop(pkg_id, None)
+        if entry is None:
+            return
+
+        for key in entry[2]:
+            if key in self.factories:
+                self.remove_factory(self.factories[key])
+
+    def update(self):
+        """ Synchronise the index with the package manager.
+
+        Only the packages that were added, removed or whose factories
+        changed (added, removed or edited in place) are re-indexed.
+        """
+        if self.pman is None:
+            return
+
+        current = {}
+        for pkg_id in self.pman.keys():
+            package = self.pman[pkg_id]
+            # Skip aliases of a package
+            current.setdefault(package.get_id(), package)
+
+        for pkg_id in list(self.packages):
+            if pkg_id not in current:
+                self.remove_package(pkg_id)
+
+        for pkg_id, package in current.iteritems():
+            entry = self.packages.get(pkg_id)
+            if(entry is None or entry[0] is not package or
+               entry[1] != dict((id(f), factory_state(f))
+                                for f in package.values())):
+                self.add_package(package)
+
+    def clear(self):
+        """ Empty the index """
+        self.factories.clear()
+        self.signatures.clear()
+        self.arity.clear()
+        self.sortkeys.clear()
+        self.postings.clear()
+        self.fields.clear()
+        self.packages.clear()
+        del self.tokens[:]
+
+    # Queries
+
+    def complete(self, prefix):
+        """ Return the indexed tokens starting with prefix """
+        i = bisect_left(self.tokens, prefix)
+        res = []
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            res.append(self.tokens[i])
+            i += 1
+        return res
+
+    def fuzzy(self, token, maxdist=None):
+        """ Return the indexed tokens close to token (edit distance) """
+        if maxdist is None:
+            maxdist = 1 if len(token) < 6 else 2
+
+        if len(token) < 3:
+            return []
+
+        # Only tokens sharing the first letter are compared
+        res = []
+        for candidate in self.complete(token[0]):
+            # Compare with the whole token and with its beginning
+            if(edit_distance(token, candidate[:len(token)], maxdist) <= maxdist or
+               edit_distance(token, candidate, maxdist) <= maxdist):
+                res.append(candidate)
+        return res
+
+    def match_token(self, token):
+        """ Return a dict key -> score of the factories matching token.
+
+        Exact and prefix matches are used first; approximate matches
+        are only used when nothing starts with token.
+        """
+        scores = {}
+        candidates = self.complete(token)
+        factor = 1.
+        if not candidates:
+            candidates = self.fuzzy(token)
+            factor = FUZZY_PENALTY
+
+        for candidate in candidates:
+            bonus = EXACT_BONUS if candidate == token else 1.
+            for key, score in self.postings[candidate].iteritems():
+                s = score * bonus * factor
+                if scores.get(key, 0.) < s:
+                    scores[key] = s
+        return scores
+
+    def search(self, text, nb_inputs=-1, nb_outputs=-1, limit=None):
+        """ Return the list of factories matching text, best first.
+
+        All the words of text must match (as a prefix, or approximately).
+        An empty text returns all the factories.
+        @param nb_inputs : if >= 0, only factories with this number of inputs
+        @param nb_outputs : if >= 0, only factories with this number of outputs
+        @param limit : maximum number of results
+        """
+        words = [w.lower() for w in _word_re.findall(text or "")]
+
+        if nb_inputs >= 0 or nb_outputs >= 0:
+            allowed = self.with_arity(nb_inputs, nb_outputs)
+        else:
+            allowed = None
+
+        if words:
+            scores = None
+            for word in words:
+                match = self.match_token(word)
+                if allowed is not None:
+                    match = dict((k, s) for k, s in match.iteritems() if k in allowed)
+                if scores is None:
+                    scores = match
+                else:
+                    scores = dict((k, s + match[k]) for k, s in scores.iteritems()
+                                  if k in match)
+                if not scores:
+                    return []
+        elif allowed is not None:
+            scores = dict.fromkeys(allowed, 0.)
+        else:
+            scores = dict.fromkeys(self.factories, 0.)
+
+        return self.rank(scores, limit)
+
+    def with_arity(self, nb_inputs=-1, nb_outputs=-1):
+        """ Return the set of keys of the factories with nb_inputs inputs
+        and nb_outputs outputs (a negative value matches any number) """
+        if nb_inputs >= 0 and nb_outputs >= 0:
+            return self.arity.get((nb_inputs, nb_outputs), set())
+
+        res = set()
+        for (nin, nout), keys in self.arity.iteritems():
+            if((nb_inputs < 0 or nin == nb_inputs) and
+               (nb_outputs < 0 or nout == nb_outputs)):
+                res.update(keys)
+        return res
+
+    def compatible(self, inputs, outputs, limit=None):
+        """ Return the factories that can replace a node, best first.
+
+        Candidates have the same number of inputs and outputs and are
+        ranked by the similarity of their port interfaces.
+        @param inputs : list of input port descriptions of the node
+        @param outputs : list of output port descriptions of the node
+        @param limit : maximum number of results
+        """
+        signature = (port_signature(inputs), port_signature(outputs))
+        keys = self.with_arity(len(signature[0]), len(signature[1]))
+        scores = dict((k, signature_similarity(signature, self.signatures[k]))
+                      for k in keys)
+        return self.rank(scores, limit)
+
+    def rank(self, scores, limit=None):
+        """ Return the factories of a dict key -> score, best score first
+        and then by name """
+        # Scores take few distinct values, so only the buckets needed
+        # to reach limit are sorted.
+        buckets = {}
+        for key, score in scores.iteritems():
+            buckets.setdefault(score, []).append(key)
+
+        keys = []
+        for score in sorted(buckets, reverse=True):
+            bucket = buckets[score]
+            bucket.sort(key=self.sortkeys.__getitem__)
+            keys.extend(bucket)
+            if limit is not None and len(keys) >= limit:
+                del keys[limit:]
+                break
+        return [self.factories[k] for k in keys]
+
+
+_node_index = None
+
+
+def get_node_index():
+    """ Return the node index of the package manager, built on first call """
+    global _node_index
+    if _node_index is None:
+        from openalea.core.pkgmanager import PackageManager
+        _node_index = NodeIndex(PackageManager())
+        _node_index.update()
+    return _node_index
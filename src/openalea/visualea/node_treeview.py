@@ -41,6 +41,7 @@ from openalea.visualea.util import open_dialog, exception_display, busy_cursor
 from openalea.visualea.node_widget import SignalSlotListener
 from openalea.visualea.code_editor import get_editor
 from openalea.visualea.util import grab_icon
+from openalea.visualea.summary import summarize, describe
 
 from openalea.visualea import images_rc
 
@@ -115,6 +116,33 @@ def item_compare(x, y):
         return cmp(type_order_map[tx], type_order_map[ty])
 
 
+def item_key(x):
+    """ Sort key equivalent to item_compare, used to match items
+    of two successive package trees """
+    order = type_order_map.get(type(x))
+    if order is None:
+        for t, order in type_order_map.iteritems():
+            if isinstance(x, t):
+                break
+        else:
+            order = len(type_hierarchy)
+    return (order, x.get_id())
+
+
+def item_state(x):
+    """ What the model displays of an item (text, size, tooltip, icon),
+    used to tell whether a replaced item needs to be repainted """
+    try:
+        size = x.nb_public_values()
+    except:
+        size = None
+    try:
+        tip = x.get_tip()
+    except:
+        tip = None
+    return (type(x), x.get_id(), size, tip)
+
+
 class PkgModel (qt.QtCore.QAbstractItemModel):
 
     """ QT4 data model (model/view pattern) to support pkgmanager """
@@ -123,17 +151,146 @@ class PkgModel (qt.QtCore.QAbstractItemModel):
 
         qt.QtCore.QAbstractItemModel.__init__(self, parent)
         self.pman = pkgmanager
-        self.rootItem = self.pman.get_pseudo_pkg()
+        self.rootItem = self.get_root()
 
-        self.parent_map = {}
-        self.row_map = {}
+        self.parent_map = {} # map between item id and (item, parent)
+        self.row_map = {} # map between item id and row
         self.index_map = {} # map between name and Index object
+        self.children_map = {} # map between parent id and (parent, sorted children)
+
+    def get_root(self):
+        """ Return a fresh root item from the package manager """
+        return self.pman.get_pseudo_pkg()
 
     def reset(self):
 
-        self.rootItem = self.pman.get_pseudo_pkg()
+        self.rootItem = self.get_root()
+        self.clear_cache()
         qt.QtCore.QAbstractItemModel.reset(self)
 
+    def update(self):
+        """ Synchronise the model with the package manager.
+
+        Contrary to reset(), only the rows that appeared, disappeared or
+        changed are notified to the views (beginInsertRows, beginRemoveRows,
+        dataChanged), so expansion state and selection are preserved.
+        Pseudo packages and categories are rebuilt by each update, so a
+        replaced row is only repainted when its displayed state differs.
+        Only the parents whose children have already been requested by a
+        view are compared.
+        """
+        oldRoot = self.rootItem
+        newRoot = self.get_root()
+        self.rootItem = newRoot
+        self.__update_children(oldRoot, newRoot, qt.QtCore.QModelIndex())
+
+    def __update_children(self, oldParent, newParent, parentIndex):
+        """ Patch the cached children of oldParent to match newParent """
+        entry = self.children_map.pop(id(oldParent), None)
+        if entry is None:
+            return
+        old = entry[1]
+
+        if isinstance(newParent, AbstractFactory):
+            new = []
+        else:
+            new = list(newParent.iter_public_values())
+            new.sort(key=item_key)
+        self.children_map[id(newParent)] = (newParent, old)
+
+        newKeys = set(item_key(c) for c in new)
+        rowCount = len(old)
+
+        # Removed rows
+        for row in xrange(len(old) - 1, -1, -1):
+            if item_key(old[row]) not in newKeys:
+                self.beginRemoveRows(parentIndex, row, row)
+                self.__forget(old.pop(row))
+                self.endRemoveRows()
+
+        # Inserted and replaced rows (both lists are sorted by item_key)
+        for row, newChild in enumerate(new):
+            if row < len(old) and item_key(old[row]) == item_key(newChild):
+                oldChild = old[row]
+                if oldChild is not newChild:
+                    old[row] = newChild
+                    oldIndex = self.createIndex(row, 0, oldChild)
+                    newIndex = self.createIndex(row, 0, newChild)
+                    self.changePersistentIndex(oldIndex, newIndex)
+                    self.__update_children(oldChild, newChild, newIndex)
+                    self.__drop(oldChild)
+                    name = self.get_full_name(newChild)
+                    if name in self.index_map:
+                        self.index_map[name] = newIndex
+                    if item_state(oldChild) != item_state(newChild):
+                        self.emit(qt.QtCore.SIGNAL("dataChanged(const QModelIndex &, const QModelIndex &)"),
+                                  newIndex, newIndex)
+            else:
+                self.beginInsertRows(parentIndex, row, row)
+                old.insert(row, newChild)
+                self.endInsertRows()
+
+        # Refresh parent and row of each child
+        for row, childItem in enumerate(old):
+            self.parent_map[id(childItem)] = (childItem, newParent)
+            self.row_map[id(childItem)] = row
+
+        # The size info of the parent is displayed in its text
+        if parentIndex.isValid() and rowCount != len(old):
+            self.emit(qt.QtCore.SIGNAL("dataChanged(const QModelIndex &, const QModelIndex &)"),
+                      parentIndex, parentIndex)
+
+    def __forget(self, item):
+        """ Drop a removed item and its cached children """
+        entry = self.children_map.pop(id(item), None)
+        if entry is not None:
+            for childItem in entry[1]:
+                self.__forget(childItem)
+        self.__drop(item)
+
+    def __drop(self, item):
+        """ Drop the parent, row and index of an item which is no longer
+        in the tree. The entries hold the item so its id is not reused
+        before they are dropped """
+        entry = self.parent_map.get(id(item))
+        if entry is not None and entry[0] is item:
+            del self.parent_map[id(item)]
+            self.row_map.pop(id(item), None)
+        name = self.get_full_name(item)
+        index = self.index_map.get(name)
+        if index is not None and index.internalPointer() is item:
+            del self.index_map[name]
+
+    def clear_cache(self):
+        """ Forget the sorted children computed so far """
+        self.children_map.clear()
+        self.parent_map.clear()
+        self.row_map.clear()
+        self.index_map.clear()
+
+    def children(self, parentItem):
+        """ Return the sorted list of the public children of parentItem.
+
+        The list is computed once and kept until the next reset or update.
+        """
+        entry = self.children_map.get(id(parentItem))
+        if entry is not None and entry[0] is parentItem:
+            return entry[1]
+
+        if isinstance(parentItem, AbstractFactory):
+            l = []
+        else:
+            l = list(parentItem.iter_public_values())
+            l.sort(key=item_key)
+
+        # save parent and row of each child
+        for row, childItem in enumerate(l):
+            self.parent_map[id(childItem)] = (childItem, parentItem)
+            self.row_map[id(childItem)] = row
+
+        self.children_map[id(parentItem)] = (parentItem, l)
+        return l
+
     def columnCount(self, parent):
         return 1
 
@@ -200,14 +357,11 @@ class PkgModel (qt.QtCore.QAbstractItemModel):
         else:
             parentItem = parent.internalPointer()
 
-        l = list(parentItem.iter_public_values())
-        l.sort(item_compare)# (lambda x,y : cmp(x.get_id(), y.get_id())))
+        l = self.children(parentItem)
+        if row >= len(l):
+            return qt.QtCore.QModelIndex()
         childItem = l[row]
 
-        # save parent and row
-        self.parent_map[id(childItem)] = parentItem
-        self.row_map[id(childItem)] = row
-
         i = self.createIndex(row, column, childItem)
 
         name = self.get_full_name(childItem)
@@ -223,10 +377,13 @@ class PkgModel (qt.QtCore.QAbstractItemModel):
 
         childItem = index.internalPointer()
 
-        parentItem = self.parent_map[id(childItem)]
+        entry = self.parent_map.get(id(childItem))
+        if entry is None or entry[0] is not childItem:
+            return qt.QtCore.QModelIndex()
+        parentItem = entry[1]
 
         # Test if it is the root
-        if (id(parentItem) not in self.parent_map):
+        if (parentItem is self.rootItem or id(parentItem) not in self.row_map):
             return qt.QtCore.QModelIndex()
 
         else:
@@ -240,13 +397,8 @@ class PkgModel (qt.QtCore.QAbstractItemModel):
         else:
             parentItem = parent.internalPointer()
 
-        if isinstance(parentItem, AbstractFactory):
-            return 0
-
         # Return the number of DIFFERENT OBJECTS
-        l = parentItem.nb_public_values()
-
-        return l
+        return len(self.children(parentItem))
 
 
 class CategoryModel (PkgModel):
@@ -257,17 +409,16 @@ class CategoryModel (PkgModel):
 
         qt.QtCore.QAbstractItemModel.__init__(self, parent)
         self.pman = pkgmanager
-        self.rootItem = self.pman.get_pseudo_cat()
+        self.rootItem = self.get_root()
 
-        self.parent_map = {}
-        self.row_map = {}
+        self.parent_map = {} # map between item id and (item, parent)
+        self.row_map = {} # map between item id and row
         self.index_map = {}
+        self.children_map = {}
 
-    def reset(self):
-        self.rootItem = self.pman.get_pseudo_cat()
-        # self.parent_map = {}
-        # self.row_map = {}
-        qt.QtCore.QAbstractItemModel.reset(self)
+    def get_root(self):
+        """ Return a fresh root item from the package manager """
+        return self.pman.get_pseudo_cat()
 
 
 class DataPoolModel (qt.QtCore.QAbstractListModel):
@@ -279,26 +430,44 @@ class DataPoolModel (qt.QtCore.QAbstractListModel):
         qt.QtCore.QAbstractListModel.__init__(self, parent)
         self.datapool = datapool
 
+        self.names = None # sorted data names
+        self.summaries = {} # name -> display text
+        self.tooltips = {} # name -> tooltip text
+
     def reset(self):
+        self.names = None
+        self.summaries.clear()
+        self.tooltips.clear()
         qt.QtCore.QAbstractItemModel.reset(self)
 
+    def get_names(self):
+        """ Return the sorted list of data names """
+        if self.names is None:
+            self.names = sorted(self.datapool.keys())
+        return self.names
+
+    def get_name(self, row):
+        """ Return the name of the data displayed at row, or None """
+        names = self.get_names()
+        if 0 <= row < len(names):
+            return names[row]
+        return None
+
     def data(self, index, role):
 
         if (not index.isValid()):
             return to_qvariant()
 
-        if (index.row() >= len(list(self.datapool.keys()))):
+        name = self.get_name(index.row())
+        if name is None:
             return to_qvariant()
 
         if (role == qt.QtCore.Qt.DisplayRole):
-            l = list(self.datapool.keys())
-            l.sort()
-            name = l[index.row()]
-            #classname = self.datapool[name].__class__
-            value = repr(self.datapool[name])
-            if(len(value) > 30):
-                value = value[:30] + "..."
-            return to_qvariant("%s ( %s )" % (name, value))
+            text = self.summaries.get(name)
+            if text is None:
+                value = summarize(self.datapool[name], 30)
+                text = self.summaries[name] = "%s ( %s )" % (name, value)
+            return to_qvariant(text)
 
         # Icon
         elif(role == qt.QtCore.Qt.DecorationRole):
@@ -306,31 +475,11 @@ class DataPoolModel (qt.QtCore.QAbstractListModel):
 
         # Tool Tip
         elif(role == qt.QtCore.Qt.ToolTipRole):
-            l = list(self.datapool.keys())
-            l.sort()
-            name = l[index.row()]
-
-            tips = [name]
-
-            tips.append("%s\n" % (str(self.datapool[name]),))
-            tips.append("Dir :")
-
-            temp = ""
-            for i, n in enumerate(dir(self.datapool[name])):
-                s = str(n)
-                if(len(s) > 20):
-                    s = s[:20]
-                temp += s + "\t\t"
-                # 2 column view
-                if(i % 2):
-                    tips.append(temp)
-                    temp = ""
-
-            if(temp):
-                tips.append(temp)
-            tipstr = '\n'.join(tips)
-
-            return to_qvariant(str(tipstr))
+            tipstr = self.tooltips.get(name)
+            if tipstr is None:
+                tipstr = self.tooltips[name] = \
+                    name + "\n" + describe(self.datapool[name])
+            return to_qvariant(tipstr)
 
         else:
             return to_qvariant()
@@ -347,7 +496,7 @@ class DataPoolModel (qt.QtCore.QAbstractListModel):
         return to_qvariant()
 
     def rowCount(self, parent):
-        return len(list(self.datapool.keys()))
+        return len(self.get_names())
 
 
 class SearchModel (qt.QtCore.QAbstractListModel):
@@ -922,8 +1071,9 @@ class NodeFactoryTreeView(qt.QtGui.QTreeView, NodeFactoryView):
         qt.QtGui.QTreeView.reset(self)
 
         for n in list(self.expanded_items):
-            i = self.model().index_map[n]
-            self.setExpanded(i, True)
+            i = self.model().index_map.get(n)
+            if i is not None:
+                self.setExpanded(i, True)
 
 
 class SearchListView(qt.QtGui.QTreeView, NodeFactoryView):
@@ -971,7 +1121,11 @@ class DataPoolListView(qt.QtGui.QListView, SignalSlotListener):
     def notify(self, sender, event):
         """ Notification by observed """
 
-        self.reset()
+        model = self.model()
+        if model is not None:
+            model.reset()
+        else:
+            self.reset()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasFormat("openalea/data_instance"):
@@ -998,9 +1152,9 @@ class DataPoolListView(qt.QtGui.QListView, SignalSlotListener):
         dataStream = qt.QtCore.QDataStream(itemData, qt.QtCore.QIODevice.WriteOnly)
         pixmap = qt.QtGui.QPixmap(":/icons/ccmime.png")
 
-        l = list(self.model().datapool.keys())
-        l.sort()
-        name = l[item.row()]
+        name = self.model().get_name(item.row())
+        if name is None:
+            return
 
         dataStream.writeString(name)
 
@@ -1038,9 +1192,9 @@ class DataPoolListView(qt.QtGui.QListView, SignalSlotListener):
 
         datapool = model.datapool
 
-        l = list(self.model().datapool.keys())
-        l.sort()
-        name = l[item.row()]
+        name = model.get_name(item.row())
+        if name is None:
+            return
 
         del(datapool[name])
 
@@ -0,0 +1,214 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Evaluation of the independent branches of a dataflow in parallel.
+
+ParallelEvaluation evaluates each vertex once its parents are evaluated,
+like BrutEvaluation, but the ready vertices are run concurrently by a pool
+of threads. The evaluator is registered in
+openalea.core.algo.dataflow_evaluation so that it can be selected as the
+eval_algo of a composite node.
+
+Nodes send their notifications from the worker threads : in the GUI,
+dataflows must be evaluated through openalea.visualea.evaluation which
+replays them in the GUI thread. Nodes which need the GUI thread are run by
+the thread calling the evaluator, never by the pool.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import sys
+import Queue
+import threading
+import traceback as tb
+from multiprocessing import cpu_count
+
+from openalea.core.algo import dataflow_evaluation as evalmodule
+from openalea.core.algo.dataflow_evaluation import AbstractEvaluation, \
+     EvaluationException
+
+
+def nb_workers():
+    """ Number of threads used by ParallelEvaluation : the "workers" option
+    of the "eval" section of the settings, or the number of processors """
+    from openalea.visualea.settings_cache import get_settings_cache
+    try:
+        n = int(get_settings_cache().get("eval", "workers", 0))
+    except (TypeError, ValueError):
+        n = 0
+    if n <= 0:
+        try:
+            n = cpu_count()
+        except NotImplementedError:
+            n = 2
+    return n
+
+
+def run_parallel(parents, func, workers, local=None):
+    """ Call func(vid) for each vid of parents once func has been called for
+    all the parents of vid, by a pool of workers threads.
+
+    @param parents : dict vid -> set of vids of its parents.
+    @param func : function called in the worker threads.
+    @param workers : number of threads.
+    @param local : function of a vid, True if func(vid) must be called in
+                   the calling thread.
+
+    The first exception raised by func is raised again once the running
+    calls are finished. Raise RuntimeError if parents contains a cycle.
+    """
+    pending = dict((vid, set(ps)) for vid, ps in parents.iteritems())
+    children = dict((vid, []) for vid in parents)
+    for vid, ps in parents.iteritems():
+        for p in ps:
+            children[p].append(vid)
+    ready = [vid for vid, ps in pending.iteritems() if not ps]
+
+    tasks = Queue.Queue()
+    done = Queue.Queue()
+    def call(vid):
+        try:
+            func(vid)
+            done.put((vid, None, None))
+        except Exception, e:
+            done.put((vid, e, sys.exc_info()))
+
+    def work():
+        while True:
+            vid = tasks.get()
+            if vid is None:
+                return
+            call(vid)
+
+    threads = [threading.Thread(target=work)
+               for i in xrange(max(1, min(workers, len(parents))))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    running = 0
+    evaluated = 0
+    error = None
+    try:
+        while ready or running:
+            while ready and error is None:
+                vid = ready.pop()
+                running += 1
+                if local is not None and local(vid):
+                    call(vid)
+                else:
+                    tasks.put(vid)
+            if not running:
+                break
+            vid, e, exc_info = done.get()
+            running -= 1
+            if e is not None:
+                if error is None:
+                    error = e, exc_info
+                continue
+            evaluated += 1
+            for child in children[vid]:
+                ps = pending[child]
+                ps.discard(vid)
+                if not ps:
+                    ready.append(child)
+    finally:
+        for t in threads:
+            tasks.put(None)
+
+    if error is not None:
+        raise error[0], None, error[1][2]
+    if evaluated != len(parents):
+        raise RuntimeError("The dataflow contains a cycle. "
+                           "Use an other evaluation algorithm.")
+
+
+class ParallelEvaluation(AbstractEvaluation):
+    """ Evaluate the ready vertices of the dataflow concurrently """
+
+    def __init__(self, dataflow):
+        AbstractEvaluation.__init__(self, dataflow)
+
+    def parents_of(self, vid):
+        """ Return the set of vertices connected to the inputs of vid """
+        df = self._dataflow
+        return set(nvid for pid in df.in_ports(vid)
+                   for npid, nvid, nactor in self.get_parent_nodes(pid))
+
+    def get_parents(self, vids):
+        """ Return a dict vid -> set of parent vids for vids and all
+        their ancestors """
+        parents = {}
+        stack = list(vids)
+        while stack:
+            vid = stack.pop()
+            if vid in parents:
+                continue
+            ps = self.parents_of(vid)
+            parents[vid] = ps
+            stack.extend(ps)
+        return parents
+
+    def in_calling_thread(self, vid):
+        """ Return True if vid must be evaluated by the thread calling the
+        evaluator : the nodes which need the GUI thread """
+        from openalea.visualea.evaluation import needs_gui_thread
+        return needs_gui_thread(self._dataflow.actor(vid))
+
+    def eval_vertex(self, vid):
+        """ Set the inputs of vid from its parents outputs and evaluate it """
+        df = self._dataflow
+        actor = df.actor(vid)
+        try:
+            for pid in df.in_ports(vid):
+                inputs = [nactor.get_output(df.local_id(npid))
+                          for npid, nvid, nactor in self.get_parent_nodes(pid)]
+                if len(inputs) == 1:
+                    actor.set_input(df.local_id(pid), inputs[0])
+                elif inputs:
+                    actor.set_input(df.local_id(pid), inputs)
+        except Exception, e:
+            raise EvaluationException(vid, actor, e,
+                                      tb.format_tb(sys.exc_info()[2]))
+        self.eval_vertex_code(vid)
+
+    def eval_vertices(self, vids, workers=None):
+        """ Evaluate the vertices vids in topological order. Their parents
+        which are not in vids are not evaluated """
+        vids = set(vids)
+        parents = dict((vid, self.parents_of(vid) & vids) for vid in vids)
+        if workers is None:
+            workers = nb_workers()
+        run_parallel(parents, self.eval_vertex, workers,
+                     self.in_calling_thread)
+
+    def eval(self, vtx_id=None, *args, **kwds):
+        """ Evaluate the whole dataflow, or vtx_id and its ancestors """
+        df = self._dataflow
+        if vtx_id is None:
+            targets = [vid for vid in df.vertices() if df.nb_out_edges(vid) == 0]
+        else:
+            targets = [vtx_id]
+        run_parallel(self.get_parents(targets), self.eval_vertex, nb_workers(),
+                     self.in_calling_thread)
+
+
+def register():
+    """ Make ParallelEvaluation available as an eval_algo """
+    evalmodule.ParallelEvaluation = ParallelEvaluation
+    if "ParallelEvaluation" not in evalmodule.__evaluators__:
+        evalmodule.__evaluators__.append("ParallelEvaluation")
+
+
+register()
@@ -0,0 +1,170 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Per node execution profiles.
+
+When profiling is enabled for a graph, the evaluations started from the GUI
+record for each node its wall time, CPU time, number of calls and the
+approximate size of its outputs. CPU time is the time of the whole process:
+it is only meaningful with a sequential evaluator.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import sys
+import time
+import itertools
+import json
+import csv
+import weakref
+import threading
+
+
+def sizeof(value, depth=2, sample=100):
+    """ Approximate memory footprint of value in bytes. Containers are
+    looked at up to depth levels, by extrapolating the size of their
+    first sample elements. Objects exposing nbytes (numpy arrays) use it """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, (int, long)):
+        return nbytes
+    try:
+        size = sys.getsizeof(value)
+    except Exception:
+        return 0
+    if depth > 0 and not isinstance(value, basestring):
+        if isinstance(value, dict):
+            items = itertools.islice(value.iteritems(), sample)
+            sub = sum(sizeof(k, depth - 1) + sizeof(v, depth - 1)
+                      for k, v in items)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = itertools.islice(value, sample)
+            sub = sum(sizeof(v, depth - 1) for v in items)
+        else:
+            return size
+        n = len(value)
+        if n > sample:
+            sub = sub * n // sample
+        size += sub
+    return size
+
+
+class Profile(object):
+    """ Measures of a node """
+
+    __slots__ = ("caption", "calls", "wall", "cpu", "size")
+
+    fields = ("caption", "calls", "wall", "cpu", "size")
+
+    def __init__(self, caption=""):
+        self.caption = caption
+        self.calls = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.size = 0
+
+    def as_dict(self):
+        return dict((f, getattr(self, f)) for f in self.fields)
+
+
+class Profiler(object):
+    """ Profiles of the nodes of a graph """
+
+    def __init__(self):
+        self.enabled = False
+        self.__profiles = weakref.WeakKeyDictionary()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__profiles)
+
+    def get(self, node):
+        """ Return the Profile of node or None """
+        return self.__profiles.get(node)
+
+    def profiles(self):
+        """ Return the list of (node, Profile) """
+        return self.__profiles.items()
+
+    def max_wall(self):
+        return max([p.wall for p in self.__profiles.values()] or [0.])
+
+    def clear(self):
+        self.__profiles.clear()
+
+    def record(self, node, wall, cpu, size):
+        with self.__lock:
+            profile = self.__profiles.get(node)
+            if profile is None:
+                profile = Profile(node.get_caption())
+                self.__profiles[node] = profile
+        profile.calls += 1
+        profile.wall += wall
+        profile.cpu += cpu
+        profile.size = size
+        return profile
+
+    def rows(self):
+        """ Return the profiles as a list of dicts, slowest first """
+        rows = [p.as_dict() for n, p in self.profiles()]
+        rows.sort(key=lambda r: -r["wall"])
+        return rows
+
+    def to_json(self, f):
+        """ Write the profiles in the file object f """
+        json.dump(self.rows(), f, indent=2)
+
+    def to_csv(self, f):
+        """ Write the profiles in the file object f """
+        writer = csv.writer(f)
+        writer.writerow(Profile.fields)
+        for row in self.rows():
+            caption = row["caption"]
+            if isinstance(caption, unicode):
+                row["caption"] = caption.encode("utf-8")
+            writer.writerow([row[k] for k in Profile.fields])
+
+
+def profiled_eval(node, profiler, original):
+    """ Return a function to be used as node.eval, which records the
+    execution of node in profiler """
+    def eval():
+        wall, cpu = time.time(), time.clock()
+        try:
+            return original()
+        finally:
+            wall, cpu = time.time() - wall, time.clock() - cpu
+            size = sum(sizeof(node.get_output(i))
+                       for i in xrange(node.get_nb_output()))
+            profiler.record(node, wall, cpu, size)
+            node.notify_listeners(("internal_state_changed", "profile", None))
+    return eval
+
+
+def refresh_nodes(graph):
+    """ Make the views of the nodes of graph show their current profile """
+    for vid in graph.vertices():
+        graph.node(vid).notify_listeners(("internal_state_changed", "profile", None))
+
+
+# graph -> Profiler
+__profilers__ = weakref.WeakKeyDictionary()
+
+
+def get_profiler(graph):
+    """ Return the profiler of graph, it is disabled by default """
+    profiler = __profilers__.get(graph)
+    if profiler is None:
+        profiler = Profiler()
+        __profilers__[graph] = profiler
+    return profiler
@@ -0,0 +1,122 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""
+The table of the execution profiles of a graph.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import weakref
+from openalea.vpltk.qt import qt
+from openalea.visualea.profiler import refresh_nodes
+
+
+class SortableItem(qt.QtGui.QTableWidgetItem):
+    """ Item sorted by a python value instead of its text """
+
+    def __init__(self, text, key):
+        qt.QtGui.QTableWidgetItem.__init__(self, text)
+        self.key = key
+        self.setFlags(qt.QtCore.Qt.ItemIsSelectable | qt.QtCore.Qt.ItemIsEnabled)
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+def format_size(nbytes):
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return "%.0f %s" % (nbytes, unit)
+        nbytes /= 1024.
+    return "%.1f GB" % (nbytes,)
+
+
+class ProfileView(qt.QtGui.QWidget):
+    """ Sortable table of the profiles of a Profiler, with export. The
+    heat map of graph is cleared with the profiles """
+
+    headers = ["Node", "Calls", "Wall time (s)", "CPU time (s)", "Output size"]
+
+    def __init__(self, profiler, graph=None, parent=None):
+        qt.QtGui.QWidget.__init__(self, parent)
+        self.profiler = profiler
+        self.graph = weakref.ref(graph) if graph is not None else lambda: None
+
+        self.table = qt.QtGui.QTableWidget(0, len(self.headers), self)
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.verticalHeader().hide()
+        self.table.setAlternatingRowColors(True)
+
+        refresh = qt.QtGui.QPushButton("Refresh", self)
+        clear = qt.QtGui.QPushButton("Clear", self)
+        toJson = qt.QtGui.QPushButton("Export JSON...", self)
+        toCsv = qt.QtGui.QPushButton("Export CSV...", self)
+        refresh.clicked.connect(self.refresh)
+        clear.clicked.connect(self.clear)
+        toJson.clicked.connect(self.export_json)
+        toCsv.clicked.connect(self.export_csv)
+
+        buttons = qt.QtGui.QHBoxLayout()
+        for b in (refresh, clear):
+            buttons.addWidget(b)
+        buttons.addStretch()
+        for b in (toJson, toCsv):
+            buttons.addWidget(b)
+
+        layout = qt.QtGui.QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        self.resize(600, 400)
+        self.refresh()
+
+    def refresh(self):
+        table = self.table
+        rows = self.profiler.rows()
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            table.setItem(i, 0, SortableItem(row["caption"], row["caption"]))
+            table.setItem(i, 1, SortableItem(str(row["calls"]), row["calls"]))
+            table.setItem(i, 2, SortableItem("%.4f" % row["wall"], row["wall"]))
+            table.setItem(i, 3, SortableItem("%.4f" % row["cpu"], row["cpu"]))
+            table.setItem(i, 4, SortableItem(format_size(row["size"]), row["size"]))
+        table.setSortingEnabled(True)
+        table.resizeColumnsToContents()
+
+    def clear(self):
+        self.profiler.clear()
+        self.refresh()
+        graph = self.graph()
+        if graph is not None:
+            refresh_nodes(graph)
+
+    def export_json(self):
+        self.__export("JSON (*.json)", self.profiler.to_json)
+
+    def export_csv(self):
+        self.__export("CSV (*.csv)", self.profiler.to_csv)
+
+    def __export(self, filter, writer):
+        filename = qt.QtGui.QFileDialog.getSaveFileName(
+            self, "Export profile", qt.QtCore.QDir.homePath(), filter)
+        filename = str(filename)
+        if not filename:
+            return
+        f = open(filename, "wb")
+        try:
+            writer(f)
+        finally:
+            f.close()
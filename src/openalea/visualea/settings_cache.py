@@ -0,0 +1,85 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""In memory cache of user settings.
+
+Reading the configuration file and evaluating its values is too slow to
+be done in notification handlers. The cache reads each option once and
+notifies its listeners when the preferences are changed.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+from openalea.core.observer import Observed
+from openalea.core.settings import Settings
+
+
+class SettingsCache(Observed):
+
+    """ Evaluated values of the Settings, read on first access """
+
+    def __init__(self):
+        Observed.__init__(self)
+        self.__values = {}
+
+    def get(self, section, option, default=None):
+        """ Return the evaluated value of section/option, or default if
+        the option is not set or cannot be evaluated """
+        key = (section, option)
+        try:
+            return self.__values[key]
+        except KeyError:
+            pass
+
+        try:
+            value = eval(Settings().get(section, option))
+        except:
+            value = default
+
+        self.__values[key] = value
+        return value
+
+    def get_string(self, section, option, default=None):
+        """ Return the value of section/option as written, without
+        evaluating it (e.g. paths), or default if the option is not set """
+        key = (section, option, str)
+        try:
+            return self.__values[key]
+        except KeyError:
+            pass
+
+        try:
+            value = Settings().get(section, option)
+        except Exception:
+            value = default
+
+        self.__values[key] = value
+        return value
+
+    def changed(self):
+        """ Forget the cached values and notify the listeners.
+        To be called after the settings have been written """
+        self.__values.clear()
+        self.notify_listeners(("settings_changed",))
+
+
+_settings_cache = None
+
+
+def get_settings_cache():
+    """ Return the settings cache shared by the whole application """
+    global _settings_cache
+    if _settings_cache is None:
+        _settings_cache = SettingsCache()
+    return _settings_cache
@@ -0,0 +1,162 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Short textual summaries of arbitrary values.
+
+Values displayed in the GUI (data pool, port tooltips) may be huge.
+The functions of this module never build the full string representation
+of a container: only its first elements are looked at.
+
+Summaries of specific types are provided by summarizers, registered with
+register_summarizer() either for a type or for a qualified type name
+("numpy.ndarray") so that optional libraries are never imported here.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+from repr import Repr
+
+# Default maximum length of a summary
+MAXLEN = 80
+
+# type or "module.Class" -> summarizer(value, maxlen)
+_summarizers = {}
+
+
+def register_summarizer(cls, summarizer):
+    """ Register a summarizer for the instances of cls and its subclasses.
+
+    @param cls : a type, or the qualified name of a type ("numpy.ndarray")
+    @param summarizer : function (value, maxlen) -> string
+    """
+    _summarizers[cls] = summarizer
+
+
+def unregister_summarizer(cls):
+    """ Remove the summarizer registered for cls """
+    _summarizers.pop(cls, None)
+
+
+def get_summarizer(value):
+    """ Return the summarizer of the most specific type of value,
+    or None """
+    for t in type(value).__mro__:
+        summarizer = _summarizers.get(t)
+        if summarizer is None:
+            summarizer = _summarizers.get("%s.%s" % (t.__module__, t.__name__))
+        if summarizer is not None:
+            return summarizer
+    return None
+
+
+def truncate(text, maxlen=MAXLEN):
+    """ Cut text to maxlen characters """
+    if len(text) > maxlen:
+        return text[:maxlen] + "..."
+    return text
+
+
+def bounded_repr(value, maxlen=MAXLEN):
+    """ repr() of value looking at a number of container elements
+    proportional to maxlen """
+    r = Repr()
+    r.maxlevel = 3
+    r.maxlist = r.maxtuple = r.maxset = r.maxfrozenset = max(6, maxlen // 8)
+    r.maxdeque = r.maxarray = r.maxlist
+    r.maxdict = max(4, maxlen // 16)
+    r.maxstring = r.maxother = maxlen
+    r.maxlong = 40
+    return r.repr(value)
+
+
+def summarize(value, maxlen=MAXLEN):
+    """ Return a representation of value of at most maxlen characters
+    (plus an ellipsis) """
+    try:
+        summarizer = get_summarizer(value)
+        if summarizer is None:
+            text = bounded_repr(value, maxlen)
+        else:
+            text = summarizer(value, maxlen)
+    except Exception, e:
+        text = "<%s (repr failed: %s)>" % (type(value).__name__, e)
+    return truncate(text, maxlen)
+
+
+def describe(value, maxattr=40):
+    """ Return a multi-line description of value : its type, a summary
+    and its first public attributes, for tooltips """
+    tips = ["Type : %s" % (type(value).__name__,),
+            summarize(value, 2 * MAXLEN),
+            ""]
+
+    names = [n for n in dir(value) if not n.startswith("_")]
+    tips.append("Dir (%i) :" % (len(names),))
+    temp = ""
+    for i, n in enumerate(names[:maxattr]):
+        temp += truncate(n, 20) + "\t\t"
+        # 2 column view
+        if(i % 2):
+            tips.append(temp)
+            temp = ""
+    if(temp):
+        tips.append(temp)
+    if len(names) > maxattr:
+        tips.append("...")
+
+    return '\n'.join(tips)
+
+
+################################################################################
+# Summarizers
+
+def summarize_sized(value, maxlen):
+    """ Containers : number of elements followed by the first ones """
+    return "%s of %i: %s" % (type(value).__name__, len(value),
+                             bounded_repr(value, maxlen))
+
+
+def summarize_string(value, maxlen):
+    """ Strings : only the first characters are copied """
+    if len(value) > maxlen:
+        return repr(value[:maxlen]) + "... (%i chars)" % (len(value),)
+    return repr(value)
+
+
+def summarize_ndarray(value, maxlen):
+    """ numpy arrays : shape, dtype and first elements of the flat array """
+    k = max(1, maxlen // 8)
+    first = ", ".join(str(x) for x in value.flat[:k])
+    if value.size > k:
+        first += ", ..."
+    return "array(shape=%s, dtype=%s) [%s]" % (value.shape, value.dtype, first)
+
+
+def summarize_scene(value, maxlen):
+    """ PlantGL scenes : number of shapes """
+    return "Scene with %i shapes" % (len(value),)
+
+
+def summarize_mtg(value, maxlen):
+    """ Multiscale Tree Graphs : number of vertices and scales """
+    return "MTG with %i vertices, %i scales" % (value.nb_vertices(),
+                                                value.nb_scales())
+
+
+for t in (list, tuple, dict, set, frozenset):
+    register_summarizer(t, summarize_sized)
+register_summarizer(basestring, summarize_string)
+register_summarizer("numpy.ndarray", summarize_ndarray)
+register_summarizer("openalea.plantgl.scenegraph._pglsg.Scene", summarize_scene)
+register_summarizer("openalea.mtg.mtg.MTG", summarize_mtg)
@@ -0,0 +1,271 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Parameter sweeps : evaluation of a factory for many input values.
+
+The input samples are either the Cartesian product of lists of values or a
+Latin hypercube sampling of intervals. Each sample is evaluated in a process
+of a local pool, which instantiates the factory itself (see batch.run), and
+the results are appended to a ResultTable as they arrive.
+
+The GUI does not fork the pool itself : it starts a worker process (main)
+which reads the sweep on its standard input and writes the rows on its
+standard output.
+
+This module does not import Qt.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import os
+import sys
+import csv
+import base64
+import cPickle
+import random
+import traceback
+import itertools
+import threading
+import multiprocessing
+
+from openalea.visualea.batch import parse_value
+
+
+GRID = "grid"
+LATIN_HYPERCUBE = "latin hypercube"
+
+
+def parse_range(text):
+    """ Parse the range of an input:
+        - "start:stop:num" : num values evenly spaced from start to stop
+        - "low:high" : an interval, for Latin hypercube sampling
+        - "v1, v2, ..." : a list of values
+        - "v" : a single value
+    Return a list of values or a (low, high) tuple for an interval.
+    """
+    text = text.strip()
+    parts = text.split(":")
+    if len(parts) == 3:
+        start, stop, num = float(parts[0]), float(parts[1]), int(parts[2])
+        if num < 2:
+            return [start]
+        step = (stop - start) / (num - 1)
+        return [start + i * step for i in xrange(num)]
+    elif len(parts) == 2:
+        return (float(parts[0]), float(parts[1]))
+    value = parse_value("[" + text + "]")
+    if isinstance(value, list):
+        return value
+    return [parse_value(text)]
+
+
+def grid(ranges):
+    """ Cartesian product of the lists of values of ranges.
+
+    @param ranges : dict input name -> list of values
+    @return : list of dicts input name -> value
+    """
+    names = sorted(ranges)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[ranges[n] for n in names])]
+
+
+def latin_hypercube(bounds, n, seed=None):
+    """ n samples of the intervals of bounds such that each interval,
+    cut in n strata, has exactly one sample in each stratum.
+
+    @param bounds : dict input name -> (low, high)
+    @return : list of dicts input name -> value
+    """
+    rnd = random.Random(seed)
+    samples = [{} for i in xrange(n)]
+    for name in sorted(bounds):
+        low, high = bounds[name]
+        width = (high - low) / float(n)
+        strata = range(n)
+        rnd.shuffle(strata)
+        for sample, k in zip(samples, strata):
+            sample[name] = low + (k + rnd.random()) * width
+    return samples
+
+
+def make_samples(ranges, mode=GRID, n=10, seed=None):
+    """ Samples of ranges, as returned by parse_range, for mode GRID or
+    LATIN_HYPERCUBE. In Latin hypercube mode, lists of values are drawn
+    at random and intervals are stratified """
+    if mode == GRID:
+        for name, r in ranges.iteritems():
+            if isinstance(r, tuple):
+                raise ValueError("%s: an interval needs a number of values "
+                                 "(low:high:num) for a grid" % (name,))
+        return grid(ranges)
+
+    bounds = dict((k, r) for k, r in ranges.iteritems() if isinstance(r, tuple))
+    samples = latin_hypercube(bounds, n, seed)
+    rnd = random.Random(seed)
+    for name, r in ranges.iteritems():
+        if not isinstance(r, tuple):
+            for sample in samples:
+                sample[name] = rnd.choice(r)
+    return samples
+
+
+class ResultTable(object):
+    """ Rows of inputs and outputs of a sweep, filled as results arrive.
+    Rows are dicts ; listeners are called with each new row """
+
+    def __init__(self, input_names=(), output_names=()):
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        self.rows = []
+        self.listeners = []
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def columns(self):
+        return ["index"] + self.input_names + self.output_names + ["error"]
+
+    def append(self, row):
+        with self.__lock:
+            self.rows.append(row)
+        for listener in self.listeners:
+            listener(row)
+
+    def to_csv(self, f):
+        writer = csv.writer(f)
+        columns = self.columns()
+        writer.writerow(columns)
+        for row in sorted(self.rows, key=lambda r: r["index"]):
+            writer.writerow([row.get(c, "") for c in columns])
+
+
+def _run_sample(args):
+    """ Evaluate one sample in a worker process. Always return a row : the
+    pool calls back run_sweep, which frees the process, only for results """
+    index, package_id, factory_id, fixed, sample = args
+    from openalea.visualea import batch
+    import cPickle
+    inputs = dict(fixed)
+    inputs.update(sample)
+    row = {"index": index}
+    row.update(sample)
+    try:
+        outputs = batch.run(package_id, factory_id, inputs)
+    except BaseException, e: # also SystemExit or KeyboardInterrupt of a node
+        row["error"] = "%s: %s" % (e.__class__.__name__, e)
+        return row
+    for name, value in outputs.iteritems():
+        try:
+            cPickle.dumps(value, 2)
+        except Exception:
+            value = repr(value)
+        row[name] = value
+    return row
+
+
+def run_sweep(package_id, factory_id, samples, table, fixed=None,
+              workers=None, stop=None, pool=None):
+    """ Evaluate the factory for each sample of inputs in a pool of
+    processes and append the results to table.
+
+    @param fixed : dict of the inputs which are the same for all samples
+    @param workers : number of processes, the number of processors by default
+    @param stop : optional threading.Event. When it is set, no more sample
+    is started and the sweep returns when the running ones are done
+    @param pool : optional multiprocessing.Pool (or an object with its
+    apply_async, close and join), workers processes by default
+    """
+    tasks = [(i, package_id, factory_id, fixed or {}, sample)
+             for i, sample in enumerate(samples)]
+    workers = workers or multiprocessing.cpu_count()
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(workers)
+
+    # submit a sample only when a process is free, to check stop in between
+    free = threading.Semaphore(workers)
+    def done(row):
+        try:
+            table.append(row)
+        finally:
+            free.release()
+
+    try:
+        for task in tasks:
+            free.acquire()
+            if stop is not None and stop.is_set():
+                free.release()
+                break
+            submitted = False
+            try:
+                pool.apply_async(_run_sample, (task,), callback=done)
+                submitted = True
+            finally:
+                if not submitted:
+                    free.release()
+        pool.close()
+        pool.join()
+    finally:
+        if own_pool:
+            pool.terminate()
+            pool.join()
+    return table
+
+
+def message(obj):
+    """ Return obj as a line. Messages are only exchanged with the worker
+    process started by the GUI, through its pipes """
+    return base64.b64encode(cPickle.dumps(obj, 2)) + "\n"
+
+
+def write_message(f, obj):
+    f.write(message(obj))
+    f.flush()
+
+
+def read_message(line):
+    return cPickle.loads(base64.b64decode(line.strip()))
+
+
+def main():
+    """ Entry point of the worker process of the GUI : the first message of
+    the standard input is the dict of the arguments of run_sweep, the rows
+    are written on the standard output. The line "stop", or the end of the
+    standard input, stops the sweep after the running samples """
+    kwargs = read_message(sys.stdin.readline())
+    stop = threading.Event()
+
+    def wait_stop():
+        while True:
+            line = sys.stdin.readline()
+            if not line or line.strip() == "stop":
+                break
+        stop.set()
+    listener = threading.Thread(target=wait_stop)
+    listener.daemon = True
+    listener.start()
+
+    # the nodes may print : keep the standard output for the rows only
+    out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    table = ResultTable()
+    table.listeners.append(lambda row: write_message(out, row))
+    try:
+        run_sweep(table=table, stop=stop, **kwargs)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
@@ -0,0 +1,224 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""
+The parameter sweep widget of a composite node factory.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import sys
+import multiprocessing
+
+from openalea.vpltk.qt import qt
+from openalea.visualea import sweep
+from openalea.visualea.summary import summarize
+from openalea.visualea.util import display_exception, display_error
+
+
+# processes of closed widgets which are stopping
+_stopping = set()
+
+# the worker process runs the pool : forking the GUI process is not safe
+WORKER_ARGS = ["-c", "import sys; from openalea.visualea import sweep; "
+                     "sys.exit(sweep.main())"]
+
+
+class SweepWidget(qt.QtGui.QWidget):
+    """ Declare the values of the inputs of a factory, evaluate it for
+    all the samples in a process pool and show the results """
+
+    def __init__(self, factory, inputs, parent=None):
+        """
+        @param factory : a factory saved in a package
+        @param inputs : list of (input name, current value)
+        """
+        qt.QtGui.QWidget.__init__(self, parent)
+        self.factory = factory
+        self.process = None
+        self.table = None
+        self.output_names = [d["name"] for d in factory.outputs]
+
+        self.inputTable = qt.QtGui.QTableWidget(len(inputs), 2, self)
+        self.inputTable.setHorizontalHeaderLabels(["Input", "Values"])
+        self.inputTable.verticalHeader().hide()
+        self.inputTable.horizontalHeader().setStretchLastSection(True)
+        for i, (name, value) in enumerate(inputs):
+            item = qt.QtGui.QTableWidgetItem(name)
+            item.setFlags(qt.QtCore.Qt.ItemIsEnabled)
+            self.inputTable.setItem(i, 0, item)
+            self.inputTable.setItem(i, 1, qt.QtGui.QTableWidgetItem(repr(value)))
+
+        help = qt.QtGui.QLabel("Values : v1, v2, ... or start:stop:num, "
+                               "or low:high for a Latin hypercube.\n"
+                               "The factory is evaluated as saved.", self)
+
+        self.modeBox = qt.QtGui.QComboBox(self)
+        self.modeBox.addItems(["Grid", "Latin hypercube"])
+        self.samplesBox = qt.QtGui.QSpinBox(self)
+        self.samplesBox.setRange(1, 1000000)
+        self.samplesBox.setValue(20)
+        self.samplesBox.setPrefix("Samples: ")
+        self.workersBox = qt.QtGui.QSpinBox(self)
+        self.workersBox.setRange(1, 256)
+        self.workersBox.setValue(multiprocessing.cpu_count())
+        self.workersBox.setPrefix("Processes: ")
+
+        self.runButton = qt.QtGui.QPushButton("Run", self)
+        self.stopButton = qt.QtGui.QPushButton("Stop", self)
+        self.stopButton.setEnabled(False)
+        self.exportButton = qt.QtGui.QPushButton("Export CSV...", self)
+        self.runButton.clicked.connect(self.run)
+        self.stopButton.clicked.connect(self.stop)
+        self.exportButton.clicked.connect(self.export_csv)
+
+        self.resultTable = qt.QtGui.QTableWidget(0, 0, self)
+        self.resultTable.verticalHeader().hide()
+        self.progress = qt.QtGui.QLabel(self)
+
+        controls = qt.QtGui.QHBoxLayout()
+        for w in (self.modeBox, self.samplesBox, self.workersBox,
+                  self.runButton, self.stopButton):
+            controls.addWidget(w)
+        bottom = qt.QtGui.QHBoxLayout()
+        bottom.addWidget(self.progress)
+        bottom.addStretch()
+        bottom.addWidget(self.exportButton)
+
+        layout = qt.QtGui.QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.addWidget(self.inputTable)
+        layout.addWidget(help)
+        layout.addLayout(controls)
+        layout.addWidget(self.resultTable, 1)
+        layout.addLayout(bottom)
+        self.resize(700, 600)
+
+    def get_ranges(self):
+        """ Return (ranges, fixed) : the inputs with several values and
+        the inputs with a single value """
+        ranges, fixed = {}, {}
+        for i in xrange(self.inputTable.rowCount()):
+            name = str(self.inputTable.item(i, 0).text())
+            text = str(self.inputTable.item(i, 1).text())
+            if not text.strip():
+                continue
+            r = sweep.parse_range(text)
+            if isinstance(r, list) and len(r) == 1:
+                fixed[name] = r[0]
+            else:
+                ranges[name] = r
+        return ranges, fixed
+
+    def run(self):
+        if self.process is not None:
+            return
+        try:
+            ranges, fixed = self.get_ranges()
+            mode = sweep.GRID if self.modeBox.currentIndex() == 0 \
+                   else sweep.LATIN_HYPERCUBE
+            samples = sweep.make_samples(ranges, mode, self.samplesBox.value())
+        except Exception, e:
+            display_exception(self, e)
+            return
+
+        self.table = sweep.ResultTable(sorted(ranges), self.output_names)
+        self.total = len(samples)
+        columns = self.table.columns()
+        self.resultTable.setSortingEnabled(False)
+        self.resultTable.clear()
+        self.resultTable.setRowCount(0)
+        self.resultTable.setColumnCount(len(columns))
+        self.resultTable.setHorizontalHeaderLabels(columns)
+
+        self.process = process = qt.QtCore.QProcess()
+        process.readyReadStandardOutput.connect(self.read_rows)
+        process.finished.connect(self.finished)
+        process.start(sys.executable, WORKER_ARGS)
+        if not process.waitForStarted():
+            self.process = None
+            display_error(self, "Parameter sweep",
+                          ["The worker process can't be started."])
+            return
+        process.write(sweep.message(
+            dict(package_id=self.factory.package.get_id(),
+                 factory_id=self.factory.name,
+                 samples=samples,
+                 fixed=fixed,
+                 workers=self.workersBox.value())))
+        self.runButton.setEnabled(False)
+        self.stopButton.setEnabled(True)
+        self.update_progress()
+
+    def stop(self):
+        """ Start no more sample, the running ones finish """
+        if self.process is not None:
+            self.process.write("stop\n")
+
+    def read_rows(self):
+        while self.process.canReadLine():
+            row = sweep.read_message(str(self.process.readLine()))
+            self.table.append(row)
+            self.add_row(row)
+
+    def add_row(self, row):
+        columns = self.table.columns()
+        r = self.resultTable.rowCount()
+        self.resultTable.insertRow(r)
+        for c, name in enumerate(columns):
+            value = row.get(name, "")
+            text = value if isinstance(value, basestring) else summarize(value)
+            self.resultTable.setItem(r, c, qt.QtGui.QTableWidgetItem(text))
+        self.update_progress()
+
+    def update_progress(self):
+        self.progress.setText("%i / %i" % (len(self.table), self.total))
+
+    def finished(self, exitCode, exitStatus=None):
+        process = self.process
+        self.read_rows()
+        self.process = None
+        self.runButton.setEnabled(True)
+        self.stopButton.setEnabled(False)
+        self.resultTable.setSortingEnabled(True)
+        self.resultTable.resizeColumnsToContents()
+        if exitCode != 0:
+            errors = str(process.readAllStandardError())
+            display_error(self, "Parameter sweep failed", [errors])
+
+    def closeEvent(self, event):
+        process = self.process
+        if process is not None:
+            # the process stops when its running samples are done
+            process.readyReadStandardOutput.disconnect(self.read_rows)
+            process.finished.disconnect(self.finished)
+            process.closeWriteChannel()
+            _stopping.add(process)
+            process.finished.connect(lambda *args: _stopping.discard(process))
+            self.process = None
+        qt.QtGui.QWidget.closeEvent(self, event)
+
+    def export_csv(self):
+        if self.table is None:
+            return
+        filename = qt.QtGui.QFileDialog.getSaveFileName(
+            self, "Export sweep", qt.QtCore.QDir.homePath(), "CSV (*.csv)")
+        filename = str(filename)
+        if not filename:
+            return
+        f = open(filename, "wb")
+        try:
+            self.table.to_csv(f)
+        finally:
+            f.close()
@@ -0,0 +1,335 @@
+# -*- python -*-
+#
+#       OpenAlea.Visualea: OpenAlea graphical user interface
+#
+#       Copyright 2006-2009 INRIA - CIRAD - INRA
+#
+#       Distributed under the CeCILL v2 License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+################################################################################
+"""Undo and redo of the edits of a graph.
+
+An edit is recorded as a Transaction : the state of the graph (vertices,
+edges and the metadata shown by the GUI) is taken when the transaction
+begins and compared with the state when it ends. Only the differences are
+kept : the nodes which were added or removed (the node objects themselves,
+with their input values), the edges, and the old and new values of the
+metadata which changed. Undoing or redoing a transaction replays these
+differences on the graph, the graph is not instantiated again.
+
+Recording an edit costs a pass over the graph when it begins and when it
+ends, whatever the size of the edit : the graph does not notify the changes
+of the metadata of its nodes. Only the metadata taken when the edit begins
+are copied. The stacks are limited by their number of transactions and by
+the memory held by the nodes which they keep (see UndoStack).
+
+Edits made outside of the transactions (a node dropped from the package
+tree, an edge drawn with the mouse) make the stack forget the steps to
+redo (see track). A transaction which doesn't match the graph any more is
+refused before anything is changed.
+
+This module does not import Qt.
+"""
+
+__license__ = "CeCILL v2"
+__revision__ = " $Id$ "
+
+import weakref
+
+from openalea.visualea.profiler import sizeof
+
+
+# notifications of the graph which change its structure
+STRUCTURE_EVENTS = ("vertex_added", "vertex_removed", "edge_added",
+                    "edge_removed")
+
+# metadata of the vertices restored by undo, caption is the node attribute
+VERTEX_KEYS = ("position", "userColor", "useUserColor")
+ANNOTATION_KEYS = ("position", "text", "textColor", "color", "rectP2",
+                   "visualStyle")
+
+
+def copy_value(value):
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def get_metadata(node, copy=True):
+    """ Return the dict of the metadata of node restored by undo. The lists
+    are copied unless copy is False """
+    if "__graphitem__" in node.__class__.__dict__:
+        keys = ANNOTATION_KEYS
+    else:
+        keys = VERTEX_KEYS
+    mdict = node.get_ad_hoc_dict()
+    values = {}
+    for key in keys:
+        try:
+            value = mdict.get_metadata(key)
+            values[key] = copy_value(value) if copy else value
+        except Exception:
+            pass
+    values["caption"] = getattr(node, "caption", None)
+    return values
+
+
+def set_metadata(node, key, value):
+    if key == "caption":
+        node.caption = value
+    else:
+        node.get_ad_hoc_dict().set_metadata(key, copy_value(value))
+
+
+def edge_set(graph):
+    """ Return the set of the edges of graph as
+    (source vid, source port, target vid, target port) """
+    return set((graph.source(eid), graph.local_id(graph.source_port(eid)),
+                graph.target(eid), graph.local_id(graph.target_port(eid)))
+               for eid in graph.edges())
+
+
+class UndoError(Exception):
+    """ The transaction doesn't match the graph any more """
+    pass
+
+
+class Snapshot(object):
+    """ The state of a graph that transactions compare. The metadata of
+    the snapshot taken when an edit ends are not copied """
+
+    def __init__(self, graph, copy=True):
+        self.nodes = dict((vid, graph.node(vid)) for vid in graph.vertices())
+        self.edges = edge_set(graph)
+        self.metadata = dict((vid, get_metadata(node, copy))
+                             for vid, node in self.nodes.iteritems())
+
+
+def node_size(node):
+    """ Estimate the memory held by node in bytes, mostly its input values """
+    return 1000 + sizeof(getattr(node, "inputs", None) or [])
+
+
+class Transaction(object):
+    """ The differences made to a graph by an edit """
+
+    def __init__(self, label, before, after):
+        self.label = label
+        # vid -> node, a node replaced by another is removed and added
+        self.removed = dict((vid, n) for vid, n in before.nodes.iteritems()
+                            if after.nodes.get(vid) is not n)
+        self.added = dict((vid, n) for vid, n in after.nodes.iteritems()
+                          if before.nodes.get(vid) is not n)
+        # the edges of removed and added nodes go and come back with them
+        self.removed_edges = [e for e in before.edges
+                              if e not in after.edges
+                              or e[0] in self.removed or e[2] in self.removed]
+        self.added_edges = [e for e in after.edges
+                            if e not in before.edges
+                            or e[0] in self.added or e[2] in self.added]
+        # vid -> {key : (old value, new value)} of the nodes kept
+        self.metadata = {}
+        for vid, new in after.metadata.iteritems():
+            old = before.metadata.get(vid)
+            if old is None or vid in self.added:
+                continue
+            changes = dict((k, (old.get(k), copy_value(v)))
+                           for k, v in new.iteritems() if old.get(k) != v)
+            if changes:
+                self.metadata[vid] = changes
+        self.size = sum(node_size(n) for n in self.removed.itervalues())
+        self.size += sum(node_size(n) for n in self.added.itervalues())
+        self.size += 100 * (len(self.removed_edges) + len(self.added_edges) +
+                            len(self.metadata))
+
+    def __nonzero__(self):
+        return bool(self.removed or self.added or self.removed_edges or
+                    self.added_edges or self.metadata)
+
+    def count(self):
+        """ Return the number of nodes, edges and metadata changed """
+        return (len(self.removed) + len(self.added) + len(self.removed_edges) +
+                len(self.added_edges) + len(self.metadata))
+
+    def __changes(self, undo):
+        """ Return the nodes and edges removed and added by undo (or redo) """
+        if undo:
+            return self.added, self.removed, self.added_edges, self.removed_edges
+        return self.removed, self.added, self.removed_edges, self.added_edges
+
+    def check(self, graph, undo=True):
+        """ Raise UndoError if graph was edited since the transaction in a
+        way which prevents to undo (or redo) it """
+        removed, added, removed_edges, added_edges = self.__changes(undo)
+        vids = set(graph.vertices())
+        for vid, node in removed.iteritems():
+            if vid not in vids or graph.node(vid) is not node:
+                raise UndoError("%s: node %s was changed" % (self.label, vid))
+        for vid in added:
+            if vid in vids and vid not in removed:
+                raise UndoError("%s: id %s is used by another node" %
+                                (self.label, vid))
+        edges = edge_set(graph)
+        for e in removed_edges:
+            if e[0] not in removed and e[2] not in removed and e not in edges:
+                raise UndoError("%s: edge %s was removed" % (self.label, e))
+        after = vids.difference(removed).union(added)
+        for e in added_edges:
+            if e[0] not in after or e[2] not in after:
+                raise UndoError("%s: node of edge %s was removed" %
+                                (self.label, e))
+        for vid in self.metadata:
+            if vid not in after:
+                raise UndoError("%s: node %s was removed" % (self.label, vid))
+
+    def apply(self, graph, undo=True):
+        """ Undo (or redo) the transaction on graph. Raise UndoError
+        before changing graph if it doesn't match the transaction """
+        self.check(graph, undo)
+        removed, added, removed_edges, added_edges = self.__changes(undo)
+        index = 0 if undo else 1
+
+        for src, sport, dst, dport in removed_edges:
+            if src not in removed and dst not in removed:
+                graph.disconnect(src, sport, dst, dport)
+        for vid in removed:
+            graph.remove_node(vid)
+        for vid, node in added.iteritems():
+            graph.add_node(node, vid)
+        for src, sport, dst, dport in added_edges:
+            graph.connect(src, sport, dst, dport)
+        for vid, changes in self.metadata.iteritems():
+            node = graph.node(vid)
+            for key, values in changes.iteritems():
+                set_metadata(node, key, values[index])
+
+
+class UndoStack(object):
+    """ The transactions of a graph. Listeners are called without
+    argument once per transaction, undo and redo.
+
+    The oldest transactions are forgotten beyond limit transactions or
+    when the transactions hold more than maxSize bytes (the last one is
+    always kept) """
+
+    limit = 100
+    maxSize = 64 * 1024 * 1024
+
+    def __init__(self, graph):
+        self.graph = weakref.ref(graph)
+        self.undo_list = []
+        self.redo_list = []
+        self.listeners = []
+        self.__depth = 0
+        self.__label = None
+        self.__before = None
+        self.__applying = False
+        self.listener = None
+
+    def begin(self, label):
+        """ Start recording an edit. Nested transactions are merged in
+        the outermost one """
+        self.__depth += 1
+        if self.__depth == 1:
+            self.__label = label
+            self.__before = Snapshot(self.graph())
+
+    def end(self):
+        """ Stop recording and return the transaction, or None if the
+        graph was not modified """
+        self.__depth -= 1
+        if self.__depth > 0:
+            return None
+        before, self.__before = self.__before, None
+        transaction = Transaction(self.__label, before,
+                                  Snapshot(self.graph(), copy=False))
+        if not transaction:
+            return None
+        self.undo_list.append(transaction)
+        del self.undo_list[:-self.limit]
+        self.redo_list = []
+        size = sum(t.size for t in self.undo_list)
+        while size > self.maxSize and len(self.undo_list) > 1:
+            size -= self.undo_list.pop(0).size
+        self.changed()
+        return transaction
+
+    def can_undo(self):
+        return bool(self.undo_list)
+
+    def can_redo(self):
+        return bool(self.redo_list)
+
+    def undo_label(self):
+        return self.undo_list[-1].label if self.undo_list else None
+
+    def redo_label(self):
+        return self.redo_list[-1].label if self.redo_list else None
+
+    def __apply(self, source, destination, undo):
+        """ Move the last transaction of source to destination once applied.
+        It stays in source if it can't be applied """
+        if not source:
+            return None
+        transaction = source[-1]
+        self.__applying = True
+        try:
+            transaction.apply(self.graph(), undo)
+        finally:
+            self.__applying = False
+        source.pop()
+        destination.append(transaction)
+        self.changed()
+        return transaction
+
+    def undo(self):
+        return self.__apply(self.undo_list, self.redo_list, True)
+
+    def redo(self):
+        return self.__apply(self.redo_list, self.undo_list, False)
+
+    def notify(self, sender, event=None):
+        """ Notification of the graph : its structure changed outside of
+        the transactions, the steps to redo don't apply any more """
+        if self.__depth or self.__applying or not event:
+            return
+        if event[0] in STRUCTURE_EVENTS and self.redo_list:
+            self.redo_list = []
+            self.changed()
+
+    def clear(self):
+        self.undo_list = []
+        self.redo_list = []
+        self.changed()
+
+    def changed(self):
+        for listener in self.listeners:
+            listener()
+
+
+# graph -> UndoStack
+__stacks__ = weakref.WeakKeyDictionary()
+
+
+def track(graph):
+    """ Make the undo stack of graph listen to the notifications of graph
+    (an openalea.core.observer.Observed) """
+    from openalea.core import observer
+    stack = get_undo_stack(graph)
+    if stack.listener is None:
+        stack.listener = observer.AbstractListener()
+        stack.listener.notify = stack.notify
+        stack.listener.initialise(graph)
+
+
+def get_undo_stack(graph):
+    """ Return the undo stack of graph """
+    stack = __stacks__.get(graph)
+    if stack is None:
+        stack = UndoStack(graph)
+        __stacks__[graph] = stack
+    return stack
@@ -52,23 +52,40 @@ def processText(txt):
 
 use_error_box = True
 
+def display_error(parent,title,stack):
+    """ Display an error message with its traceback """
+    global use_error_box
+    if not use_error_box:
+            qt.QtGui.QMessageBox.critical(None,'Exception raised !',title)
+    else:
+        errorbox = qt.QtGui.QErrorMessage(parent)
+        errorbox.setModal(True)
+        errorbox.resize(700,250)
+        errorbox.setWindowTitle(title)
+        txt = '<B>Traceback (most recent call last):</B><BR>'
+        txt += processText(''.join(stack))
+        txt += '<B>'+title+'</B><BR>'
+        errorbox.showMessage(txt)
+        errorbox.exec_()
+
+
+def display_exception(parent, e, exc_info=None):
+    """ Display an exception caught outside of exception_display,
+    e.g. in an other thread. exc_info is the result of sys.exc_info() """
+    if isinstance(e, EvaluationException):
+        exc_info = e.exc_info
+        e = e.exception
+        stack = exc_info
+    elif exc_info is not None:
+        stack = tb.format_tb(exc_info[2])
+    else:
+        stack = []
+    txt = e.__class__.__name__+': '+ str(e)
+    display_error(parent,txt,stack)
+
+
 def exception_display(f):
     """ Decorator to display exception if raised """
-    def display_error(parent,title,stack):
-        global use_error_box
-        if not use_error_box:
-                qt.QtGui.QMessageBox.critical(None,'Exception raised !',title)
-        else:
-            errorbox = qt.QtGui.QErrorMessage(parent)
-            errorbox.setModal(True)
-            errorbox.resize(700,250)
-            errorbox.setWindowTitle(title)
-            txt = '<B>Traceback (most recent call last):</B><BR>'
-            txt += processText(''.join(stack))
-            txt += '<B>'+title+'</B><BR>'
-            errorbox.showMessage(txt)
-            errorbox.exec_()
-
     def wrapped(*args):
         try:
             return f(*args)
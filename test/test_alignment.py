@@ -0,0 +1,48 @@
+from openalea.visualea import alignment
+
+positions = [(0., 0.), (100., 30.), (40., 10.), (300., 60.)]
+sizes = [(20., 10.), (40., 10.), (10., 30.), (30., 20.)]
+
+
+def check(impl):
+    numpy = alignment.numpy
+    if not impl:
+        alignment.numpy = None
+    try:
+        assert alignment.align(positions, sizes, alignment.HORIZONTAL) == \
+            [[0., 25.], [100., 25.], [40., 25.], [300., 25.]]
+        assert alignment.align(positions, sizes, alignment.LEFT) == \
+            [[110., 0.], [110., 30.], [110., 10.], [110., 60.]]
+        right = alignment.align(positions, sizes, alignment.RIGHT)
+        assert len(set(p[0] + s[0] for p, s in zip(right, sizes))) == 1
+        mean = alignment.align(positions, sizes, alignment.MEAN)
+        assert len(set(p[0] + s[0] / 2. for p, s in zip(mean, sizes))) == 1
+
+        # ordered by centers 0, 2, 1, 3 : 330 - 100 of items = 230, 3 gaps
+        x = alignment.distribute(positions, sizes, 0)
+        gap = 230. / 3
+        assert x[0] == [0., 0.] and x[3] == [300., 60.]
+        assert abs(x[2][0] - (20. + gap)) < 1e-9
+        assert abs(x[1][0] - (20. + gap + 10. + gap)) < 1e-9
+        assert [p[1] for p in x] == [0., 30., 10., 60.]
+
+        y = alignment.distribute(positions, sizes, 1)
+        assert [p[0] for p in y] == [0., 100., 40., 300.]
+        assert alignment.distribute(positions[:2], sizes[:2], 1) == \
+            [[0., 0.], [100., 30.]]
+        assert alignment.align([], [], alignment.LEFT) == []
+    finally:
+        alignment.numpy = numpy
+
+
+def test_python():
+    check(False)
+
+
+def test_numpy():
+    if alignment.numpy is not None:
+        check(True)
+
+
+test_python()
+test_numpy()
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import tempfile
+from StringIO import StringIO
+
+from openalea.visualea import batch
+
+
+def test_parse_value():
+    assert batch.parse_value("1.5") == 1.5
+    assert batch.parse_value('{"a": [1, 2]}') == {"a": [1, 2]}
+    assert batch.parse_value("(1, 'a')") == (1, "a")
+    assert batch.parse_value("hello") == "hello"
+
+
+def test_parse_inputs():
+    fd, filename = tempfile.mkstemp(".json")
+    os.write(fd, '{"a": 1, "b": "x"}')
+    os.close(fd)
+    try:
+        inputs = batch.parse_inputs(["b=[1, 2]", "c = 3"], filename)
+    finally:
+        os.remove(filename)
+    assert inputs == {"a": 1, "b": [1, 2], "c": 3}
+
+    try:
+        batch.parse_inputs(["novalue"])
+    except batch.UsageError:
+        pass
+    else:
+        assert False
+
+
+class Node(object):
+    input_desc = [{"name": "x"}]
+    output_desc = [{"name": "y"}]
+
+    def __init__(self, error=None):
+        self.error = error
+        self.x = None
+        self.y = None
+
+    def set_input(self, name, value):
+        self.x = value
+
+    def eval(self):
+        if self.error is not None:
+            raise self.error
+        self.y = self.x * 2
+
+    def get_output(self, i):
+        return self.y
+
+
+class Factory(object):
+    def __init__(self, error=None):
+        self.error = error
+
+    def instantiate(self):
+        return Node(self.error)
+
+
+def main(argv, factory):
+    """ Return the exit code of batch.main and its standard error """
+    get_factory, stderr = batch.get_factory, sys.stderr
+    def fake_get_factory(package_id, factory_id, paths=()):
+        if factory is None:
+            raise batch.UsageError("unknown package %r" % (package_id,))
+        return factory
+    batch.get_factory = fake_get_factory
+    sys.stderr = StringIO()
+    try:
+        return batch.main(argv), sys.stderr.getvalue()
+    finally:
+        batch.get_factory, sys.stderr = get_factory, stderr
+
+
+def test_exit_codes():
+    fd, filename = tempfile.mkstemp(".json")
+    os.close(fd)
+    try:
+        code, err = main(["pkg", "f", "-i", "x=21", "-o", filename], Factory())
+        assert code == batch.EXIT_OK
+        assert json.load(open(filename)) == {"y": 42}
+    finally:
+        os.remove(filename)
+
+    assert main(["pkg"], Factory())[0] == batch.EXIT_USAGE_ERROR
+    assert main(["pkg", "f"], None)[0] == batch.EXIT_USAGE_ERROR
+    assert main(["pkg", "f", "-i", "x"], Factory())[0] == batch.EXIT_USAGE_ERROR
+    assert main(["pkg", "f", "-i", "z=1"], Factory())[0] == batch.EXIT_USAGE_ERROR
+    assert main(["pkg", "f", "--inputs", "/nonexistent.json"],
+                Factory())[0] == batch.EXIT_USAGE_ERROR
+
+    # errors raised by the node are evaluation errors, with their traceback
+    code, err = main(["pkg", "f", "-i", "x=1"], Factory(IOError("disk")))
+    assert code == batch.EXIT_EVALUATION_ERROR
+    assert "Traceback" in err and "disk" in err
+
+
+test_parse_value()
+test_parse_inputs()
+test_exit_codes()
@@ -0,0 +1,257 @@
+from openalea.visualea import clipboard
+
+
+class MetaData(object):
+    def __init__(self):
+        self.values = {}
+
+    def get_metadata(self, key):
+        return self.values.get(key)
+
+    def set_metadata(self, key, value):
+        self.values[key] = value
+
+
+class Port(object):
+    def __init__(self):
+        self.mdict = MetaData()
+
+    def get_ad_hoc_dict(self):
+        return self.mdict
+
+
+class Package(object):
+    def get_id(self):
+        return "pkg"
+
+
+class Factory(object):
+    package = Package()
+
+    def __init__(self, name, nin=1, nout=1):
+        self.name = name
+        self.nin, self.nout = nin, nout
+
+    def instantiate(self, call_stack=None):
+        return Node(self)
+
+
+class Node(object):
+    def __init__(self, factory):
+        self.factory = factory
+        self.caption = factory.name
+        self.mdict = MetaData()
+        self.inputs = [None] * factory.nin
+        self.outputs = [None] * factory.nout
+        self.input_desc = [Port() for i in range(factory.nin)]
+        self.lazy, self.block, self.delay = True, False, 0
+        self.modified = True
+
+    def get_ad_hoc_dict(self):
+        return self.mdict
+
+    def set_input(self, i, value):
+        self.inputs[i] = value
+
+    def set_output(self, i, value):
+        self.outputs[i] = value
+
+
+class Graph(object):
+    factory = None
+
+    def __init__(self):
+        self.nodes = {}
+        self.links = []
+
+    def node(self, vid):
+        return self.nodes[vid]
+
+    def add_node(self, node):
+        vid = len(self.nodes) + 1
+        self.nodes[vid] = node
+        return vid
+
+    def connect(self, src, sport, dst, dport):
+        self.links.append((src, sport, dst, dport))
+
+    def out_edges(self, vid):
+        return [i for i, e in enumerate(self.links) if e[0] == vid]
+
+    def target(self, eid):
+        return self.links[eid][2]
+
+    def source_port(self, eid):
+        return self.links[eid][:2]
+
+    def target_port(self, eid):
+        return self.links[eid][2:]
+
+    def local_id(self, pid):
+        return pid[1]
+
+
+factories = {"a": Factory("a"), "b": Factory("b")}
+
+
+def get_factory(package_id, name):
+    assert package_id == "pkg"
+    return factories[name]
+
+
+def make_graph():
+    graph = Graph()
+    for i, name in enumerate("aab"):
+        node = Node(factories[name])
+        node.set_input(0, i * 10)
+        node.set_output(0, [i])
+        node.get_ad_hoc_dict().set_metadata("position", [100. + i * 50, 200.])
+        graph.add_node(node)
+    graph.node(2).input_desc[0].get_ad_hoc_dict().set_metadata("hide", True)
+    graph.node(3).lazy = False
+    graph.connect(1, 0, 2, 0)
+    graph.connect(2, 0, 3, 0)
+    graph.connect(3, 0, 1, 0)
+    return graph
+
+
+def test_copy_paste():
+    graph = make_graph()
+    data = clipboard.copy(graph, [2, 3])
+    assert len(data) == 2
+    assert data.edges == [(0, 0, 1, 0)]
+    assert data.vertices[0]["metadata"]["position"] == [0., 0.]
+
+    vids = clipboard.paste(graph, data, (10., 20.), get_factory)
+    assert vids == [4, 5]
+    assert (4, 0, 5, 0) in graph.links
+    a, b = graph.node(4), graph.node(5)
+    assert a.inputs == [10] and b.inputs == [20]
+    assert a.get_ad_hoc_dict().get_metadata("position") == [10., 20.]
+    assert b.get_ad_hoc_dict().get_metadata("position") == [60., 20.]
+    assert a.input_desc[0].get_ad_hoc_dict().get_metadata("hide")
+    assert not b.lazy
+    assert a.outputs == [None] and a.modified
+
+
+class Unpicklable(object):
+    def __deepcopy__(self, memo):
+        raise TypeError("can't copy")
+
+
+def test_outputs_and_system_clipboard():
+    graph = make_graph()
+    graph.node(1).set_input(0, (1, "a"))
+    graph.node(2).set_input(0, Factory("value"))
+    data = clipboard.copy(graph, [1, 2], outputs=True)
+    text = data.dumps()
+    assert clipboard.read_token(text) == data.token
+    assert data.dropped == []
+
+    clipboard.set_data(data)
+    assert clipboard.get_data(data.token) is data
+    assert clipboard.get_data("other") is None
+
+    # pasted in the same session : copies of the outputs
+    vids = clipboard.paste(graph, data, (0., 0.), get_factory)
+    node = graph.node(vids[1])
+    assert node.outputs == [[1]] and not node.modified
+    assert node.outputs[0] is not graph.node(2).outputs[0]
+    assert node.inputs[0] is not graph.node(2).inputs[0]
+
+    # pasted in an other session : literal inputs only, no outputs
+    loaded = clipboard.ClipboardData.loads(text)
+    assert loaded.token == data.token
+    assert sorted(loaded.dropped) == ["a: input 0", "a: outputs", "a: outputs"]
+    vids = clipboard.paste(graph, loaded, (0., 0.), get_factory)
+    a, b = graph.node(vids[0]), graph.node(vids[1])
+    assert a.inputs == [(1, "a")] and b.inputs == [None]
+    assert b.outputs == [None] and b.modified
+
+
+def test_dropped():
+    graph = make_graph()
+    graph.node(1).set_output(0, Unpicklable())
+    data = clipboard.copy(graph, [1], outputs=True)
+    assert data.dropped == ["a: output 0"]
+    assert data.vertices[0]["outputs"] == []
+
+
+def test_not_a_copy():
+    for text in ("token", "token\n{}", "token\n[1]",
+                 'token\n{"vertices": [{"package": "p", "factory": "f", '
+                 '"caption": "c", "metadata": {}, "hidden": [], "lazy": 1, '
+                 '"block": 0, "delay": 0, "inputs": [[0, "__import__(\'os\')"]]}], '
+                 '"edges": [], "dropped": []}'):
+        try:
+            clipboard.ClipboardData.loads(text)
+        except ValueError:
+            pass
+        else:
+            assert False, text
+
+
+def test_not_in_package():
+    graph = make_graph()
+    graph.node(1).factory = None
+    assert clipboard.copy(graph, [1, 2]) is None
+
+
+class Annotation(object):
+    __graphitem__ = True
+
+    def __init__(self, factory=None):
+        self.mdict = MetaData()
+
+    def get_ad_hoc_dict(self):
+        return self.mdict
+
+
+class AnnotationFactory(object):
+    def instantiate(self, call_stack=None):
+        return Annotation()
+
+
+def test_annotation():
+    graph = make_graph()
+    note = Annotation()
+    note.get_ad_hoc_dict().set_metadata("text", "hello")
+    note.get_ad_hoc_dict().set_metadata("position", [0., 0.])
+    graph.add_node(note)
+    data = clipboard.copy(graph, [1, 4])
+    assert data is not None and len(data) == 2
+
+    def get_any_factory(package_id, name):
+        if (package_id, name) == clipboard.ANNOTATION_FACTORY:
+            return AnnotationFactory()
+        return get_factory(package_id, name)
+    loaded = clipboard.ClipboardData.loads(data.dumps())
+    vids = clipboard.paste(graph, loaded, (0., 0.), get_any_factory)
+    pasted = graph.node(vids[1])
+    assert isinstance(pasted, Annotation)
+    assert pasted.get_ad_hoc_dict().get_metadata("text") == "hello"
+
+
+def test_paste_is_atomic():
+    graph = make_graph()
+    data = clipboard.copy(graph, [1, 3])
+    def get_known_factory(package_id, name):
+        if name == "b":
+            raise KeyError("package not loaded")
+        return get_factory(package_id, name)
+    try:
+        clipboard.paste(graph, data, (0., 0.), get_known_factory)
+    except KeyError:
+        pass
+    else:
+        assert False
+    assert len(graph.nodes) == 3
+
+
+test_copy_paste()
+test_outputs_and_system_clipboard()
+test_dropped()
+test_not_a_copy()
+test_not_in_package()
+test_annotation()
+test_paste_is_atomic()
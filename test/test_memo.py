@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+
+from openalea.visualea.profiler import sizeof
+from openalea.visualea.memo import OutputCache, memoized_eval, get_memo_status, \
+     input_key, code_version, HIT, MISS
+
+
+class Node(object):
+    """ Minimal lazy node computing the sum of its inputs """
+    lazy = True
+    raise_exception = False
+
+    def __init__(self, *inputs):
+        self.inputs = list(inputs)
+        self.outputs = [None]
+        self.modified = True
+        self.calls = 0
+        self.events = []
+
+    def get_nb_input(self):
+        return len(self.inputs)
+
+    def get_input(self, i):
+        return self.inputs[i]
+
+    def get_nb_output(self):
+        return 1
+
+    def get_output(self, i):
+        return self.outputs[i]
+
+    def set_output(self, i, value):
+        self.outputs[i] = value
+
+    def notify_listeners(self, event):
+        self.events.append(event[0])
+
+    def eval(self):
+        self.calls += 1
+        self.outputs[0] = sum(self.inputs)
+        self.modified = False
+        return False
+
+
+def test_lru():
+    cache = OutputCache(maxSize=2 * sizeof((1,)))
+    cache.put("a", (1,))
+    cache.put("b", (2,))
+    assert cache.get("a") == (1,)
+    cache.put("c", (3,))
+    assert cache.get("b") is None
+    assert cache.get("a") == (1,)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_size():
+    cache = OutputCache(maxSize=3000)
+    cache.put("small", ([1],))
+    cache.put("big", ("x" * 5000,))
+    assert cache.get("big") is None # larger than the whole cache
+    cache.put("medium", ("x" * 2000,))
+    cache.put("other", ("y" * 2000,))
+    assert cache.get("medium") is None
+    assert cache.get("other") is not None
+    assert 0 < cache.size <= 3000
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_disk():
+    directory = tempfile.mkdtemp()
+    try:
+        OutputCache(directory=directory).put("a", ([1, 2],))
+        assert OutputCache(directory=directory).get("a") == ([1, 2],)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_memoized_eval():
+    cache = OutputCache()
+    node = Node(1, 2)
+    node.eval = memoized_eval(node, cache, node.eval)
+    node.eval()
+    assert node.calls == 1 and get_memo_status(node) == MISS
+
+    other = Node(1, 2)
+    other.eval = memoized_eval(other, cache, other.eval)
+    other.eval()
+    assert other.calls == 0 and other.get_output(0) == 3
+    assert get_memo_status(other) == HIT
+    assert "start_eval" in other.events and "stop_eval" in other.events
+
+    other.inputs[1] = 5
+    other.modified = True
+    other.eval()
+    assert other.calls == 1 and other.get_output(0) == 6
+
+
+class FuncNode(Node):
+    def __init__(self, func, *inputs):
+        Node.__init__(self, *inputs)
+        self.func = func
+
+
+def test_code_version():
+    def f(x):
+        return x + 1
+    def g(x):
+        return x + 2
+    a, b, c = FuncNode(f, 1), FuncNode(f, 1), FuncNode(g, 1)
+    assert code_version(a) == code_version(b) != code_version(c)
+    assert input_key(a) == input_key(b) != input_key(c)
+
+
+def test_copies():
+    cache = OutputCache()
+    value = [1, 2]
+    cache.put("a", (value,))
+    value.append(3)
+    outputs = cache.get("a")
+    assert outputs == ([1, 2],)
+    outputs[0].append(4)
+    assert cache.get("a") == ([1, 2],)
+
+
+def test_min_time():
+    cache = OutputCache()
+    node = Node(1, 2)
+    node.eval = memoized_eval(node, cache, node.eval, min_time=10.)
+    node.eval()
+    assert len(cache) == 1
+    # too fast to be memoized again
+    node.inputs[0] = 2
+    node.modified = True
+    node.eval()
+    assert len(cache) == 1 and node.get_output(0) == 4
+
+
+test_lru()
+test_size()
+test_disk()
+test_memoized_eval()
+test_code_version()
+test_copies()
+test_min_time()
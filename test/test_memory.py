@@ -0,0 +1,131 @@
+from openalea.visualea.memory import OutputReleaser, pin, is_released, observe
+
+
+class Node(object):
+    def __init__(self, nin, nout):
+        self.inputs = [None] * nin
+        self.outputs = [None] * nout
+        self.modified = False
+
+    def get_nb_output(self):
+        return len(self.outputs)
+
+    def get_output(self, i):
+        return self.outputs[i]
+
+    def set_output(self, i, value):
+        self.outputs[i] = value
+
+    def notify_listeners(self, event):
+        pass
+
+    def get_caption(self):
+        return "graph"
+
+
+class Graph(object):
+    """ a -> b -> c, a -> c. Port ids are (vid, 'in'|'out', index) """
+
+    id_out = None
+
+    def __init__(self):
+        self.nodes = {1: Node(0, 1), 2: Node(1, 1), 3: Node(2, 1)}
+        self.edges = [((1, 0), (2, 0)), ((2, 0), (3, 0)), ((1, 0), (3, 1))]
+
+    def vertices(self):
+        return self.nodes.keys()
+
+    def node(self, vid):
+        return self.nodes[vid]
+
+    def out_ports(self, vid):
+        return [(vid, "out", i) for i in range(len(self.nodes[vid].outputs))]
+
+    def local_id(self, pid):
+        return pid[2]
+
+    def vertex(self, pid):
+        return pid[0]
+
+    def connected_ports(self, pid):
+        return [(dst[0], "in", dst[1]) for src, dst in self.edges
+                if src == (pid[0], pid[2])]
+
+
+def run(releaser, graph):
+    for vid in (1, 2, 3):
+        node = graph.node(vid)
+        node.outputs[0] = [vid] * 1000
+        releaser.evaluated(node)
+
+
+def test_release():
+    graph = Graph()
+    releaser = OutputReleaser(graph)
+    run(releaser, graph)
+    a, b, c = graph.node(1), graph.node(2), graph.node(3)
+    assert a.get_output(0) is None and b.get_output(0) is None
+    assert c.get_output(0) is not None # result
+    assert c.inputs == [None, None]
+    assert a.modified and b.modified
+    assert is_released(a) and is_released(b) and not is_released(c)
+    assert releaser.released == 2
+
+    # evaluated again
+    a.outputs[0] = 1
+    releaser.evaluated(a)
+    assert not is_released(a)
+    assert releaser.peak > releaser.live > 0
+
+
+def test_pinned():
+    graph = Graph()
+    pin(graph.node(1), 0)
+    releaser = OutputReleaser(graph)
+    run(releaser, graph)
+    assert graph.node(1).get_output(0) is not None
+    assert releaser.released == 1
+
+
+class Widget(object):
+    def __init__(self):
+        self.visible = True
+
+    def isVisible(self):
+        return self.visible
+
+
+def test_observed():
+    graph = Graph()
+    widget = Widget()
+    observe(graph.node(2), widget)
+    releaser = OutputReleaser(graph)
+    run(releaser, graph)
+    assert graph.node(2).get_output(0) is not None
+    assert releaser.released == 1
+
+    widget.visible = False
+    graph = Graph()
+    observe(graph.node(2), widget)
+    releaser = OutputReleaser(graph)
+    run(releaser, graph)
+    assert releaser.released == 2
+
+
+def test_exported():
+    # the output of b is also a result of the composite node (vid 4)
+    graph = Graph()
+    graph.id_out = 4
+    graph.edges.append(((2, 0), (4, 0)))
+    graph.node(3).inputs[0] = "b"
+    releaser = OutputReleaser(graph)
+    run(releaser, graph)
+    assert graph.node(2).get_output(0) is not None
+    assert graph.node(3).inputs[0] == "b"
+    assert graph.node(1).get_output(0) is None
+
+
+test_release()
+test_pinned()
+test_observed()
+test_exported()
@@ -0,0 +1,105 @@
+from openalea.visualea.node_index import NodeIndex, tokenize
+
+
+class Package(dict):
+    def __init__(self, name):
+        dict.__init__(self)
+        self.name = name
+
+    def get_id(self):
+        return self.name
+
+
+interfaces = dict(filename="IFileStr", image="IImage", angle="IFloat",
+                  list="ISequence", result="IFloat")
+
+
+class Factory(object):
+    def __init__(self, package, name, category="", description="",
+                 inputs=(), outputs=()):
+        self.package = package
+        self.name = name
+        self.category = category
+        self.description = description
+        self.inputs = [dict(name=n, interface=interfaces.get(n)) for n in inputs]
+        self.outputs = [dict(name=n, interface=interfaces.get(n)) for n in outputs]
+        package[name] = self
+
+
+class PackageManager(dict):
+    pass
+
+
+def make_index():
+    pkg = Package("openalea.image")
+    Factory(pkg, "ReadImage", "io", "read an image file", ("filename",), ("image",))
+    Factory(pkg, "rotate", "transform", "rotate an image", ("image", "angle"), ("image",))
+    pkg2 = Package("openalea.math")
+    Factory(pkg2, "sum", "math", "sum of a list", ("list",), ("result",))
+    pman = PackageManager()
+    pman[pkg.name] = pkg
+    pman[pkg2.name] = pkg2
+    index = NodeIndex(pman)
+    index.update()
+    return pman, index
+
+
+def names(factories):
+    return [f.name for f in factories]
+
+
+def test_tokenize():
+    assert tokenize("ReadImage file_name") == ["readimage", "read", "image", "file", "name"]
+
+
+def test_search():
+    pman, index = make_index()
+    assert len(index) == 3
+    # name matches rank before description matches
+    assert names(index.search("image"))[0] == "ReadImage"
+    assert set(names(index.search("image"))) == set(["ReadImage", "rotate"])
+    # prefix, several words and port names
+    assert names(index.search("rot")) == ["rotate"]
+    assert names(index.search("image angle")) == ["rotate"]
+    # approximate match
+    assert names(index.search("rotaet")) == ["rotate"]
+    # arity filter
+    assert names(index.search("", 2, 1)) == ["rotate"]
+    assert len(index.search("")) == 3
+
+
+def test_update():
+    pman, index = make_index()
+    Factory(pman["openalea.math"], "product", "math", "product of a list")
+    index.update()
+    assert names(index.search("prod")) == ["product"]
+
+    # edited in place : new description and one more input
+    product = pman["openalea.math"]["product"]
+    product.description = "multiply the numbers"
+    product.inputs = [dict(name="list", interface="ISequence")]
+    index.update()
+    assert names(index.search("multiply")) == ["product"]
+    assert "product" in names(index.search("", 1, 0))
+
+    del pman["openalea.image"]
+    index.update()
+    assert index.search("image") == []
+    assert "readimage" not in index.tokens
+
+
+def test_compatible():
+    pman, index = make_index()
+    Factory(pman["openalea.math"], "cos", "math", "cosine", ("angle",), ("result",))
+    index.update()
+    # same arity, best interface match first
+    node_inputs = [dict(interface="IFileStr")]
+    node_outputs = [dict(interface="IImage")]
+    assert names(index.compatible(node_inputs, node_outputs)) == ["ReadImage", "cos", "sum"]
+    assert index.compatible([], node_outputs) == []
+
+
+test_tokenize()
+test_search()
+test_update()
+test_compatible()
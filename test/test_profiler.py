@@ -0,0 +1,57 @@
+from StringIO import StringIO
+import json
+
+from openalea.visualea.profiler import Profiler, profiled_eval, sizeof
+
+
+class Node(object):
+    def __init__(self, caption):
+        self.caption = caption
+        self.output = None
+
+    def get_caption(self):
+        return self.caption
+
+    def get_nb_output(self):
+        return 1
+
+    def get_output(self, i):
+        return self.output
+
+    def notify_listeners(self, event):
+        pass
+
+    def eval(self):
+        self.output = range(1000)
+        return False
+
+
+def test_sizeof():
+    assert sizeof(range(1000)) > sizeof(range(10))
+    assert sizeof({"a": "x" * 1000}) > 1000
+
+
+def test_profile():
+    profiler = Profiler()
+    node = Node("slow")
+    node.eval = profiled_eval(node, profiler, node.eval)
+    node.eval()
+    node.eval()
+    profile = profiler.get(node)
+    assert profile.calls == 2
+    assert profile.size >= sizeof(range(1000))
+
+    f = StringIO()
+    profiler.to_json(f)
+    rows = json.loads(f.getvalue())
+    assert rows[0]["caption"] == "slow" and rows[0]["calls"] == 2
+
+    f = StringIO()
+    profiler.to_csv(f)
+    lines = f.getvalue().splitlines()
+    assert lines[0] == "caption,calls,wall,cpu,size"
+    assert lines[1].startswith("slow,2,")
+
+
+test_sizeof()
+test_profile()
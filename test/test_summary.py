@@ -0,0 +1,27 @@
+from openalea.visualea.summary import summarize, register_summarizer, unregister_summarizer
+
+
+class Big(object):
+    def __repr__(self):
+        raise AssertionError("the whole object must not be stringified")
+
+
+def test_summarize():
+    s = summarize(range(100000), 40)
+    assert s.startswith("list of 100000: [0, 1, 2")
+    assert len(s) <= 43
+    assert summarize("x" * 1000, 10) == "'xxxxxxxxx..."
+    assert summarize(1.5) == "1.5"
+
+
+def test_register():
+    register_summarizer(Big, lambda value, maxlen: "a big object")
+    try:
+        assert summarize(Big()) == "a big object"
+    finally:
+        unregister_summarizer(Big)
+    assert "repr failed" in summarize(Big())
+
+
+test_summarize()
+test_register()
@@ -0,0 +1,94 @@
+import threading
+
+from openalea.visualea import batch
+from openalea.visualea.sweep import parse_range, grid, latin_hypercube, \
+     make_samples, run_sweep, ResultTable, LATIN_HYPERCUBE, message, \
+     read_message
+
+
+def test_parse_range():
+    assert parse_range("0:1:3") == [0., 0.5, 1.]
+    assert parse_range("0:10") == (0., 10.)
+    assert parse_range("1, 2, 3") == [1, 2, 3]
+    assert parse_range("'a', 'b'") == ["a", "b"]
+    assert parse_range("hello") == ["hello"]
+
+
+def test_samples():
+    samples = grid({"a": [1, 2], "b": [3, 4, 5]})
+    assert len(samples) == 6
+    assert {"a": 2, "b": 5} in samples
+
+    samples = latin_hypercube({"x": (0., 1.)}, 10, seed=1)
+    strata = sorted(int(s["x"] * 10) for s in samples)
+    assert strata == range(10)
+
+    samples = make_samples({"x": (0., 1.), "c": ["u", "v"]}, LATIN_HYPERCUBE, 4)
+    assert len(samples) == 4
+    assert all(s["c"] in ("u", "v") for s in samples)
+
+
+def fake_run(package_id, factory_id, inputs):
+    if inputs["a"] < 0:
+        raise ValueError("negative")
+    if inputs["a"] == 0:
+        raise SystemExit("exit called by the node")
+    return {"sum": inputs["a"] + inputs["b"]}
+
+
+class InProcessPool(object):
+    """ Runs the tasks when they are submitted """
+
+    def apply_async(self, func, args, callback):
+        callback(func(*args))
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def test_run_sweep():
+    run = batch.run
+    batch.run = fake_run
+    try:
+        table = ResultTable(["a", "b"], ["sum"])
+        streamed = []
+        table.listeners.append(streamed.append)
+        run_sweep("pkg", "factory", grid({"a": [-1, 0, 0, 1, 2]}), table,
+                  fixed={"b": 10}, workers=2, pool=InProcessPool())
+    finally:
+        batch.run = run
+    # the samples which exit don't keep their process
+    assert len(streamed) == 5
+    rows = dict((r["a"], r) for r in table.rows)
+    assert rows[2]["sum"] == 12
+    assert "negative" in rows[-1]["error"]
+    assert "SystemExit" in rows[0]["error"]
+
+
+def test_stop():
+    run = batch.run
+    batch.run = fake_run
+    stop = threading.Event()
+    try:
+        table = ResultTable(["a", "b"], ["sum"])
+        table.listeners.append(lambda row: stop.set())
+        run_sweep("pkg", "factory", grid({"a": [1, 2, 3]}), table,
+                  fixed={"b": 0}, workers=1, stop=stop, pool=InProcessPool())
+    finally:
+        batch.run = run
+    assert [r["sum"] for r in table.rows] == [1]
+
+
+def test_messages():
+    row = {"index": 1, "x": (1., "a")}
+    assert read_message(message(row)) == row
+
+
+test_parse_range()
+test_samples()
+test_run_sweep()
+test_stop()
+test_messages()
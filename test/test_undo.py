@@ -0,0 +1,205 @@
+from openalea.visualea.undo import UndoStack, UndoError
+
+
+class MetaData(object):
+    def __init__(self):
+        self.values = {}
+
+    def get_metadata(self, key):
+        return self.values.get(key)
+
+    def set_metadata(self, key, value):
+        self.values[key] = value
+
+
+class Node(object):
+    def __init__(self, caption):
+        self.caption = caption
+        self.mdict = MetaData()
+
+    def get_ad_hoc_dict(self):
+        return self.mdict
+
+
+class Graph(object):
+    """ Edges are (src vid, src port, dst vid, dst port), port ids are
+    (vid, port) """
+
+    def __init__(self):
+        self.nodes = {}
+        self.links = {}
+        self.next_eid = 0
+
+    def vertices(self):
+        return self.nodes.keys()
+
+    def node(self, vid):
+        return self.nodes[vid]
+
+    def add_node(self, node, vid):
+        self.nodes[vid] = node
+
+    def remove_node(self, vid):
+        del self.nodes[vid]
+        for eid, e in self.links.items():
+            if vid in (e[0], e[2]):
+                del self.links[eid]
+
+    def edges(self):
+        return self.links.keys()
+
+    def source(self, eid):
+        return self.links[eid][0]
+
+    def target(self, eid):
+        return self.links[eid][2]
+
+    def source_port(self, eid):
+        return self.links[eid][:2]
+
+    def target_port(self, eid):
+        return self.links[eid][2:]
+
+    def local_id(self, pid):
+        return pid[1]
+
+    def connect(self, src, sport, dst, dport):
+        self.next_eid += 1
+        self.links[self.next_eid] = (src, sport, dst, dport)
+
+    def disconnect(self, src, sport, dst, dport):
+        for eid, e in self.links.items():
+            if e == (src, sport, dst, dport):
+                del self.links[eid]
+
+
+def state(graph):
+    return (sorted(graph.nodes.items()), sorted(graph.links.values()),
+            repr(sorted((vid, n.caption, sorted(n.mdict.values.items()))
+                        for vid, n in graph.nodes.items())))
+
+
+def make_graph():
+    graph = Graph()
+    for vid in (1, 2, 3):
+        graph.add_node(Node("n%i" % vid), vid)
+        graph.node(vid).mdict.set_metadata("position", [vid * 10., 0.])
+    graph.connect(1, 0, 2, 0)
+    graph.connect(2, 0, 3, 0)
+    return graph
+
+
+def test_remove_undo_redo():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    initial = state(graph)
+
+    stack.begin("remove")
+    graph.remove_node(2)
+    transaction = stack.end()
+    assert transaction.removed.keys() == [2]
+    assert len(transaction.removed_edges) == 2
+    removed = state(graph)
+
+    stack.undo()
+    assert state(graph) == initial
+    assert stack.can_redo() and not stack.can_undo()
+    stack.redo()
+    assert state(graph) == removed
+
+
+def test_metadata_and_nesting():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    initial = state(graph)
+
+    stack.begin("align")
+    stack.begin("nested")
+    for vid in (1, 2, 3):
+        graph.node(vid).get_ad_hoc_dict().get_metadata("position")[1] = 5.
+    stack.end()
+    graph.node(1).caption = "renamed"
+    stack.end()
+    assert len(stack.undo_list) == 1
+    assert stack.undo_label() == "align"
+    assert sorted(stack.undo_list[0].metadata) == [1, 2, 3]
+    edited = state(graph)
+
+    stack.undo()
+    assert state(graph) == initial
+    stack.redo()
+    assert state(graph) == edited
+
+
+def test_add_and_replace():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    initial = state(graph)
+
+    stack.begin("paste")
+    graph.add_node(Node("new"), 4)
+    graph.connect(3, 0, 4, 0)
+    graph.nodes[2] = Node("replacement")
+    stack.end()
+    edited = state(graph)
+
+    stack.undo()
+    assert state(graph) == initial
+    stack.redo()
+    assert state(graph) == edited
+
+
+def test_empty_transaction():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    stack.begin("nothing")
+    assert stack.end() is None
+    assert not stack.can_undo()
+
+
+def test_size_limit():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    stack.maxSize = 25000
+    for vid in range(4, 10):
+        node = Node("big")
+        node.inputs = ["x" * 10000]
+        stack.begin("paste")
+        graph.add_node(node, vid)
+        stack.end()
+    assert len(stack.undo_list) == 2
+    assert stack.undo_list[-1].added.keys() == [9]
+
+
+def test_changed_graph():
+    graph = make_graph()
+    stack = UndoStack(graph)
+    stack.begin("remove")
+    graph.remove_node(3)
+    stack.end()
+    stack.undo()
+
+    # another node took the id of the removed one
+    graph.remove_node(3)
+    graph.add_node(Node("other"), 3)
+    changed = state(graph)
+    try:
+        stack.redo()
+    except UndoError:
+        pass
+    else:
+        assert False
+    assert state(graph) == changed
+    assert stack.can_redo()
+
+    # edits made outside of the transactions forget the steps to redo
+    stack.notify(graph, ("vertex_added", ("vertex", graph.node(3))))
+    assert not stack.can_redo() and not stack.can_undo()
+
+
+test_remove_undo_redo()
+test_metadata_and_nesting()
+test_add_and_replace()
+test_empty_transaction()
+test_size_limit()
+test_changed_graph()